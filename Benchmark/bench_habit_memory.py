@@ -0,0 +1,150 @@
+"""
+This script compares the memory and the speed of the Habit class, which keeps its completion dates
+sorted in an array of microseconds, with the previous Habit class, which kept an unsorted list of datetime
+objects. The previous class is reproduced below without its comments.
+
+The habits hold 1,000,000 completions in total. Run it with:
+    python Benchmark/bench_habit_memory.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+from habit import Habit
+
+HABIT_COUNT = 1000
+COMPLETIONS_PER_HABIT = 1000
+
+
+class LegacyHabit:
+    """
+    The Habit class before the compact storage, with a list of datetime objects.
+    """
+
+    def __init__(self, name: str, frequency: str, periodicity: int):
+        self.name = name
+        self.frequency = frequency.lower()
+        self.periodicity = periodicity
+        self.creation_date = datetime.now()
+        self.completion_dates = []
+
+    def _period_start(self):
+        if self.frequency == 'daily':
+            return timedelta(days=1), lambda d: datetime(d.year, d.month, d.day)
+        return timedelta(weeks=1), lambda d: datetime(d.year, d.month, d.day) - timedelta(days=d.weekday())
+
+    def can_mark_performed(self):
+        now = datetime.now()
+        duration, period_start = self._period_start()
+        start = period_start(now)
+        count = sum(1 for date in self.completion_dates if start <= date < start + duration)
+        return count < self.periodicity
+
+    def _period_counts(self):
+        _, period_start = self._period_start()
+        period_counts = defaultdict(int)
+        for date in sorted(self.completion_dates):
+            period_counts[period_start(date)] += 1
+        return period_counts
+
+    def calculate_current_streak(self):
+        if not self.completion_dates:
+            return 0
+        duration, period_start = self._period_start()
+        eligible_periods = set(period for period, count in self._period_counts().items()
+                               if count == self.periodicity)
+        expected_period = period_start(datetime.now()) - duration
+        current_streak = 0
+        while expected_period in eligible_periods:
+            current_streak += 1
+            expected_period -= duration
+        return current_streak
+
+    def calculate_longest_streak(self):
+        if not self.completion_dates:
+            return 0
+        duration, _ = self._period_start()
+        period_counts = self._period_counts()
+        longest_streak = current_streak = 0
+        previous_period = None
+        for period in sorted(period_counts):
+            if period_counts[period] == self.periodicity:
+                if previous_period is not None and period - previous_period == duration:
+                    current_streak += 1
+                else:
+                    current_streak = 1
+                longest_streak = max(longest_streak, current_streak)
+            else:
+                current_streak = 0
+            previous_period = period
+        return longest_streak
+
+
+def build(habit_class, dates: list):
+    """
+    This function creates the habits and adds the completion dates one at a time, as the application does.
+    Each habit gets its own datetime objects, shifted by a few microseconds, like habits loaded from a database.
+    """
+    habits = []
+    for x in range(HABIT_COUNT):
+        habit = habit_class(f"habit {x}", 'daily' if x % 2 else 'weekly', 2)
+        offset = timedelta(microseconds=x)
+        for date in dates:
+            habit.completion_dates.append(date + offset)
+        habits.append(habit)
+    return habits
+
+
+def measure_memory(habit_class, dates: list):
+    """
+    This function returns the bytes of memory used by the habits and their completion dates.
+    It builds them a second time, since tracing the memory slows the build down.
+    """
+    tracemalloc.start()
+    habits = build(habit_class, dates)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del habits
+    return memory
+
+
+def timed(function, habits: list):
+    """
+    This function calls a function for every habit and returns the seconds it took and the results.
+    """
+    start = time.perf_counter()
+    results = [function(habit) for habit in habits]
+    return time.perf_counter() - start, results
+
+
+def main():
+    now = datetime.now()
+    # Two completions every twelve hours, going back in time, with a gap every fifty days.
+    dates = [now - timedelta(hours=12 * i + 1) for i in range(COMPLETIONS_PER_HABIT) if (i // 2) % 50 != 7]
+    dates = dates + dates[:COMPLETIONS_PER_HABIT - len(dates)]
+    print(f"{HABIT_COUNT} habits with {len(dates)} completions each, {HABIT_COUNT * len(dates)} in total")
+    print(f"{'class':>8} {'memory (MB)':>12} {'build (s)':>10} {'can mark (ms)':>14} "
+          f"{'current (s)':>12} {'longest (s)':>12}")
+    results = {}
+    for label, habit_class in (('legacy', LegacyHabit), ('compact', Habit)):
+        memory = measure_memory(habit_class, dates)
+        start = time.perf_counter()
+        habits = build(habit_class, dates)
+        build_time = time.perf_counter() - start
+        mark_time, marks = timed(lambda habit: habit.can_mark_performed(), habits)
+        current_time, current = timed(lambda habit: habit.calculate_current_streak(), habits)
+        longest_time, longest = timed(lambda habit: habit.calculate_longest_streak(), habits)
+        results[label] = (marks, current, longest)
+        print(f"{label:>8} {memory / 2 ** 20:>12.1f} {build_time:>10.2f} {mark_time * 1000:>14.1f} "
+              f"{current_time:>12.2f} {longest_time:>12.2f}")
+        del habits
+    assert results['legacy'] == results['compact']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+This script measures how the time to load every habit from the database grows with the number of habits
+and the number of completions per habit. It compares the bulk loading used by Database.show_all_habits()
+with the previous approach of running one completions query per habit.
+
+Run it with:
+    python Benchmark/bench_loading.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+from database import Database
+from habit import Habit
+from periods import from_epoch, to_epoch
+
+HABIT_COUNTS = [100, 1000, 5000]
+COMPLETIONS_PER_HABIT = [1, 10, 50]
+
+
+def fill_database(db: Database, habit_count: int, completions_per_habit: int):
+    """
+    This function fills the database with daily habits that were each performed once a day.
+
+    Args:
+        db (Database): the database to fill.
+        habit_count (int): the number of habits to create.
+        completions_per_habit (int): the number of completion dates for each habit.
+    """
+    start = datetime(2024, 1, 1, 8, 0, 0)
+    habits = [(f"habit {x}", 'daily', 1, to_epoch(start)) for x in range(habit_count)]
+    completions = [
+        (name, to_epoch(start + timedelta(days=day)))
+        for name, _, _, _ in habits
+        for day in range(completions_per_habit)
+    ]
+    db.cursor.executemany('INSERT INTO habits VALUES (?, ?, ?, ?)', habits)
+    db.cursor.executemany('INSERT INTO habit_completions VALUES (?, ?)', completions)
+    db.connection.commit()
+
+
+def load_one_query_per_habit(db: Database):
+    """
+    This function loads all the habits the way the database did before the bulk loading,
+    with one query for the habits and another query for the completions of each habit.
+
+    Args:
+        db (Database): the database to load from.
+
+    Returns:
+        list[Habit]: all the habits in the database.
+    """
+    db.cursor.execute('SELECT * FROM habits')
+    habits = []
+    for row in db.cursor.fetchall():
+        habit = Habit(name=row[0], frequency=row[1], periodicity=row[2])
+        habit.creation_date = from_epoch(row[3])
+        habit.completion_dates = db.get_completions(habit.name)
+        habits.append(habit)
+    return habits
+
+
+def best_time(function, repeat=3):
+    """
+    This function runs a function a few times and returns the fastest run in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print(f"{'habits':>8} {'completions':>12} {'per habit (s)':>14} {'bulk (s)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for habit_count in HABIT_COUNTS:
+            for completions_per_habit in COMPLETIONS_PER_HABIT:
+                db_name = os.path.join(folder, f"bench_{habit_count}_{completions_per_habit}.db")
+                db = Database(db_name=db_name, insert_predefined=False)
+                fill_database(db, habit_count, completions_per_habit)
+                old_time = best_time(lambda: load_one_query_per_habit(db), repeat=1)
+                new_time = best_time(db.show_all_habits)
+                print(f"{habit_count:>8} {completions_per_habit:>12} {old_time:>14.4f} {new_time:>10.4f} "
+                      f"{old_time / new_time:>7.1f}x")
+                db.exit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+This script measures what logging costs the application per 100,000 operations. Each operation marks a habit
+as performed, as Habit.performed() does, and logs it. It compares the logging used before, a FileHandler set up
+by logging.basicConfig() with messages formatted by f-strings, with the queued logging of logconfig.py,
+where the message is formatted by the background writer and only when its level is enabled.
+
+The time is measured in the thread that logs, which is the time the application waits. For the queued
+logging the time the background writer needs to empty the queue is shown apart.
+
+Run it with:
+    python Benchmark/bench_logging.py
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+import logconfig
+from habit import Habit
+
+OPERATIONS = 100000
+
+logger = logging.getLogger('bench')
+
+
+def performed_fstring(habit: Habit):
+    """
+    Habit.performed() with the message formatted by an f-string, as before.
+    """
+    now = datetime.now()
+    habit.completion_dates.append(now)
+    logger.info(f"The habit '{habit.name}' was performed at {now}.")
+    return now
+
+
+def performed_lazy(habit: Habit):
+    """
+    Habit.performed() with the message formatted by the logging module, as now.
+    """
+    now = datetime.now()
+    habit.completion_dates.append(now)
+    logger.info("The habit '%s' was performed at %s.", habit.name, now)
+    return now
+
+
+def reset_logging():
+    """
+    This function removes every handler from the root logger.
+    """
+    logconfig.stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run(operation):
+    """
+    This function performs the operations on a new habit and returns the seconds they took.
+    """
+    habit = Habit('bench', 'daily', 1)
+    start = time.perf_counter()
+    for _ in range(OPERATIONS):
+        operation(habit)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'configuration':<52} {'ms / 100k ops':>14} {'us / op':>8} {'drain (ms)':>11}")
+    with tempfile.TemporaryDirectory() as folder:
+        log_file = os.path.join(folder, 'bench.log')
+        cases = [
+            ('no logging handler (baseline)', None, logging.WARNING, performed_lazy),
+            ('before: basicConfig file, f-string, INFO', 'basic', logging.INFO, performed_fstring),
+            ('after: queued, lazy, INFO, no rate limit', 'queued', logging.INFO, performed_lazy),
+            ('after: queued, lazy, INFO, rate limited', 'limited', logging.INFO, performed_lazy),
+            ('before: basicConfig file, f-string, WARNING', 'basic', logging.WARNING, performed_fstring),
+            ('after: queued, lazy, WARNING', 'queued', logging.WARNING, performed_lazy),
+        ]
+        for label, setup, level, operation in cases:
+            reset_logging()
+            if os.path.exists(log_file):
+                os.remove(log_file)
+            if setup == 'basic':
+                logging.basicConfig(filename=log_file, level=level, format=logconfig.LOG_FORMAT)
+            elif setup is not None:
+                logconfig.configure_logging(log_file, level=level, max_bytes=2 ** 30,
+                                            rate=None if setup == 'queued' else 10.0)
+            else:
+                logging.getLogger().setLevel(level)
+            seconds = run(operation)
+            start = time.perf_counter()
+            reset_logging()
+            drain = time.perf_counter() - start if setup in ('queued', 'limited') else 0.0
+            print(f"{label:<52} {seconds * 1000:>14.1f} {seconds / OPERATIONS * 1e6:>8.2f} {drain * 1000:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
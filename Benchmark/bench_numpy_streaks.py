@@ -0,0 +1,55 @@
+"""
+This script compares the streak calculations of the Habit class with the NumPy streak engine
+for habits with long histories. The NumPy engine is timed both from datetime objects and from the
+epoch seconds that the database stores.
+
+Run it with:
+    python Benchmark/bench_numpy_streaks.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+import numpy_streaks
+from habit import Habit
+
+COMPLETION_COUNTS = [10000, 100000, 1000000]
+
+
+def timed(function):
+    """
+    This function runs a function three times and returns the fastest run in seconds and its result.
+    """
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    print(f"{'completions':>12} {'Habit (s)':>10} {'NumPy dates (s)':>16} {'NumPy epochs (ms)':>18}")
+    for count in COMPLETION_COUNTS:
+        habit = Habit("benchmark", "daily", 2)
+        now = datetime.now()
+        # Two completions every day, with one day in fifty missed.
+        habit.completion_dates = [now - timedelta(hours=12 * i + 1) for i in range(count) if (i // 2) % 50 != 7]
+        epochs = numpy_streaks.to_epoch_array(habit.completion_dates)
+
+        habit_time, expected = timed(lambda: (habit.calculate_current_streak(), habit.calculate_longest_streak()))
+        dates_time, from_dates = timed(lambda: numpy_streaks.habit_streaks(habit))
+        epochs_time, from_epochs = timed(lambda: (
+            numpy_streaks.current_streak(epochs, 'daily', 2),
+            numpy_streaks.longest_streak(epochs, 'daily', 2)
+        ))
+        assert expected == from_dates == from_epochs
+        print(f"{count:>12} {habit_time:>10.3f} {dates_time:>16.3f} {epochs_time * 1000:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+This script compares the file-backed connection of Database with its replica mode, where the file is copied
+into an in-memory database at startup and every transaction is written to the file too, at once or from
+a background thread. For each mode it measures the startup cost, the memory the process grows by,
+the latency of the reads the dashboards use and the latency of marking a habit as performed.
+
+Each mode runs in its own process on a copy of the same synthetic workload, so that the memory of one mode
+is not counted in another and every mode starts with the file in the page cache of the system.
+
+Run it with:
+    python Benchmark/bench_replica.py
+    python Benchmark/bench_replica.py --habits 5000 --days 730
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+from database import Database
+from workload import generate_workload
+
+MODES = {
+    'file': {},
+    'replica': {'replica': True},
+    'replica, async writes': {'replica': True, 'async_replica': True},
+}
+
+SAMPLE_SIZE = 200
+
+
+def resident_bytes():
+    """
+    This function returns the resident memory of the process, from /proc on Linux.
+    """
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def latency(function, arguments: list):
+    """
+    This function calls a function once with each argument and returns the median microseconds of a call.
+    """
+    runs = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs) * 1e6
+
+
+def run_mode(db_name: str, mode: str):
+    """
+    This function measures one mode on a database file and returns the results, in the process that runs it.
+    """
+    before = resident_bytes()
+    start = time.perf_counter()
+    db = Database(db_name=db_name, insert_predefined=False, **MODES[mode])
+    startup = time.perf_counter() - start
+    growth = resident_bytes() - before
+
+    names = db.habit_names()
+    sample = random.Random(0).sample(names, min(SAMPLE_SIZE, len(names)))
+    results = {
+        'startup (ms)': startup * 1000,
+        'memory (MB)': growth / 2 ** 20,
+        'find_habit (us)': latency(db.find_habit, sample),
+        'can_mark_performed (us)': latency(db.can_mark_performed, sample),
+        'get_streaks (us)': latency(db.get_streaks, sample),
+        'latest_completions (us)': latency(db.latest_completions, sample),
+        'sql_streaks, all (ms)': latency(lambda _: db.sql_streaks(), range(5)) / 1000,
+    }
+    now = datetime.now() + timedelta(days=1)
+    results['add_completion (us)'] = latency(lambda name: db.add_completion(name, now), sample)
+    start = time.perf_counter()
+    db.exit()
+    results['exit (ms)'] = (time.perf_counter() - start) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the file-backed connection with the replica mode.')
+    parser.add_argument('--habits', type=int, default=1000, help='The number of habits of the workload.')
+    parser.add_argument('--days', type=int, default=365, help='The longest history of the workload, in days.')
+    parser.add_argument('--child', nargs=2, metavar=('DB', 'MODE'), help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.child:
+        print(json.dumps(run_mode(*arguments.child)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        workload_name = os.path.join(directory, 'workload.db')
+        generate_workload(workload_name, arguments.habits, arguments.days)
+        print(f"{arguments.habits} habits, {os.path.getsize(workload_name) / 2 ** 20:.1f} MB on disk")
+        table = {}
+        for mode in MODES:
+            db_name = os.path.join(directory, 'bench.db')
+            shutil.copyfile(workload_name, db_name)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', db_name, mode],
+                                    check=True, capture_output=True, text=True).stdout
+            table[mode] = json.loads(output)
+            os.remove(db_name)
+
+    print(f"{'':<26}" + ''.join(f"{mode:>24}" for mode in MODES))
+    for measure in table['file']:
+        print(f"{measure:<26}" + ''.join(f"{table[mode][measure]:>24.2f}" for mode in MODES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+This script compares storing completion dates as ISO-8601 text, as the database did before,
+with storing them as whole seconds since the epoch. For each format it reports the size of the database file,
+the time to load every completion as a datetime, and the time to place every completion in its daily period.
+
+Run it with:
+    python Benchmark/bench_storage.py
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+from periods import from_epoch, period_of, period_of_epoch, to_epoch
+
+HABIT_COUNT = 1000
+COMPLETIONS_PER_HABIT = 500
+
+
+def create_database(db_name: str, column_type: str, encode):
+    """
+    This function creates a database with only the completions table and its index, using the given date format.
+
+    Args:
+        db_name (str): the database file to create.
+        column_type (str): the SQL type of the completion_date column.
+        encode (function): converts a datetime to the stored value.
+    """
+    start = datetime(2020, 1, 1, 7, 30, 15, 123456)
+    connection = sqlite3.connect(db_name)
+    connection.execute(f'CREATE TABLE habit_completions (habit_name TEXT NOT NULL, completion_date {column_type})')
+    connection.execute('CREATE INDEX idx_habit_completions_habit_date ON habit_completions (habit_name, completion_date)')
+    connection.executemany(
+        'INSERT INTO habit_completions VALUES (?, ?)',
+        (
+            (f"habit {x}", encode(start + timedelta(days=day, minutes=x)))
+            for x in range(HABIT_COUNT)
+            for day in range(COMPLETIONS_PER_HABIT)
+        )
+    )
+    connection.commit()
+    connection.execute('VACUUM')
+    connection.close()
+
+
+def timed(function):
+    """
+    This function runs a function three times and returns the fastest run in seconds.
+    """
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    formats = [
+        ('ISO text', 'TEXT', lambda date: date.isoformat(), datetime.fromisoformat,
+         lambda value: period_of(datetime.fromisoformat(value), 'daily')),
+        ('epoch int', 'INTEGER', to_epoch, from_epoch,
+         lambda value: period_of_epoch(value, 'daily')),
+    ]
+    print(f"{HABIT_COUNT * COMPLETIONS_PER_HABIT} completions")
+    print(f"{'format':>10} {'size (MB)':>10} {'datetimes (s)':>14} {'periods (s)':>12}")
+    with tempfile.TemporaryDirectory() as folder:
+        for label, column_type, encode, decode, to_period in formats:
+            db_name = os.path.join(folder, f"{column_type}.db")
+            create_database(db_name, column_type, encode)
+            connection = sqlite3.connect(db_name)
+            query = 'SELECT completion_date FROM habit_completions'
+            load_time = timed(lambda: [decode(row[0]) for row in connection.execute(query)])
+            period_time = timed(lambda: [to_period(row[0]) for row in connection.execute(query)])
+            connection.close()
+            size = os.path.getsize(db_name) / 1024 / 1024
+            print(f"{label:>10} {size:>10.1f} {load_time:>14.3f} {period_time:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
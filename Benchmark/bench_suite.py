@@ -0,0 +1,182 @@
+"""
+This script runs the benchmark suite of the tracker on a synthetic workload created by workload.py,
+and saves the timings as JSON together with the workload and the environment they were measured in.
+Giving the JSON file of an earlier run with --compare prints how much each benchmark changed
+and exits with 1 if any of them got slower by more than the threshold.
+
+Run it with:
+    python Benchmark/bench_suite.py --output before.json
+    python Benchmark/bench_suite.py --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+import analysis
+from database import Database
+from name_index import NameIndex
+from workload import DEFAULT_END, generate_workload
+
+SAMPLE_SIZE = 100
+
+
+def measure(function, repeat: int):
+    """
+    This function runs a function a number of times and returns the seconds of every run.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def benchmarks(db: Database):
+    """
+    This function lists the benchmarks of the suite, each one a name and a function without arguments.
+    The habits are loaded once beforehand for the benchmarks of the Habit methods.
+    """
+    habits = db.show_all_habits()
+    sample = [habit.name for habit in habits[::max(1, len(habits) // SAMPLE_SIZE)]]
+
+    def render_table():
+        with contextlib.redirect_stdout(io.StringIO()):
+            analysis.table_of_habits(habits)
+
+    def stream_table():
+        with contextlib.redirect_stdout(io.StringIO()):
+            analysis.stream_table_of_habits(db)
+
+    suite = [
+        ('database.show_all_habits', db.show_all_habits),
+        ('database.load_habits_page', lambda: db.load_habits(limit=50, offset=len(habits) // 2)),
+        (f'database.find_habit_x{len(sample)}', lambda: [db.find_habit(name) for name in sample]),
+        (f'database.can_mark_performed_x{len(sample)}', lambda: [db.can_mark_performed(name) for name in sample]),
+        ('habit.calculate_current_streak', lambda: [habit.calculate_current_streak() for habit in habits]),
+        ('habit.calculate_longest_streak', lambda: [habit.calculate_longest_streak() for habit in habits]),
+        ('habit.can_mark_performed', lambda: [habit.can_mark_performed() for habit in habits]),
+    ]
+    suite.extend((f'analysis.show_longest_streak[{strategy}]',
+                  lambda strategy=strategy: analysis.show_longest_streak(db, strategy))
+                 for strategy in analysis.STREAK_STRATEGIES)
+    suite.append(('analysis.table_of_habits', render_table))
+    suite.append(('analysis.stream_table_of_habits', stream_table))
+    suite.append(('name_index.build', lambda: NameIndex(db.habit_names())))
+    index = db.name_index()
+    searches = [name[:len(name) // 2] for name in sample]
+    suite.append((f'name_index.search_x{len(searches)}', lambda: [index.search(text) for text in searches]))
+    return suite
+
+
+def environment():
+    """
+    This function describes where the benchmarks ran, so that runs on different machines are not compared blindly.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    This function prints the change of every benchmark against an earlier run, using the best run of each.
+
+    Returns:
+        list[str]: the benchmarks that got slower by more than the threshold.
+    """
+    if baseline.get('workload') != results['workload']:
+        print('The workloads of the two runs are different, the timings may not be comparable.')
+    regressions = []
+    print(f"{'benchmark':<44} {'before (ms)':>12} {'after (ms)':>12} {'change':>8}")
+    for name, timing in results['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before is None:
+            print(f"{name:<44} {'-':>12} {timing['best'] * 1000:>12.2f} {'new':>8}")
+            continue
+        change = timing['best'] / before['best'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  slower'
+        print(f"{name:<44} {before['best'] * 1000:>12.2f} {timing['best'] * 1000:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite of the habit tracker.')
+    parser.add_argument('--db', help='Benchmark an existing database instead of a generated workload.')
+    parser.add_argument('--habits', type=int, default=1000, help='The number of habits of the workload.')
+    parser.add_argument('--days', type=int, default=365, help='The longest history of the workload, in days.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the workload.')
+    parser.add_argument('--end', type=datetime.fromisoformat, default=DEFAULT_END,
+                        help=f'The date the histories of the workload end, by default {DEFAULT_END:%Y-%m-%d}.')
+    parser.add_argument('--repeat', type=int, default=5, help='The number of runs of each benchmark.')
+    parser.add_argument('--output', default='bench_results.json', help='The JSON file to write the results to.')
+    parser.add_argument('--compare', help='The JSON file of an earlier run to compare with.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='The slowdown that counts as a regression, by default 0.1 (10%%).')
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if arguments.db:
+            db_name = arguments.db
+            workload = {'db': os.path.abspath(db_name)}
+        else:
+            db_name = os.path.join(directory, 'workload.db')
+            workload = generate_workload(db_name, arguments.habits, arguments.days, seed=arguments.seed,
+                                         end=arguments.end)
+        db = Database(db_name=db_name, insert_predefined=False)
+        try:
+            timings = {}
+            for name, function in benchmarks(db):
+                runs = measure(function, arguments.repeat)
+                timings[name] = {
+                    'best': min(runs),
+                    'median': statistics.median(runs),
+                    'mean': statistics.fmean(runs),
+                    'runs': runs,
+                }
+                print(f"{name:<44} best {min(runs) * 1000:>10.2f} ms  median {statistics.median(runs) * 1000:>10.2f} ms")
+        finally:
+            db.exit()
+
+    results = {'environment': environment(), 'workload': workload, 'repeat': arguments.repeat,
+               'benchmarks': timings}
+    with open(arguments.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"The results were saved to '{arguments.output}'.")
+
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, arguments.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks are more than {arguments.threshold:.0%} slower.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+This script is a load generator for the HTTP API of server.py. Each client thread keeps one connection
+alive and sends a mix of requests as fast as it can, and the script reports the requests per second,
+the p50 and p99 latency of every route and the HTTP statuses received.
+
+Without --url it starts its own server on a temporary database with generated habits:
+    python Benchmark/loadgen.py --clients 16 --requests 5000
+
+To load a server that is already running:
+    python "Simple Habits/server.py" --db habits.db --port 8000
+    python Benchmark/loadgen.py --url http://127.0.0.1:8000 --clients 16 --requests 5000
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+import server
+from habit import Habit
+
+# The share of each kind of request in the mix.
+MIX = [
+    ('list', 40),
+    ('streak', 30),
+    ('show', 15),
+    ('mark', 10),
+    ('leaderboard', 5),
+]
+
+
+def percentile(sorted_values: list, fraction: float):
+    """
+    This function returns the value below which the given fraction of the sorted values fall.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def seed_database(db, habit_count: int, days: int):
+    """
+    This function fills an empty database with habits and a history of completion dates.
+    """
+    rng = random.Random(1)
+    now = datetime.now()
+    completions = []
+    for x in range(habit_count):
+        habit = Habit(f"habit {x}", rng.choice(['daily', 'weekly']), 1)
+        db.new_created_habit(habit)
+        completions.extend((habit.name, now - timedelta(days=day, hours=1)) for day in range(1, days)
+                           if rng.random() < 0.9)
+    db.add_completions_bulk(completions)
+
+
+def client(host: str, port: int, habit_names: list, count: int, seed: int, results: list):
+    """
+    This function sends a number of requests over one kept-alive connection and records the route,
+    the status and the latency of each of them.
+    """
+    rng = random.Random(seed)
+    routes, weights = zip(*MIX)
+    connection = http.client.HTTPConnection(host, port)
+    for _ in range(count):
+        route = rng.choices(routes, weights)[0]
+        name = quote(rng.choice(habit_names))
+        if route == 'list':
+            method, path = 'GET', f'/habits?limit=20&offset={rng.randrange(0, max(1, len(habit_names) - 20))}'
+        elif route == 'streak':
+            method, path = 'GET', f'/habits/{name}/streak'
+        elif route == 'show':
+            method, path = 'GET', f'/habits/{name}'
+        elif route == 'mark':
+            method, path = 'POST', f'/habits/{name}/completions'
+        else:
+            method, path = 'GET', '/leaderboard?k=10'
+        start = time.perf_counter()
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port)
+            status = 'error'
+        results.append((route, status, time.perf_counter() - start))
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the habit tracker HTTP API.')
+    parser.add_argument('--url', help='The server to load, by default a server is started on a temporary database.')
+    parser.add_argument('--clients', type=int, default=16, help='The number of concurrent connections.')
+    parser.add_argument('--requests', type=int, default=5000, help='The total number of requests.')
+    parser.add_argument('--habits', type=int, default=200, help='The habits of the temporary database.')
+    parser.add_argument('--days', type=int, default=90, help='The days of history of the temporary database.')
+    parser.add_argument('--max-concurrent', type=int, default=64, help='The limit of the temporary server.')
+    arguments = parser.parse_args()
+
+    habit_server = None
+    directory = None
+    if arguments.url:
+        url = urlsplit(arguments.url)
+        host, port = url.hostname, url.port or 80
+        connection = http.client.HTTPConnection(host, port)
+        connection.request('GET', f'/habits?limit={server.MAX_PAGE_SIZE}')
+        habit_names = [habit['name'] for habit in json.loads(connection.getresponse().read())['habits']]
+        connection.close()
+    else:
+        directory = tempfile.TemporaryDirectory()
+        habit_server = server.create_server(os.path.join(directory.name, 'loadgen.db'), port=0,
+                                            max_concurrent=arguments.max_concurrent, insert_predefined=False)
+        seed_database(habit_server.db, arguments.habits, arguments.days)
+        threading.Thread(target=habit_server.serve_forever, daemon=True).start()
+        host, port = habit_server.server_address
+        habit_names = habit_server.db.habit_names()
+
+    results = []
+    # The first clients send one request more when the requests cannot be shared equally.
+    per_client, extra = divmod(arguments.requests, arguments.clients)
+    threads = [threading.Thread(target=client,
+                                args=(host, port, habit_names, per_client + (seed < extra), seed, results))
+               for seed in range(arguments.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if habit_server is not None:
+        habit_server.shutdown()
+        habit_server.server_close()
+        habit_server.db.exit()
+        directory.cleanup()
+
+    latencies = defaultdict(list)
+    for route, _, latency in results:
+        latencies[route].append(latency)
+        latencies['all'].append(latency)
+    print(f"{len(results)} requests from {arguments.clients} clients in {elapsed:.2f} s: "
+          f"{len(results) / elapsed:.0f} requests/sec")
+    print(f"{'route':>12} {'requests':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for route in [route for route, _ in MIX] + ['all']:
+        values = sorted(latencies[route])
+        print(f"{route:>12} {len(values):>9} {percentile(values, 0.5) * 1000:>9.2f} "
+              f"{percentile(values, 0.99) * 1000:>9.2f}")
+    statuses = Counter(str(status) for _, status, _ in results)
+    print('statuses: ' + ', '.join(f"{status}={count}" for status, count in sorted(statuses.items())))
+
+
+if __name__ == '__main__':
+    main()
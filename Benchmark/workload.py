@@ -0,0 +1,169 @@
+"""
+This script creates a SQLite database with a synthetic population of habits, so the performance of the tracker
+can be measured on realistic data. The population is generated from a seed, so the same arguments always give
+the same habits and completion dates, counted back from the same end date, which is fixed unless one is given.
+
+Each habit gets a frequency, a periodicity, a history length and its own miss rate around the requested one.
+A missed period has no completions or, sometimes, fewer than the periodicity, and misses come in runs,
+the way people skip a habit for a few days, so the habits have streaks of different lengths.
+
+Run it with:
+    python Benchmark/workload.py workload.db --habits 1000 --days 365 --seed 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Simple Habits'))
+
+from database import Database
+from periods import to_epoch
+
+DEFAULT_PERIODICITIES = {1: 6, 2: 2, 3: 1}
+# The histories end on this date unless another one is given, so a seed gives the same database on any day.
+# The habits are then not current: give today's date as the end to measure current streaks.
+DEFAULT_END = datetime(2025, 1, 1)
+
+
+def generate_habits(rng: random.Random, habit_count: int, days: int, daily_share: float, periodicities: dict,
+                    miss_rate: float, end: datetime):
+    """
+    This function draws the habits of the population and their completion dates.
+
+    Args:
+        rng (random.Random): the seeded random number generator.
+        habit_count (int): the number of habits.
+        days (int): the longest history, in days before the end date.
+        daily_share (float): the share of daily habits, the others are weekly.
+        periodicities (dict[int, int]): each periodicity with its weight.
+        miss_rate (float): the average share of periods in which a habit is not completed.
+        end (datetime): the date the histories end, the first period after it is the current one.
+
+    Yields:
+        tuple[tuple, list[tuple[str, datetime]]]: the row of each habit and its completions.
+    """
+    choices, weights = zip(*periodicities.items())
+    for x in range(habit_count):
+        frequency = 'daily' if rng.random() < daily_share else 'weekly'
+        periodicity = rng.choices(choices, weights)[0]
+        # Most habits are a few months old, and a few of them are as old as the whole history.
+        history_days = max(1, min(days, int(rng.expovariate(3 / days))))
+        creation_date = end - timedelta(days=history_days, hours=rng.uniform(0, 12))
+        habit_miss_rate = min(0.95, max(0.0, rng.gauss(miss_rate, miss_rate / 2)))
+
+        name = f"habit {x:06d}"
+        completions = []
+        period_days = 1 if frequency == 'daily' else 7
+        first_day = creation_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        if frequency == 'weekly':
+            first_day += timedelta(days=-first_day.weekday() % 7)
+        missing = False
+        period_start = first_day
+        while period_start < end:
+            # A missed period is more likely right after another missed period.
+            missing = rng.random() < (min(0.9, habit_miss_rate * 4) if missing else habit_miss_rate)
+            count = periodicity
+            if missing:
+                count = rng.randrange(periodicity) if rng.random() < 0.3 else 0
+            for _ in range(count):
+                day = rng.randrange(period_days)
+                moment = period_start + timedelta(days=day, seconds=rng.randrange(6 * 3600, 23 * 3600))
+                if moment < end:
+                    completions.append((name, moment))
+            period_start += timedelta(days=period_days)
+        yield (name, frequency, periodicity, to_epoch(creation_date)), completions
+
+
+def generate_workload(db_name: str, habit_count: int = 1000, days: int = 365, daily_share: float = 0.7,
+                      periodicities: dict = None, miss_rate: float = 0.15, seed: int = 0, end: datetime = DEFAULT_END,
+                      batch_size: int = 10000):
+    """
+    This function creates a new database file and fills it with a synthetic population of habits.
+
+    Args:
+        db_name (str): the database file to create, it is replaced if it exists.
+        habit_count (int, optional): the number of habits, by default 1000.
+        days (int, optional): the longest history, in days, by default 365.
+        daily_share (float, optional): the share of daily habits, by default 0.7.
+        periodicities (dict[int, int], optional): each periodicity with its weight, by default mostly 1.
+        miss_rate (float, optional): the average share of missed periods, by default 0.15.
+        seed (int, optional): the seed of the random number generator, by default 0.
+        end (datetime, optional): the date the histories end, by default DEFAULT_END.
+        batch_size (int, optional): the number of completions in each transaction, by default 10000.
+
+    Returns:
+        dict: the arguments of the workload and the number of habits and completions created.
+    """
+    periodicities = periodicities or DEFAULT_PERIODICITIES
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+
+    rng = random.Random(seed)
+    db = Database(db_name=db_name, insert_predefined=False)
+    completion_count = 0
+    try:
+        pending = []
+        for row, completions in generate_habits(rng, habit_count, days, daily_share, periodicities, miss_rate, end):
+            db.cursor.execute('INSERT INTO habits (name, frequency, periodicity, creation_date) VALUES (?, ?, ?, ?)',
+                              row)
+            pending.extend(completions)
+            if len(pending) >= batch_size:
+                db.connection.commit()
+                db.add_completions_bulk(pending, batch_size=batch_size)
+                completion_count += len(pending)
+                pending = []
+        db.connection.commit()
+        db.add_completions_bulk(pending, batch_size=batch_size)
+        completion_count += len(pending)
+    finally:
+        db.exit()
+    return {
+        'habits': habit_count,
+        'days': days,
+        'daily_share': daily_share,
+        'periodicities': {str(periodicity): weight for periodicity, weight in periodicities.items()},
+        'miss_rate': miss_rate,
+        'seed': seed,
+        'end': end.isoformat(),
+        'completions': completion_count,
+    }
+
+
+def parse_periodicities(text: str):
+    """
+    This function reads periodicity weights written as '1:6,2:2,3:1'.
+    """
+    try:
+        return {int(periodicity): int(weight)
+                for periodicity, weight in (item.split(':') for item in text.split(','))}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"The periodicities should look like 1:6,2:2,3:1, not '{text}'.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a database with a synthetic population of habits.')
+    parser.add_argument('db_name', help='The database file to create, it is replaced if it exists.')
+    parser.add_argument('--habits', type=int, default=1000, help='The number of habits.')
+    parser.add_argument('--days', type=int, default=365, help='The longest history, in days.')
+    parser.add_argument('--daily-share', type=float, default=0.7, help='The share of daily habits.')
+    parser.add_argument('--periodicities', type=parse_periodicities, default=DEFAULT_PERIODICITIES,
+                        help='The periodicities and their weights, by default 1:6,2:2,3:1.')
+    parser.add_argument('--miss-rate', type=float, default=0.15, help='The average share of missed periods.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the random number generator.')
+    parser.add_argument('--end', type=datetime.fromisoformat, default=DEFAULT_END,
+                        help=f'The date the histories end, as YYYY-MM-DD, by default {DEFAULT_END:%Y-%m-%d}.')
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    workload = generate_workload(arguments.db_name, arguments.habits, arguments.days, arguments.daily_share,
+                                 arguments.periodicities, arguments.miss_rate, arguments.seed, arguments.end)
+    print(f"Created {workload['habits']} habits with {workload['completions']} completions in "
+          f"'{arguments.db_name}' in {time.perf_counter() - start:.1f} seconds.")
+
+
+if __name__ == '__main__':
+    main()
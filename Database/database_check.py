@@ -1,5 +1,14 @@
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
+
+def format_date(value):
+    """
+    This function shows a stored date in a readable way. Dates are stored as seconds since 1970-01-01,
+    databases that have not been opened by the program since that change still store them as text.
+    """
+    if isinstance(value, int):
+        return (datetime(1970, 1, 1) + timedelta(seconds=value)).strftime('%Y-%m-%d %H:%M:%S')
+    return value
 
 def see_database():
     """
@@ -20,7 +29,7 @@ def see_database():
 
     for habit in habits:
         name = habit[0]
-        creation_date = habit[1]
+        creation_date = format_date(habit[1])
 
         print(f"Habit name: {name}")
         print(f"Creation date: {creation_date}")
@@ -31,7 +40,7 @@ def see_database():
         if completions:
             print("Completion date")
             for completion in completions:
-                print(completion[0])
+                print(format_date(completion[0]))
         else:
             print("No completion dates.")
         print()
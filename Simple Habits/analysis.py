@@ -1,10 +1,19 @@
-from tabulate import tabulate
+import heapq
 import logging
+from datetime import datetime
+from itertools import chain, islice
 from database import Database
-from habit import Habit
+from periods import period_of, streaks_from_period_counts
 
 logger = logging.getLogger(__name__)
 
+LEADERBOARD_STREAKS = ('longest', 'current')
+STREAK_STRATEGIES = ('stored', 'sql', 'python')
+
+# The title and the width of each column of the streamed table of habits.
+HABIT_TABLE_COLUMNS = (('Name', 30), ('Creation date', 19), ('Frequency', 9), ('Periodicity', 11),
+                       ('Last time done', 19))
+
 
 def table_of_habits(habits: list):
     """
@@ -21,11 +30,13 @@ def table_of_habits(habits: list):
         print("No habits found.")
         return
 
+    # tabulate is only imported when a table is shown, so that the command line starts faster.
+    from tabulate import tabulate
     headers = ["Name", "Creation date", "Frequency", "Periodicity", "Last time done"]
     data = []
     for habit in habits:
         if habit.completion_dates:
-            last_done = max(habit.completion_dates).strftime('%Y-%m-%d %H:%M:%S')
+            last_done = habit.completion_dates[-1].strftime('%Y-%m-%d %H:%M:%S')
         else:
             last_done = "Never"
 
@@ -41,6 +52,96 @@ def table_of_habits(habits: list):
     print(tabulate(data, headers=headers, tablefmt='grid'))
 
 
+def _table_line(cells):
+    """
+    This function formats one line of the streamed table, cutting the cells that do not fit in their column.
+    """
+    formatted = []
+    for cell, (_, width) in zip(cells, HABIT_TABLE_COLUMNS):
+        text = str(cell)
+        if len(text) > width:
+            text = text[:width - 3] + '...'
+        formatted.append(text.ljust(width))
+    return '| ' + ' | '.join(formatted) + ' |'
+
+
+def render_habit_rows(rows, page_size: int = None, next_page=None, echo=print):
+    """
+    This function prints a table of habits while the rows are read, one page at a time, instead of building
+    the whole table first. The columns have fixed widths, so a page can be printed before the next one is read.
+    Each page is printed with its header, and between pages next_page is called to ask if the next one is wanted.
+
+    Args:
+        rows (Iterable[tuple]): the rows of Database.habit_rows(), the name, the creation date, the frequency,
+            the periodicity and the last completion date of each habit.
+        page_size (int, optional): the number of rows of each page, by default all rows are printed as one page.
+        next_page (Callable[[], bool], optional): called before each page after the first one,
+            the table stops when it returns False, by default every page is printed.
+        echo (Callable[[str], None], optional): prints a line, by default print.
+
+    Returns:
+        int: the number of rows printed.
+    """
+    border = '+' + '+'.join('-' * (width + 2) for _, width in HABIT_TABLE_COLUMNS) + '+'
+    header = [
+        border,
+        _table_line(title for title, _ in HABIT_TABLE_COLUMNS),
+        border.replace('-', '='),
+    ]
+    rows = iter(rows)
+    shown = 0
+    row = next(rows, None)
+    if row is None:
+        logger.info("No habits found.")
+        echo("No habits found.")
+        return 0
+
+    while row is not None:
+        if shown and next_page is not None and not next_page():
+            break
+        for line in header:
+            echo(line)
+        for row in chain([row], islice(rows, page_size - 1 if page_size else None)):
+            name, creation_date, frequency, periodicity, last_done = row
+            echo(_table_line([
+                name,
+                creation_date.strftime('%Y-%m-%d %H:%M:%S'),
+                frequency,
+                periodicity,
+                last_done.strftime('%Y-%m-%d %H:%M:%S') if last_done is not None else 'Never',
+            ]))
+            shown += 1
+        echo(border)
+        row = next(rows, None)
+    return shown
+
+
+def stream_table_of_habits(db: Database, frequency: str = None, name_prefix: str = None, sort: str = 'created',
+                           descending: bool = False, page_size: int = None, next_page=None, echo=print):
+    """
+    This function shows the table of habits with the rows streamed from the database, so that no habit
+    and no history of completions is loaded: the last time each habit was performed is read with an SQL MAX.
+    The filters and the order are applied by the database query.
+
+    Args:
+        db (Database): use the Database.
+        frequency (str, optional): only show the habits with this frequency, by default all habits.
+        name_prefix (str, optional): only show the habits whose name starts with this text.
+        sort (str, optional): 'created', 'name' or 'last_done', by default 'created'.
+        descending (bool, optional): show the habits in the reverse order, by default False.
+        page_size (int, optional): the number of rows of each page, by default a single page.
+        next_page (Callable[[], bool], optional): asks if the next page is wanted, as in render_habit_rows().
+        echo (Callable[[str], None], optional): prints a line, by default print.
+
+    Returns:
+        int: the number of habits shown.
+    """
+    rows = db.habit_rows(frequency, name_prefix, sort, descending)
+    shown = render_habit_rows(rows, page_size, next_page, echo)
+    logger.info("Streamed a table of %s habits sorted by '%s'.", shown, sort)
+    return shown
+
+
 def list_all_habits(db: Database):
     """
     This function recovers all the habits from the database.
@@ -62,89 +163,235 @@ def list_frequency(db: Database, frequency: str):
 
     Args:
         db (Database): use the Database.
-        frequency (str): desired frequency (daily or weekly).
+        frequency (str): desired frequency, for example daily, weekly or monthly.
 
     Returns:
         list[Habit]: a list of all habits with the desired frequency.
     """
     habits = db.show_frequency(frequency)
-    logger.info(f"List all habits with frequency '{frequency}'.")
+    logger.info("List all habits with frequency '%s'.", frequency)
     return habits
 
 
-def show_longest_streak(db: Database):
+def _check_strategy(strategy: str):
+    """
+    This function checks that the streak strategy is one of the supported strategies.
+    """
+    if strategy not in STREAK_STRATEGIES:
+        raise ValueError(f"The streak strategy is not correct '{strategy}'. "
+                         f"The strategy should be one of {', '.join(STREAK_STRATEGIES)}.")
+
+
+def _habit_streaks(db: Database, habit_name: str, strategy: str):
+    """
+    This function gets the current and the longest streak of a habit with the chosen strategy.
+
+    Returns:
+        tuple[int, int]: the current streak and the longest streak, or None if the habit doesn't exist.
+    """
+    _check_strategy(strategy)
+    if strategy == 'stored':
+        return db.get_streaks(habit_name)
+    elif strategy == 'sql':
+        return db.sql_streaks(habit_name).get(habit_name)
+    habit = db.find_habit(habit_name)
+    if habit is None:
+        return None
+    return habit.calculate_current_streak(), habit.calculate_longest_streak()
+
+
+def show_longest_streak(db: Database, strategy: str = 'stored'):
     """
     This function searches and finds the habit that has the longest streak among all the habits in the database.
+    If several habits have the same streak, the one created first is chosen.
 
     Args:
         db (Database): use the Database.
+        strategy (str, optional): how the streaks are calculated, by default 'stored'.
+            'stored' reads the streak state kept in the database, 'sql' calculates the streaks inside SQLite,
+            and 'python' loads every habit with its completion dates and uses the Habit class.
 
     Returns:
         Habit: the habit with the longest streak, or None if no habits have been performed or there are no habits.
     """
-    habits = db.show_all_habits()
-    if not habits:
-        logger.info("No habits yet done.")
-        return None
-
-    # Calculate longest streaks for all habits
+    _check_strategy(strategy)
     max_streak = 0
-    max_habit = None
-    for habit in habits:
-        longest_streak = habit.calculate_longest_streak()
-        if longest_streak > max_streak:
-            max_streak = longest_streak
-            max_habit = habit
-
-    if max_habit:
-        logger.info(f"The habit '{max_habit.name}' has the longest streak of {max_streak}.")
-        return max_habit
+    max_habit_name = None
+    if strategy == 'stored':
+        leader = db.longest_streak_leader()
+        if leader:
+            max_habit_name, max_streak = leader
+    elif strategy == 'sql':
+        for habit_name, (_, longest_streak) in db.sql_streaks().items():
+            if longest_streak > max_streak:
+                max_streak = longest_streak
+                max_habit_name = habit_name
+    else:
+        for habit in db.show_all_habits():
+            longest_streak = habit.calculate_longest_streak()
+            if longest_streak > max_streak:
+                max_streak = longest_streak
+                max_habit_name = habit.name
+
+    if max_habit_name:
+        logger.info("The habit '%s' has the longest streak of %s.", max_habit_name, max_streak)
+        return db.find_habit(max_habit_name)
     else:
         logger.info("No habit has any streak.")
         return None
 
 
-def longest_streak_for_habit(db: Database, habit_name: str):
+def longest_streak_for_habit(db: Database, habit_name: str, strategy: str = 'stored'):
     """
     This function searches and finds the longest streak for a specific habit.
 
     Args:
         db (Database): use the Database.
         habit_name (str): the name of the desired habit.
+        strategy (str, optional): how the streak is calculated, 'stored', 'sql' or 'python', by default 'stored'.
 
     Returns:
         int: the longest streak for the specified habit, or None if the habit doesn't exist.
     """
-    habit = db.find_habit(habit_name)
-    if habit:
-        longest_streak = habit.calculate_longest_streak()
-        logger.info(f"The longest streak for the habit '{habit.name}' is {longest_streak}.")
+    streaks = _habit_streaks(db, habit_name, strategy)
+    if streaks:
+        longest_streak = streaks[1]
+        logger.info("The longest streak for the habit '%s' is %s.", habit_name, longest_streak)
         return longest_streak
     else:
-        logger.info(f"No habit '{habit_name}' found.")
+        logger.info("No habit '%s' found.", habit_name)
+        return None
+
+
+def current_streak_for_habit(db: Database, habit_name: str, strategy: str = 'stored'):
+    """
+    This function searches and finds the current streak for a specific habit.
+
+    Args:
+        db (Database): use the Database.
+        habit_name (str): the name of the desired habit.
+        strategy (str, optional): how the streak is calculated, 'stored', 'sql' or 'python', by default 'stored'.
+
+    Returns:
+        int: the current streak for the specified habit, or None if the habit doesn't exist.
+    """
+    streaks = _habit_streaks(db, habit_name, strategy)
+    if streaks:
+        current_streak = streaks[0]
+        logger.info("The current streak for the habit '%s' is %s.", habit_name, current_streak)
+        return current_streak
+    else:
+        logger.info("No habit '%s' found.", habit_name)
         return None
 
 
-def display_completion_dates(habit: Habit):
+def _top_streaks(items, k: int):
+    """
+    This function keeps the k habits with the highest streaks, breaking ties by the habit name.
+
+    Args:
+        items (iterable[tuple[str, int]]): the habit names and their streaks.
+        k (int): the number of habits to keep.
+
+    Returns:
+        list[tuple[str, int]]: at most k habit names and streaks, from the highest streak to the lowest.
+    """
+    return heapq.nsmallest(k, items, key=lambda item: (-item[1], item[0]))
+
+
+def _leaderboard_chunk(db_name: str, habit_names: list, k: int, by: str):
+    """
+    This function calculates the streaks of a chunk of habits and keeps the top k of them.
+    It runs in a worker process, so it opens its own connection to the database.
+
+    Args:
+        db_name (str): the name of the database file.
+        habit_names (list[str]): the habits of this chunk.
+        k (int): the number of habits to keep.
+        by (str): the streak to rank by, 'longest' or 'current'.
+
+    Returns:
+        list[tuple[str, int]]: at most k habit names and streaks, from the highest streak to the lowest.
+    """
+    db = Database(db_name=db_name, insert_predefined=False)
+    try:
+        habits = db.habit_period_counts(habit_names)
+    finally:
+        db.exit()
+    # The streaks are calculated from the number of completions in each period, not from the completion dates.
+    now = datetime.now()
+    index = 1 if by == 'longest' else 0
+    streaks = ((name, streaks_from_period_counts(period_counts, periodicity, period_of(now, frequency))[index])
+               for name, frequency, periodicity, period_counts in habits)
+    return _top_streaks(((name, streak) for name, streak in streaks if streak > 0), k)
+
+
+def streak_leaderboard(db: Database, k: int = 10, by: str = 'longest', frequency: str = None,
+                       workers: int = None, chunk_size: int = 1000):
+    """
+    This function finds the k habits with the highest longest or current streak.
+    The habits are split in chunks that are calculated in parallel by a pool of processes,
+    each chunk keeps only its own top k, and the partial results are merged into the final top k.
+
+    Args:
+        db (Database): use the Database, it must be stored in a file so the worker processes can open it.
+        k (int, optional): the number of habits in the leaderboard, by default 10.
+        by (str, optional): the streak to rank by, 'longest' or 'current', by default 'longest'.
+        frequency (str, optional): only rank the habits with this frequency, by default all habits.
+        workers (int, optional): the number of worker processes, by default one per CPU.
+            With 1 worker the chunks are calculated in this process.
+        chunk_size (int, optional): the number of habits in each chunk, by default 1000.
+
+    Returns:
+        list[tuple[str, int]]: the names and streaks of at most k habits with a streak,
+        from the highest streak to the lowest, ties ordered by name.
+    """
+    if by not in LEADERBOARD_STREAKS:
+        raise ValueError(f"The streak is not correct '{by}'. The streak should be longest or current.")
+    if k < 1 or chunk_size < 1:
+        raise ValueError("The leaderboard size and the chunk size must be at least 1.")
+
+    # The worker processes open their own connections, so the completions queued in write-behind mode are written first.
+    db.flush()
+    habit_names = db.habit_names(frequency)
+    chunks = [habit_names[x:x + chunk_size] for x in range(0, len(habit_names), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        partial_results = [_leaderboard_chunk(db.db_name, chunk, k, by) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partial_results = list(executor.map(
+                _leaderboard_chunk,
+                [db.db_name] * len(chunks), chunks, [k] * len(chunks), [by] * len(chunks)
+            ))
+
+    leaderboard = _top_streaks(chain.from_iterable(partial_results), k)
+    logger.info("The leaderboard of the %s streaks has %s habits from %s chunks.", by, len(leaderboard), len(chunks))
+    return leaderboard
+
+
+def display_completion_dates(db: Database, habit_name: str, limit: int = 7):
     """
     This feature shows the user the last seven completion dates for a specific habit.
+    Only those dates are read from the database, not the whole history of the habit.
 
     Args:
-        habit (Habit): the habit to which completion dates are to be seen.
+        db (Database): use the Database.
+        habit_name (str): the name of the habit to which completion dates are to be seen.
+        limit (int, optional): the number of completion dates to show, by default 7.
 
     """
-    if not habit.completion_dates:
-        logger.info(f"There are no completion dates for habit '{habit.name}'.")
-        print(f"There are no completion dates for habit '{habit.name}'.")
+    last_dates = db.latest_completions(habit_name, limit)
+    if not last_dates:
+        logger.info("There are no completion dates for habit '%s'.", habit_name)
+        print(f"There are no completion dates for habit '{habit_name}'.")
         return
 
-    sorted_dates = sorted(habit.completion_dates)
-    last_seven_dates = sorted_dates[-7:]
-
+    from tabulate import tabulate
     headers = ["Completion Dates"]
-    data = [[date.strftime('%Y-%m-%d %H:%M:%S')] for date in last_seven_dates]
-    print(f"Last completion dates for habit '{habit.name}':")
+    data = [[date.strftime('%Y-%m-%d %H:%M:%S')] for date in reversed(last_dates)]
+    print(f"Last completion dates for habit '{habit_name}':")
     print(tabulate(data, headers=headers, tablefmt='grid'))
-    logger.info(f"The last seven end dates for the habit '{habit.name}' are shown.")
+    logger.info("The last %s end dates for the habit '%s' are shown.", len(last_dates), habit_name)
 
 
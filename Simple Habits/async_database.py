@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import analysis
+from database import Database
+from habit import Habit
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """
+    A class to use the database from asyncio code without blocking the event loop.
+    It has the same methods as Database, as coroutines. The work runs on a dedicated pool of threads,
+    each with its own connection, and at most max_pending operations are queued or running at a time,
+    further callers wait for a free place.
+
+    Identical reads that are requested while one of them is still running are coalesced: they wait for the
+    same result instead of querying the database again, so they also share the same Habit objects.
+    A write makes the reads requested after it query the database again.
+
+    Attributes:
+        db (Database): the pooled Database that runs the operations.
+        coalesce_reads (bool): whether identical concurrent reads are coalesced.
+    """
+
+    def __init__(self, db_name='habits.db', insert_predefined=True, max_workers=4, max_pending=256,
+                 coalesce_reads=True):
+        """
+        Opens the database and starts the threads that run the operations.
+
+        Args:
+            db_name (str, optional): give the name to the database, by default it is 'habits.db'.
+            insert_predefined (bool, optional): add the predefined habits if they have not been added yet.
+            max_workers (int, optional): the number of threads running operations, by default 4.
+            max_pending (int, optional): the number of operations that can be queued or running, by default 256.
+            coalesce_reads (bool, optional): coalesce identical concurrent reads, by default True.
+        """
+        self.db = Database(db_name=db_name, insert_predefined=insert_predefined, pooled=True)
+        self.coalesce_reads = coalesce_reads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='habits-db')
+        self._pending = asyncio.Semaphore(max_pending)
+        self._reads = {}
+
+    async def _run(self, function, *args, **kwargs):
+        """
+        This method runs a blocking function on the threads of the database, once there is a free place in the queue.
+        """
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def _read(self, function, *args, **kwargs):
+        """
+        This method runs a function that only reads from the database. If the same read is already running,
+        it waits for that result instead.
+        """
+        if not self.coalesce_reads:
+            return await self._run(function, *args, **kwargs)
+        key = (function, args, tuple(sorted(kwargs.items())))
+        future = self._reads.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(function, *args, **kwargs))
+            self._reads[key] = future
+            future.add_done_callback(lambda done: self._reads.pop(key) if self._reads.get(key) is done else None)
+        # The read is shielded so that a caller that is cancelled does not cancel it for the other callers.
+        return await asyncio.shield(future)
+
+    async def _write(self, function, *args, **kwargs):
+        """
+        This method runs a function that changes the database. The reads requested from now on are not
+        coalesced with the reads that started before this write.
+        """
+        self._reads.clear()
+        return await self._run(function, *args, **kwargs)
+
+    async def new_created_habit(self, habit: Habit):
+        """
+        This method adds a new habit to the database, see Database.new_created_habit().
+        """
+        return await self._write(self.db.new_created_habit, habit)
+
+    async def add_completion(self, habit_name: str, completion_date: datetime):
+        """
+        This method adds the date of completion of a habit, see Database.add_completion().
+        """
+        return await self._write(self.db.add_completion, habit_name, completion_date)
+
+    async def delete_habit(self, habit_name: str):
+        """
+        This method removes a habit from the database, see Database.delete_habit().
+        """
+        return await self._write(self.db.delete_habit, habit_name)
+
+    async def find_habit(self, habit_name: str):
+        """
+        This method finds a specific habit in the database, see Database.find_habit().
+        """
+        return await self._read(self.db.find_habit, habit_name)
+
+    async def show_all_habits(self):
+        """
+        This method shows all the habits in the database, see Database.show_all_habits().
+        """
+        return await self._read(self.db.show_all_habits)
+
+    async def show_frequency(self, frequency: str):
+        """
+        This method shows the habits with a specific frequency, see Database.show_frequency().
+        """
+        return await self._read(self.db.show_frequency, frequency)
+
+    async def exit(self):
+        """
+        Wait for the running operations, stop the threads and close the database connections.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self.db.exit()
+        logger.info("The asynchronous database '%s' is closed.", self.db.db_name)
+
+
+async def list_all_habits(adb: AsyncDatabase):
+    """
+    This function recovers all the habits from the database, see analysis.list_all_habits().
+    """
+    return await adb._read(analysis.list_all_habits, adb.db)
+
+
+async def list_frequency(adb: AsyncDatabase, frequency: str):
+    """
+    This function retrieves the habits with a frequency, see analysis.list_frequency().
+    """
+    return await adb._read(analysis.list_frequency, adb.db, frequency)
+
+
+async def show_longest_streak(adb: AsyncDatabase, strategy: str = 'stored'):
+    """
+    This function finds the habit with the longest streak, see analysis.show_longest_streak().
+    """
+    return await adb._read(analysis.show_longest_streak, adb.db, strategy)
+
+
+async def longest_streak_for_habit(adb: AsyncDatabase, habit_name: str, strategy: str = 'stored'):
+    """
+    This function finds the longest streak for a specific habit, see analysis.longest_streak_for_habit().
+    """
+    return await adb._read(analysis.longest_streak_for_habit, adb.db, habit_name, strategy)
+
+
+async def current_streak_for_habit(adb: AsyncDatabase, habit_name: str, strategy: str = 'stored'):
+    """
+    This function finds the current streak for a specific habit, see analysis.current_streak_for_habit().
+    """
+    return await adb._read(analysis.current_streak_for_habit, adb.db, habit_name, strategy)
+
+
+async def streak_leaderboard(adb: AsyncDatabase, k: int = 10, by: str = 'longest', frequency: str = None,
+                             workers: int = None, chunk_size: int = 1000):
+    """
+    This function finds the k habits with the highest streaks, see analysis.streak_leaderboard().
+    """
+    return await adb._read(analysis.streak_leaderboard, adb.db, k=k, by=by, frequency=frequency,
+                           workers=workers, chunk_size=chunk_size)
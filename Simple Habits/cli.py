@@ -0,0 +1,190 @@
+import click
+import json
+import logging
+from datetime import datetime
+import analysis
+from database import Database, HABIT_ROW_SORTS
+from habit import Habit
+from periods import FREQUENCY_HELP, normalize_frequency
+
+logger = logging.getLogger(__name__)
+
+
+class FrequencyType(click.ParamType):
+    """
+    A command line parameter for the frequency of a habit, given as it is stored, see periods.normalize_frequency().
+    """
+
+    name = 'frequency'
+
+    def convert(self, value, param, ctx):
+        try:
+            return normalize_frequency(value)
+        except ValueError:
+            self.fail(f"'{value}' is not a frequency, use {FREQUENCY_HELP}.", param, ctx)
+
+
+FREQUENCY = FrequencyType()
+
+
+def get_db():
+    """
+    This function opens the database the first time a command needs it, so that commands like --help
+    do not touch the database. The database is closed when the command line finishes.
+
+    Returns:
+        Database: the database chosen with --db.
+    """
+    ctx = click.get_current_context().find_root()
+    db = ctx.meta.get('db')
+    if db is None:
+        db = Database(db_name=ctx.params['db_name'])
+        ctx.meta['db'] = db
+        ctx.call_on_close(db.exit)
+    return db
+
+
+def emit(data, text: str):
+    """
+    This function writes the result of a command, as JSON when --json is given and as text otherwise.
+    """
+    if click.get_current_context().find_root().params['output_json']:
+        click.echo(json.dumps(data))
+    else:
+        click.echo(text)
+
+
+@click.group()
+@click.option('--db', 'db_name', default='habits.db', show_default=True, help='The database file to use.')
+@click.option('--json', 'output_json', is_flag=True, help='Write the results as JSON.')
+@click.option('--profile', is_flag=True, help='Write a summary of the time spent in the database and the analysis '
+                                               'to stderr when the command finishes.')
+@click.option('--pstats', 'pstats_file', type=click.Path(dir_okay=False), default=None,
+              help='Also save a cProfile of the command to this file, implies --profile.')
+def cli(db_name, output_json, profile, pstats_file):
+    """
+    Track habits from scripts: each command does one thing and exits, with a non-zero exit code on failure.
+    """
+    if profile or pstats_file:
+        # The instrumentation is only imported when it is used, so that it does not slow down the start.
+        import instrumentation
+        instrumentation.start_profile(pstats_file)
+        ctx = click.get_current_context()
+        ctx.call_on_close(lambda: instrumentation.stop_profile(click.get_text_stream('stderr')))
+
+
+@cli.command()
+@click.argument('name')
+@click.option('--frequency', '-f', type=FREQUENCY, required=True,
+              help=f'How often the habit should be performed: {FREQUENCY_HELP}.')
+@click.option('--periodicity', '-p', type=click.IntRange(1, 20), default=1, show_default=True,
+              help='The number of times the habit should be performed in each period.')
+def add(name, frequency, periodicity):
+    """
+    Create the habit NAME.
+    """
+    name = name.strip()
+    if not name or name.isdigit():
+        raise click.BadParameter('Please enter a valid name.', param_hint='NAME')
+    habit = Habit(name=name, frequency=frequency, periodicity=periodicity)
+    if not get_db().new_created_habit(habit):
+        raise click.ClickException(f"The habit '{name}' already exists.")
+    emit(habit.to_dict(), f"The habit '{name}' was created.")
+
+
+@cli.command()
+@click.argument('name')
+def done(name):
+    """
+    Mark the habit NAME as performed now.
+    """
+    db = get_db()
+    can_mark = db.can_mark_performed(name)
+    if can_mark is None:
+        raise click.ClickException(f"The habit '{name}' does not exist.")
+    if not can_mark:
+        raise click.ClickException(f"You have already completed '{name}' according to its periodicity.")
+    completion_date = datetime.now()
+    db.add_completion(name, completion_date)
+    emit({'name': name, 'completion_date': completion_date.isoformat()}, f"The habit '{name}' was marked as done.")
+
+
+@cli.command('list')
+@click.option('--frequency', '-f', type=FREQUENCY, default=None, help='Only list the habits with this frequency.')
+@click.option('--prefix', 'name_prefix', default=None, help='Only list the habits whose name starts with this text.')
+@click.option('--sort', type=click.Choice(list(HABIT_ROW_SORTS)), default='created', show_default=True,
+              help='The order of the habits.')
+@click.option('--desc', 'descending', is_flag=True, help='List the habits in the reverse order.')
+def list_habits(frequency, name_prefix, sort, descending):
+    """
+    List the habits with their frequency, periodicity and last completion date.
+    """
+    db = get_db()
+    if click.get_current_context().find_root().params['output_json']:
+        # The same rows as the table, with the keys of Habit.to_dict(), without loading the completions.
+        counts = db.completion_counts()
+        click.echo(json.dumps([{
+            'name': name,
+            'frequency': frequency_,
+            'periodicity': periodicity,
+            'creation_date': creation_date.isoformat(),
+            'last_completion_date': last_done.isoformat() if last_done else None,
+            'completions': counts.get(name, 0)
+        } for name, creation_date, frequency_, periodicity, last_done
+            in db.habit_rows(frequency, name_prefix, sort, descending)]))
+    else:
+        analysis.stream_table_of_habits(db, frequency, name_prefix, sort, descending, echo=click.echo)
+
+
+@cli.command('streak')
+@click.argument('name')
+@click.option('--strategy', type=click.Choice(analysis.STREAK_STRATEGIES), default='stored', show_default=True,
+              help='How the streaks are calculated.')
+def show_streak(name, strategy):
+    """
+    Show the current and the longest streak of the habit NAME.
+    """
+    db = get_db()
+    longest_streak = analysis.longest_streak_for_habit(db, name, strategy)
+    if longest_streak is None:
+        raise click.ClickException(f"The habit '{name}' does not exist.")
+    current_streak = analysis.current_streak_for_habit(db, name, strategy)
+    emit({'name': name, 'current_streak': current_streak, 'longest_streak': longest_streak},
+         f"The habit '{name}' has a current streak of {current_streak} and a longest streak of {longest_streak}.")
+
+
+@cli.command()
+@click.argument('name')
+@click.option('-n', 'limit', type=click.IntRange(1), default=7, show_default=True,
+              help='The number of completion dates to show.')
+@click.option('--before', type=click.DateTime(), default=None,
+              help='Only show completion dates before this date, to see older pages of the history.')
+def history(name, limit, before):
+    """
+    Show the latest completion dates of the habit NAME, from the newest to the oldest.
+    """
+    dates = get_db().latest_completions(name, limit, before)
+    lines = [date.strftime('%Y-%m-%d %H:%M:%S') for date in dates]
+    emit([date.isoformat() for date in dates],
+         '\n'.join(lines) if lines else f"There are no completion dates for habit '{name}'.")
+
+
+@cli.command()
+@click.option('-k', type=click.IntRange(1), default=10, show_default=True, help='The number of habits to show.')
+@click.option('--by', type=click.Choice(analysis.LEADERBOARD_STREAKS), default='longest', show_default=True,
+              help='The streak to rank the habits by.')
+@click.option('--frequency', '-f', type=FREQUENCY, default=None, help='Only rank the habits with this frequency.')
+def top(k, by, frequency):
+    """
+    Show the habits with the highest streaks.
+    """
+    leaderboard = analysis.streak_leaderboard(get_db(), k=k, by=by, frequency=frequency)
+    lines = [f"{position}. {name}: {streak}" for position, (name, streak) in enumerate(leaderboard, start=1)]
+    emit([{'name': name, 'streak': streak} for name, streak in leaderboard],
+         '\n'.join(lines) if lines else 'No habit has any streak.')
+
+
+if __name__ == '__main__':
+    import logconfig
+    logconfig.configure_logging()
+    cli()
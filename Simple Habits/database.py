@@ -1,71 +1,543 @@
+import atexit
 import sqlite3
 import logging
+import threading
+import time
+from collections import Counter, defaultdict
 from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
 from habit import Habit
+from name_index import NameIndex
+from periods import from_epoch, period_engine, period_of, period_of_epoch, to_epoch
+from replica import DiskWriter, ReplicaConnection
 
 logger = logging.getLogger(__name__)
 
 
+def _sql_period(date_column: str, frequency_column: str, frequencies=('daily', 'weekly')):
+    """
+    This function builds the SQL expression that finds the period of a stored date, the same number as
+    periods.period_of_epoch(), for the habits of the given frequencies. Each frequency gives its own expression
+    from its PeriodEngine, so the periods of the database and of the Habit class are always the same.
+    """
+    if not frequencies:
+        return 'NULL'
+    cases = ' '.join(f"WHEN '{engine.frequency}' THEN {engine.sql_period(date_column)}"
+                     for engine in map(period_engine, frequencies))
+    return f"(CASE {frequency_column} {cases} END)"
+
+
+def _raw_period_counts_query(frequencies=('daily', 'weekly')):
+    """
+    This function builds the query that counts the completions of each habit in each period
+    from the raw completion dates, for the habits of the given frequencies.
+    """
+    return f'''
+SELECT c.habit_name, {_sql_period('c.completion_date', 'h.frequency', frequencies)} AS period, COUNT(*) AS count
+FROM habit_completions AS c
+JOIN habits AS h ON h.name = c.habit_name
+'''
+
+
+# Counts the completions of each habit in each period from the raw completion dates. Before the period engines,
+# daily and weekly were the only frequencies, so this is the query of the migration that created the counts.
+RAW_PERIOD_COUNTS_QUERY = _raw_period_counts_query()
+
+# The schema is built by these migrations, applied in order. The number of migrations applied
+# is stored in PRAGMA user_version, so a new schema change is always added at the end of the list.
+SCHEMA_MIGRATIONS = [
+    # 1. The habits and their completion dates.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS habits (
+            name TEXT PRIMARY KEY,
+            frequency TEXT,
+            periodicity INTEGER,
+            creation_date TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS habit_completions (
+            habit_name TEXT,
+            completion_date TEXT,
+            FOREIGN KEY(habit_name) REFERENCES habits(name)
+        )
+        ''',
+    ],
+    # 2. Completions are deleted together with their habit, and indexed to find the completions of a habit.
+    [
+        '''
+        CREATE TABLE habit_completions_new (
+            habit_name TEXT NOT NULL,
+            completion_date TEXT,
+            FOREIGN KEY(habit_name) REFERENCES habits(name) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        INSERT INTO habit_completions_new (habit_name, completion_date)
+        SELECT habit_name, completion_date FROM habit_completions
+        WHERE habit_name IN (SELECT name FROM habits)
+        ORDER BY rowid
+        ''',
+        'DROP TABLE habit_completions',
+        'ALTER TABLE habit_completions_new RENAME TO habit_completions',
+        '''
+        CREATE INDEX idx_habit_completions_habit_date
+        ON habit_completions (habit_name, completion_date)
+        ''',
+    ],
+    # 3. The streak state of each habit, kept up to date on every completion.
+    [
+        '''
+        CREATE TABLE habit_streaks (
+            habit_name TEXT PRIMARY KEY,
+            current_period INTEGER NOT NULL,
+            current_count INTEGER NOT NULL,
+            last_eligible_period INTEGER,
+            current_streak INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL,
+            previous_eligible_period INTEGER,
+            previous_streak INTEGER NOT NULL,
+            previous_longest INTEGER NOT NULL,
+            FOREIGN KEY(habit_name) REFERENCES habits(name) ON DELETE CASCADE
+        )
+        ''',
+        'CREATE INDEX idx_habit_streaks_longest ON habit_streaks (longest_streak)',
+    ],
+    # 4. Dates are stored as whole seconds since 1970-01-01 instead of ISO-8601 text.
+    [
+        '''
+        CREATE TABLE habits_new (
+            name TEXT PRIMARY KEY,
+            frequency TEXT,
+            periodicity INTEGER,
+            creation_date INTEGER
+        )
+        ''',
+        '''
+        INSERT INTO habits_new (name, frequency, periodicity, creation_date)
+        SELECT name, frequency, periodicity, CAST(strftime('%s', creation_date) AS INTEGER) FROM habits
+        ORDER BY rowid
+        ''',
+        '''
+        CREATE TABLE habit_completions_new (
+            habit_name TEXT NOT NULL,
+            completion_date INTEGER NOT NULL,
+            FOREIGN KEY(habit_name) REFERENCES habits(name) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        INSERT INTO habit_completions_new (habit_name, completion_date)
+        SELECT habit_name, CAST(strftime('%s', completion_date) AS INTEGER) FROM habit_completions
+        ORDER BY rowid
+        ''',
+        'DROP TABLE habit_completions',
+        'DROP TABLE habits',
+        'ALTER TABLE habits_new RENAME TO habits',
+        'ALTER TABLE habit_completions_new RENAME TO habit_completions',
+        '''
+        CREATE INDEX idx_habit_completions_habit_date
+        ON habit_completions (habit_name, completion_date)
+        ''',
+    ],
+    # 5. The number of completions of each habit in each period, kept up to date on every change.
+    [
+        '''
+        CREATE TABLE habit_period_counts (
+            habit_name TEXT NOT NULL,
+            period INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (habit_name, period),
+            FOREIGN KEY(habit_name) REFERENCES habits(name) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        ''',
+        'INSERT INTO habit_period_counts (habit_name, period, count) '
+        + RAW_PERIOD_COUNTS_QUERY + ' GROUP BY c.habit_name, period',
+    ],
+]
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+STREAK_COLUMNS = (
+    'current_period',
+    'current_count',
+    'last_eligible_period',
+    'current_streak',
+    'longest_streak',
+    'previous_eligible_period',
+    'previous_streak',
+    'previous_longest',
+)
+
+# The orders of Database.habit_rows(), each one the expression it sorts by. The habits that were never performed
+# come first when sorting by the last completion, as the smallest integer SQLite can store.
+# The last completion date of the habit h of a query, read from the end of its entries in the completion index.
+LAST_DONE = 'SELECT MAX(c.completion_date) FROM habit_completions AS c WHERE c.habit_name = h.name'
+
+HABIT_ROW_SORTS = {
+    'created': 'h.rowid',
+    'name': 'h.name',
+    'last_done': 'COALESCE(last_done, -9223372036854775808)',
+}
+
+
+def _advance_streak_state(state: dict, period: int, periodicity: int):
+    """
+    This function updates the streak state of a habit with one more completion in the given period.
+    A period is eligible when the habit was performed exactly the periodicity number of times in it,
+    so the state also remembers the streaks from before the current period became eligible,
+    in case one more completion makes it not eligible again.
+
+    Args:
+        state (dict): the streak state of the habit, or None if the habit has no completions yet.
+        period (int): the period of the new completion.
+        periodicity (int): the number of times the habit should be performed in each period.
+
+    Returns:
+        dict: the new streak state, or None if the period is older than the current period,
+        in which case the state has to be rebuilt from all the completions.
+    """
+    if state is None:
+        state = {
+            'current_period': period,
+            'current_count': 0,
+            'last_eligible_period': None,
+            'current_streak': 0,
+            'longest_streak': 0,
+            'previous_eligible_period': None,
+            'previous_streak': 0,
+            'previous_longest': 0,
+        }
+    elif period < state['current_period']:
+        return None
+    elif period > state['current_period']:
+        state = dict(state, current_period=period, current_count=0)
+    else:
+        state = dict(state)
+
+    state['current_count'] += 1
+    if state['current_count'] == periodicity:
+        state['previous_eligible_period'] = state['last_eligible_period']
+        state['previous_streak'] = state['current_streak']
+        state['previous_longest'] = state['longest_streak']
+        if state['last_eligible_period'] == period - 1:
+            state['current_streak'] += 1
+        else:
+            state['current_streak'] = 1
+        state['last_eligible_period'] = period
+        state['longest_streak'] = max(state['longest_streak'], state['current_streak'])
+    elif state['current_count'] == periodicity + 1:
+        state['last_eligible_period'] = state['previous_eligible_period']
+        state['current_streak'] = state['previous_streak']
+        state['longest_streak'] = state['previous_longest']
+    return state
+
+
 class Database:
     """
     A class to create the database and manage the application information.
     It contains the methods to perform all the necessary operations with the database.
 
+    Every method uses its own short-lived cursor. In pooled mode each thread gets its own connection,
+    so the same Database can serve concurrent readers while a writer commits.
+
+    In write-behind mode add_completion() only queues the completion in memory, and the queue is written
+    in one transaction when it holds flush_size completions or its oldest completion is flush_interval
+    seconds old, before any method that reads completions or streaks, and on exit().
+    Durability: a completion is only on disk once its queue has been flushed. If the process crashes,
+    the completions still in the queue are lost, that is at most flush_size - 1 completions or
+    flush_interval seconds of them. A flush is atomic, the whole queue and its streaks are committed together
+    or not at all, so the database never holds part of a flush. When the interpreter exits normally
+    the queue is also flushed. Without pooled mode the connection can only be used by its own thread,
+    so the time threshold is checked when the Database is next used instead of by a timer.
+
+    In replica mode the file is copied into an in-memory database when the Database is opened, and every method
+    reads and writes that copy. Each committed transaction is then run again on the file, at once or, with
+    async_replica, by a background thread, so reads never touch the disk. Durability with async_replica is the
+    same trade as write-behind: the transactions still queued for the file are lost if the process crashes.
+    Changes made to the file by other connections are seen through PRAGMA data_version, checked at most every
+    refresh_interval seconds, and the copy is then loaded again. A change made to the file by another connection
+    and a transaction of the copy queued before it is written are not merged: the copy is reloaded from the file
+    after the queue is written, so the last write on the file wins.
+
     Attributes:
         db_name (str): name of the SQLite database file.
-        connection (sqlite3.Connection): SQLite database connection object.
-        cursor (sqlite3.Cursor): cursor object for executing SQL commands.
+        pooled (bool): whether each thread has its own connection.
+        busy_timeout (int): milliseconds a connection waits for a lock held by another connection.
+        write_behind (bool): whether completions are queued and written in batches.
+        flush_size (int): the number of queued completions that are written at once.
+        flush_interval (float): the seconds a completion can wait in the queue.
+        replica (bool): whether reads and writes use an in-memory copy of the file.
+        refresh_interval (float): the seconds between two checks of the file for changes in replica mode.
+        connection (sqlite3.Connection): SQLite database connection object of the calling thread.
+        cursor (sqlite3.Cursor): cursor object of the calling thread for executing SQL commands.
     """
 
-    def __init__(self, db_name='habits.db', insert_predefined=True):
+    def __init__(self, db_name='habits.db', insert_predefined=True, pooled=False, busy_timeout=5000,
+                 write_behind=False, flush_size=100, flush_interval=1.0, replica=False, async_replica=False,
+                 refresh_interval=1.0):
         """
         Initializes the connection to the database and provides the necessary tables.
 
         Args:
             db_name (str, optional): give the name to the database, by default it is 'habits.db'.
             insert_predefined (bool, optional): add the predefined habits if they have not been added yet
+            pooled (bool, optional): give each thread its own connection, by default False.
+                The database is switched to WAL journaling so that readers do not wait for a writer.
+            busy_timeout (int, optional): milliseconds to wait for a lock held by another connection,
+                by default 5000.
+            write_behind (bool, optional): queue the completions and write them in batches, by default False.
+            flush_size (int, optional): in write-behind mode, write the queue when it has this number of
+                completions, by default 100.
+            flush_interval (float, optional): in write-behind mode, write the queue when its oldest completion
+                has waited this number of seconds, by default 1.0.
+            replica (bool, optional): serve reads and writes from an in-memory copy of the file and write every
+                transaction to the file too, by default False. It cannot be used with pooled connections.
+            async_replica (bool, optional): in replica mode, write the transactions to the file from a background
+                thread, by default False.
+            refresh_interval (float, optional): in replica mode, check the file for changes of other connections
+                at most every this number of seconds, by default 1.0, 0 to check before every use.
         """
+        if write_behind and (flush_size < 1 or flush_interval <= 0):
+            raise ValueError("The flush size must be at least 1 and the flush interval must be positive.")
+        if replica and pooled:
+            raise ValueError("The replica mode cannot be used with pooled connections.")
+        if replica and refresh_interval < 0:
+            raise ValueError("The refresh interval cannot be negative.")
         self.db_name = db_name
-        self.connection = sqlite3.connect(self.db_name)
-        self.cursor = self.connection.cursor()
-        logger.info(f"The database connection is '{self.db_name}'")
-        self.create_tables()
+        self.pooled = pooled
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.write_behind = write_behind
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_since = None
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.RLock()
+        self._flush_timer = None
+        self._name_index = None
+        self._name_index_lock = threading.Lock()
+        self.replica = replica
+        self.refresh_interval = refresh_interval
+        self._disk_writer = None
+        self._data_version = None
+        self._disk_errors = 0
+        self._replica_checked = 0.0
+        self._connection = None if pooled else self._connect()
+        logger.info("The database connection is '%s'", self.db_name)
+        if write_behind:
+            atexit.register(self._flush_at_exit)
+        self.migrate()
         if insert_predefined:
             self.predefined_habits()
+        if replica:
+            self._open_replica(async_replica)
 
-    def create_tables(self):
+    def _connect(self):
         """
-        This method creates the tables needed for the application,
-        it creates a table to store the habits and another to store the completion dates of the habits.
+        This method opens a new connection to the database with the settings of this Database.
+
+        Returns:
+            sqlite3.Connection: the new connection.
         """
-        create_habits_table = '''
-        CREATE TABLE IF NOT EXISTS habits (
-            name TEXT PRIMARY KEY,
-            frequency TEXT,
-            periodicity INTEGER,
-            creation_date TEXT
-        )
-        '''
-        create_completions_table = '''
-        CREATE TABLE IF NOT EXISTS habit_completions (
-            habit_name TEXT,
-            completion_date TEXT,
-            FOREIGN KEY(habit_name) REFERENCES habits(name)
-        )
-        '''
-        self.cursor.execute(create_habits_table)
-        self.cursor.execute(create_completions_table)
-        self.connection.commit()
-        logger.info("The tables were created or already existed.")
+        # Pooled connections are closed by exit(), which may run in another thread than the one that opened them,
+        # and in replica mode the connection to the file is also used by the thread that writes to it.
+        connection = sqlite3.connect(self.db_name, timeout=self.busy_timeout / 1000,
+                                     check_same_thread=not (self.pooled or self.replica))
+        connection.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+        connection.execute('PRAGMA foreign_keys = ON')
+        # The periods of the habits, as periods.period_of_epoch(seconds, frequency), for the queries
+        # that only need the period of one date, such as the current period.
+        connection.create_function('habit_period', 2, period_of_epoch, deterministic=True)
+        if self.pooled:
+            connection.execute('PRAGMA journal_mode = WAL')
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    def _open_replica(self, asynchronous: bool):
+        """
+        This method copies the file into a new in-memory database, which becomes the connection of the Database,
+        and keeps the connection to the file to write the transactions of the copy to it.
+        """
+        self._disk_writer = DiskWriter(self._connection, asynchronous)
+        memory = sqlite3.connect(':memory:', factory=ReplicaConnection)
+        memory.execute('PRAGMA foreign_keys = ON')
+        memory.create_function('habit_period', 2, period_of_epoch, deterministic=True)
+        self._data_version = self._disk_writer.load(memory)
+        memory.on_commit = self._write_to_file
+        self._replica_checked = time.monotonic()
+        self._connection = memory
+        with self._connections_lock:
+            self._connections.append(memory)
+        atexit.register(self._close_replica_at_exit)
+        logger.info("The database '%s' is served from memory.", self.db_name)
+
+    def _close_replica_at_exit(self):
+        """
+        This method writes the transactions still queued for the file when the interpreter exits without exit()
+        having been called, after the completions queued in write-behind mode, which are written to the copy first.
+        """
+        self._flush_at_exit()
+        self._disk_writer.close()
+
+    def _write_to_file(self, statements: list):
+        """
+        This method writes a transaction of the in-memory copy to the file. If the file refuses it,
+        the copy is loaded again from the file so that both hold the same data, and the error is raised.
+        """
+        try:
+            self._disk_writer.write(statements)
+        except sqlite3.Error:
+            logger.error("A transaction could not be written to '%s', the copy in memory is reloaded.", self.db_name)
+            self.refresh()
+            raise
+
+    def refresh(self):
+        """
+        This method loads the file again into the in-memory copy of replica mode, after the transactions
+        still queued for the file are written. It is called when another connection changed the file.
+
+        Returns:
+            bool: whether the copy was reloaded, which is not done in the middle of a transaction.
+        """
+        memory = self._connection
+        if self._disk_writer is None or memory.in_transaction:
+            return False
+        self._data_version = self._disk_writer.load(memory)
+        self._disk_errors = self._disk_writer.errors
+        self._replica_checked = time.monotonic()
+        # Not under _name_index_lock: name_index() holds it while it reads the names, which may reload the copy,
+        # and an index being built then reads the reloaded copy.
+        self._name_index = None
+        logger.info("The copy in memory of '%s' was reloaded from the file.", self.db_name)
+        return True
+
+    def _check_replica(self):
+        """
+        This method reloads the in-memory copy when another connection changed the file since it was loaded,
+        or when a transaction queued for the file could not be written. The file is checked at most every
+        refresh_interval seconds.
+        """
+        now = time.monotonic()
+        if now - self._replica_checked < self.refresh_interval or self._connection.in_transaction:
+            return
+        self._replica_checked = now
+        writer = self._disk_writer
+        if writer.data_version() != self._data_version or writer.errors != self._disk_errors:
+            self.refresh()
+
+    @property
+    def connection(self):
+        """
+        The connection of the calling thread, opened the first time the thread uses the database in pooled mode.
+        In replica mode it is the connection to the in-memory copy.
+        """
+        if not self.pooled:
+            if self._disk_writer is not None:
+                self._check_replica()
+            return self._connection
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def release_connection(self):
+        """
+        This method closes the connection of the calling thread in pooled mode, for threads that stop
+        using the database before exit() is called. The thread opens a new connection if it uses the database again.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if not self.pooled or connection is None:
+            return
+        self._local.connection = None
+        self._local.cursor = None
+        with self._connections_lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    def connection_count(self):
+        """
+        This method counts the open connections of the database, one per thread that used it in pooled mode.
+
+        Returns:
+            int: the number of open connections.
+        """
+        with self._connections_lock:
+            return len(self._connections)
+
+    def pending_completions(self):
+        """
+        This method counts the completions queued in write-behind mode that are not written yet.
+
+        Returns:
+            int: the number of queued completions, always 0 without write-behind mode.
+        """
+        # Read without _pending_lock, which add_completion() holds to queue a completion: a count that is
+        # one completion behind is good enough for a gauge, and reading the metrics must not slow the writes.
+        return len(self._pending)
+
+    @property
+    def cursor(self):
+        """
+        A cursor of the calling thread's connection, to run SQL commands directly on the database.
+        """
+        connection = self.connection
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None or cursor.connection is not connection:
+            cursor = connection.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def migrate(self):
+        """
+        This method brings the database schema up to date. The schema version is stored in
+        PRAGMA user_version, and every migration that is newer than that version is applied in order,
+        each one in its own transaction together with the new version number.
+        When the schema is already current no table is created or changed.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            logger.info("The database schema is up to date (version %s).", version)
+            return
+
+        # Tables are rebuilt by some migrations, and dropping a table must not cascade to the rows that refer to it.
+        cursor.execute('PRAGMA foreign_keys = OFF')
+        try:
+            for number, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+                cursor.execute('BEGIN')
+                try:
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(f'PRAGMA user_version = {number}')
+                    self.connection.commit()
+                except sqlite3.Error:
+                    self.connection.rollback()
+                    logger.error("The database schema could not be upgraded to version %s.", number)
+                    raise
+                logger.info("The database schema was upgraded to version %s.", number)
+        finally:
+            cursor.execute('PRAGMA foreign_keys = ON')
+
+        # The streak state is derived from the completions, so it is rebuilt with the new schema.
+        self.rebuild_streaks()
 
     def predefined_habits(self):
         """
         This method creates predefined habits if they do not already exist in the database.
         It creates five habits: 2 daily and 3 weekly.
         """
-        self.cursor.execute('SELECT COUNT(*) FROM habits')
-        count = self.cursor.fetchone()[0]
-        if count == 0:
+        cursor = self.connection.cursor()
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM habits)')
+        has_habits = cursor.fetchone()[0]
+        if not has_habits:
             logger.info("Creating predefined habits")
             predefined_habits = [
                 Habit(name='Read', frequency='daily', periodicity=1),
@@ -86,7 +558,11 @@ class Database:
 
         Args:
             habit(Habit): the habit to be added to the database with its corresponding attributes.
+
+        Returns:
+            bool: True if the habit was added, False if a habit with the same name already exists.
         """
+        cursor = self.connection.cursor()
         insert_query = '''
         INSERT INTO habits (
             name, frequency, periodicity, creation_date
@@ -96,40 +572,67 @@ class Database:
             habit.name,
             habit.frequency,
             habit.periodicity,
-            habit.creation_date.isoformat()
+            to_epoch(habit.creation_date)
         )
         try:
-            self.cursor.execute(insert_query, habit_data)
+            cursor.execute(insert_query, habit_data)
             self.connection.commit()
-            logger.info(f"The new habit '{habit.name}' was added to the database.")
+            logger.info("The new habit '%s' was added to the database.", habit.name)
+            with self._name_index_lock:
+                if self._name_index is not None:
+                    self._name_index.add(habit.name)
+            return True
         except sqlite3.IntegrityError:
-            logger.info(f"The habit created '{habit.name}' already exists.")
+            self.connection.rollback()
+            logger.info("The habit created '%s' already exists.", habit.name)
+            return False
 
     def delete_habit(self, habit_name: str):
         """
-        This method removes a habit from the database if the user wants to
+        This method removes a habit from the database if the user wants to.
+        Its completion dates are removed by the foreign key cascade.
 
         Args:
             habit_name (str): the habit to be removed from the database.
+
+        Returns:
+            bool: True if the habit was deleted, False if it does not exist.
         """
-        delete_completions_query = 'DELETE FROM habit_completions WHERE habit_name = ?'
+        self.flush()
+        cursor = self.connection.cursor()
         delete_habit_query = 'DELETE FROM habits WHERE name = ?'
-        self.cursor.execute(delete_completions_query, [habit_name])
-        self.cursor.execute(delete_habit_query, [habit_name])
+        cursor.execute(delete_habit_query, [habit_name])
         self.connection.commit()
-        if self.cursor.rowcount > 0:
-            logger.info(f"The habit '{habit_name}' was deleted.")
+        if cursor.rowcount > 0:
+            logger.info("The habit '%s' was deleted.", habit_name)
+            with self._name_index_lock:
+                if self._name_index is not None:
+                    self._name_index.remove(habit_name)
+            return True
         else:
-            logger.info(f"The habit '{habit_name}' does not exist.")
+            logger.info("The habit '%s' does not exist.", habit_name)
+            return False
 
     def add_completion(self, habit_name: str, completion_date: datetime):
         """
         This method adds to the database the date of completion of the habit, when the user performs it.
+        In write-behind mode the completion is queued and written later, see flush().
 
         Args:
             habit_name (str): the name of the habit that has been performed.
             completion_date (datetime): the date and time the habit was performed.
         """
+        if self.write_behind:
+            self._queue_completion(habit_name, completion_date)
+        else:
+            self._insert_completion(habit_name, completion_date)
+        logger.info("The habit '%s' was made on %s.", habit_name, completion_date)
+
+    def _insert_completion(self, habit_name: str, completion_date: datetime):
+        """
+        This method inserts one completion date with its streaks and commits it.
+        """
+        cursor = self.connection.cursor()
         insert_query = '''
         INSERT INTO habit_completions (
             habit_name, completion_date
@@ -137,11 +640,550 @@ class Database:
         '''
         completion_data = (
             habit_name,
-            completion_date.isoformat()
+            to_epoch(completion_date)
         )
-        self.cursor.execute(insert_query, completion_data)
+        try:
+            cursor.execute(insert_query, completion_data)
+            self._update_period_counts([completion_data])
+            self._update_streaks([completion_data])
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+
+    def _queue_completion(self, habit_name: str, completion_date: datetime):
+        """
+        This method queues a completion date in write-behind mode, and flushes the queue
+        when it is full or its oldest completion has waited long enough.
+        """
+        with self._pending_lock:
+            self._pending.append((habit_name, completion_date))
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                if self.pooled:
+                    self._flush_timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+            due = (len(self._pending) >= self.flush_size
+                   or time.monotonic() - self._pending_since >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        This method writes the completions queued in write-behind mode in a single transaction.
+        The methods that read completions or streaks call it first, so they always see every completion added.
+        If the transaction fails, the completions go back to the queue, except the ones that refer to a habit
+        that no longer exists, which are dropped and logged.
+
+        Returns:
+            int: the number of completion dates written.
+        """
+        if not self.write_behind:
+            return 0
+        # Flushes are serialized, so a reader waits for a flush that another thread started.
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+                self._pending_since = None
+                timer, self._flush_timer = self._flush_timer, None
+            if timer is not None:
+                timer.cancel()
+            if not batch:
+                return 0
+            try:
+                return self.add_completions_bulk(batch, batch_size=len(batch))
+            except sqlite3.IntegrityError:
+                logger.warning("A flush of %s completions failed, they are written one at a time.", len(batch))
+            except sqlite3.Error:
+                with self._pending_lock:
+                    self._pending[:0] = batch
+                    if self._pending_since is None:
+                        self._pending_since = time.monotonic()
+                raise
+            added = 0
+            for habit_name, completion_date in batch:
+                try:
+                    self._insert_completion(habit_name, completion_date)
+                    added += 1
+                except sqlite3.IntegrityError:
+                    logger.error("The completion of '%s' on %s was dropped, the habit does not exist.",
+                                 habit_name, completion_date)
+            return added
+
+    def _flush_from_timer(self):
+        """
+        This method flushes the queue from the timer thread of pooled mode, and closes the connection of that thread.
+        """
+        try:
+            self.flush()
+        except sqlite3.Error:
+            logger.exception("The queued completions could not be flushed.")
+        finally:
+            self.release_connection()
+
+    def _flush_at_exit(self):
+        """
+        This method flushes the queue when the interpreter exits without exit() having been called.
+        """
+        try:
+            self.flush()
+        except sqlite3.Error:
+            logger.exception("The queued completions could not be flushed at exit.")
+
+    def add_completions_bulk(self, completions, batch_size: int = 1000):
+        """
+        This method adds many completion dates at once, for example to import the history of another tracker.
+        The completions are read from the iterable in batches, and each batch is inserted and committed
+        in a single transaction together with the streaks of its habits, so the whole iterable is never in memory.
+        If a batch fails, that batch is rolled back and the batches before it stay in the database.
+
+        Args:
+            completions (iterable[tuple[str, datetime]]): the habit names and the dates they were performed.
+            batch_size (int, optional): the number of completions in each transaction, by default 1000.
+
+        Returns:
+            int: the number of completion dates added.
+        """
+        if batch_size < 1:
+            raise ValueError(f"The batch size must be at least 1, not {batch_size}.")
+        # Completions queued in write-behind mode are written first, so that they keep their order.
+        self.flush()
+        cursor = self.connection.cursor()
+        insert_query = 'INSERT INTO habit_completions (habit_name, completion_date) VALUES (?, ?)'
+        completions = iter(completions)
+        added = 0
+        while True:
+            batch = [(habit_name, to_epoch(completion_date))
+                     for habit_name, completion_date in islice(completions, batch_size)]
+            if not batch:
+                break
+            try:
+                cursor.executemany(insert_query, batch)
+                self._update_period_counts(batch)
+                self._update_streaks(batch)
+                self.connection.commit()
+            except sqlite3.Error:
+                self.connection.rollback()
+                logger.error("A batch of %s completions could not be added after adding %s.", len(batch), added)
+                raise
+            added += len(batch)
+        logger.info("%s completions were added in batches of %s.", added, batch_size)
+        return added
+
+    def delete_completion(self, habit_name: str, completion_date: datetime):
+        """
+        This method removes one completion date of a habit, for example one marked by mistake,
+        and updates the number of completions of its period and the streaks of the habit.
+
+        Args:
+            habit_name (str): the name of the habit.
+            completion_date (datetime): the completion date to remove, to the second.
+
+        Returns:
+            bool: True if the completion date was removed, False if the habit has no such completion date.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        seconds = to_epoch(completion_date)
+        try:
+            cursor.execute('''
+            DELETE FROM habit_completions WHERE rowid = (
+                SELECT rowid FROM habit_completions WHERE habit_name = ? AND completion_date = ? LIMIT 1
+            )
+            ''', [habit_name, seconds])
+            if cursor.rowcount == 0:
+                self.connection.rollback()
+                logger.info("The habit '%s' has no completion on %s.", habit_name, completion_date)
+                return False
+            cursor.execute('SELECT frequency FROM habits WHERE name = ?', [habit_name])
+            period = period_of_epoch(seconds, cursor.fetchone()[0])
+            cursor.execute('UPDATE habit_period_counts SET count = count - 1 WHERE habit_name = ? AND period = ?',
+                           [habit_name, period])
+            cursor.execute('DELETE FROM habit_period_counts WHERE habit_name = ? AND period = ? AND count <= 0',
+                           [habit_name, period])
+            # The streak state can only move forward, so it is rebuilt for this habit.
+            self._rebuild_streaks(habit_name)
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+        logger.info("The completion of '%s' on %s was deleted.", habit_name, completion_date)
+        return True
+
+    def _update_period_counts(self, completions: list):
+        """
+        This method adds new completion dates to the number of completions of their habits in each period.
+        It does not commit.
+
+        Args:
+            completions (list[tuple[str, int]]): the habit names and the dates they were performed,
+            in seconds since the epoch.
+        """
+        cursor = self.connection.cursor()
+        frequencies = {}
+        counts = Counter()
+        for habit_name, seconds in completions:
+            if habit_name not in frequencies:
+                cursor.execute('SELECT frequency FROM habits WHERE name = ?', [habit_name])
+                row = cursor.fetchone()
+                frequencies[habit_name] = row[0] if row else None
+            if frequencies[habit_name] is not None:
+                counts[habit_name, period_of_epoch(seconds, frequencies[habit_name])] += 1
+        upsert_query = '''
+        INSERT INTO habit_period_counts (habit_name, period, count) VALUES (?, ?, ?)
+        ON CONFLICT (habit_name, period) DO UPDATE SET count = count + excluded.count
+        '''
+        cursor.executemany(upsert_query, [(name, period, count) for (name, period), count in counts.items()])
+
+    def _backfill_period_counts(self, habit_names: list = None):
+        """
+        This method computes the number of completions in each period from the raw completion dates,
+        for the given habits or for every habit. It does not commit.
+        """
+        cursor = self.connection.cursor()
+        if habit_names is None:
+            cursor.execute('DELETE FROM habit_period_counts')
+            cursor.execute('INSERT INTO habit_period_counts (habit_name, period, count) '
+                           + _raw_period_counts_query(self.frequencies()) + ' GROUP BY c.habit_name, period')
+        else:
+            placeholders = ', '.join('?' * len(habit_names))
+            cursor.execute(f'DELETE FROM habit_period_counts WHERE habit_name IN ({placeholders})', habit_names)
+            cursor.execute('INSERT INTO habit_period_counts (habit_name, period, count) '
+                           + _raw_period_counts_query(self.frequencies(habit_names))
+                           + f' WHERE c.habit_name IN ({placeholders}) GROUP BY c.habit_name, period', habit_names)
+
+    def backfill_period_counts(self, batch_size: int = 500):
+        """
+        This method recomputes the number of completions of every habit in each period from the raw completion dates,
+        and then the stored streaks. The habits are processed in batches, each one in its own transaction,
+        so the database stays usable by other connections during the backfill of a large database.
+
+        Args:
+            batch_size (int, optional): the number of habits in each transaction, by default 500.
+
+        Returns:
+            int: the number of habits processed.
+        """
+        if batch_size < 1:
+            raise ValueError(f"The batch size must be at least 1, not {batch_size}.")
+        self.flush()
+        habit_names = self.habit_names()
+        for start in range(0, len(habit_names), batch_size):
+            batch = habit_names[start:start + batch_size]
+            try:
+                self._backfill_period_counts(batch)
+                for habit_name in batch:
+                    self._rebuild_streaks(habit_name)
+                self.connection.commit()
+            except sqlite3.Error:
+                self.connection.rollback()
+                logger.error("The period counts could not be backfilled after %s habits.", start)
+                raise
+        logger.info("The period counts of %s habits were backfilled.", len(habit_names))
+        return len(habit_names)
+
+    def check_period_counts(self):
+        """
+        This method compares the stored number of completions in each period with the raw completion dates.
+
+        Returns:
+            list[tuple[str, int, int, int]]: the habit name, the period, the stored count and the count of
+            the raw completion dates of every period where they differ, empty if the counts are consistent.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        cursor.execute(f'''
+        WITH raw_counts AS (
+            {_raw_period_counts_query(self.frequencies())}
+            GROUP BY c.habit_name, period
+        )
+        SELECT r.habit_name, r.period, COALESCE(p.count, 0), r.count
+        FROM raw_counts AS r
+        LEFT JOIN habit_period_counts AS p ON p.habit_name = r.habit_name AND p.period = r.period
+        WHERE p.count IS NOT r.count
+        UNION ALL
+        SELECT p.habit_name, p.period, p.count, 0
+        FROM habit_period_counts AS p
+        WHERE NOT EXISTS (SELECT 1 FROM raw_counts AS r WHERE r.habit_name = p.habit_name AND r.period = p.period)
+        ORDER BY 1, 2
+        ''')
+        mismatches = cursor.fetchall()
+        if mismatches:
+            logger.warning("%s period counts do not match the completion dates.", len(mismatches))
+        return mismatches
+
+    def _update_streaks(self, completions: list):
+        """
+        This method updates the stored streak states of habits with new completion dates,
+        without reading the other completion dates of the habits. It does not commit.
+
+        Args:
+            completions (list[tuple[str, int]]): the habit names and the dates they were performed,
+            in seconds since the epoch.
+        """
+        cursor = self.connection.cursor()
+        completion_epochs = defaultdict(list)
+        for habit_name, seconds in completions:
+            completion_epochs[habit_name].append(seconds)
+
+        select_query = f'''
+        SELECT h.frequency, h.periodicity, {', '.join('s.' + column for column in STREAK_COLUMNS)}
+        FROM habits AS h
+        LEFT JOIN habit_streaks AS s ON s.habit_name = h.name
+        WHERE h.name = ?
+        '''
+        states = []
+        for habit_name, epochs in completion_epochs.items():
+            cursor.execute(select_query, [habit_name])
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            frequency, periodicity = row[0], row[1]
+            state = dict(zip(STREAK_COLUMNS, row[2:])) if row[2] is not None else None
+            for seconds in sorted(epochs):
+                state = _advance_streak_state(state, period_of_epoch(seconds, frequency), periodicity)
+                if state is None:
+                    break
+            if state is None:
+                # A completion is older than the current period, so the state is rebuilt for this habit.
+                self._rebuild_streaks(habit_name)
+            else:
+                states.append(dict(state, habit_name=habit_name))
+        self._save_streaks(states)
+
+    def _save_streaks(self, states: list):
+        """
+        This method stores the streak states of habits, replacing their previous states. It does not commit.
+
+        Args:
+            states (list[dict]): the streak states, each one with the name of its habit.
+        """
+        cursor = self.connection.cursor()
+        insert_query = f'''
+        INSERT OR REPLACE INTO habit_streaks (habit_name, {', '.join(STREAK_COLUMNS)})
+        VALUES (:habit_name, {', '.join(':' + column for column in STREAK_COLUMNS)})
+        '''
+        cursor.executemany(insert_query, states)
+
+    def _rebuild_streaks(self, habit_name: str = None):
+        """
+        This method computes the streak state of one habit, or of all habits, from all of their completion dates.
+        It does not commit.
+
+        Args:
+            habit_name (str, optional): the habit to rebuild, by default every habit is rebuilt.
+        """
+        cursor = self.connection.cursor()
+        select_query = '''
+        SELECT p.habit_name, h.periodicity, p.period, p.count
+        FROM habit_period_counts AS p
+        JOIN habits AS h ON h.name = p.habit_name
+        '''
+        if habit_name is None:
+            cursor.execute('DELETE FROM habit_streaks')
+            cursor.execute(select_query + ' ORDER BY p.habit_name, p.period')
+        else:
+            cursor.execute('DELETE FROM habit_streaks WHERE habit_name = ?', [habit_name])
+            cursor.execute(select_query + ' WHERE p.habit_name = ? ORDER BY p.period', [habit_name])
+
+        states = []
+        for name, rows in groupby(cursor.fetchall(), key=itemgetter(0)):
+            state = None
+            for _, periodicity, period, count in rows:
+                # Completions after the one that goes over the periodicity do not change the state.
+                for _ in range(min(count, periodicity + 1)):
+                    state = _advance_streak_state(state, period, periodicity)
+            states.append(dict(state, habit_name=name))
+        self._save_streaks(states)
+
+    def rebuild_streaks(self):
+        """
+        This method rebuilds the number of completions in each period and the streak state of every habit
+        from all of their completion dates, to repair them if they ever disagree with the completions.
+        """
+        self.flush()
+        self._backfill_period_counts()
+        self._rebuild_streaks()
         self.connection.commit()
-        logger.info(f"The habit '{habit_name}' was made on {completion_date}.")
+        logger.info("The streaks of all habits were rebuilt.")
+
+    def get_streaks(self, habit_name: str):
+        """
+        This method reads the current and the longest streak of a habit from its stored streak state.
+
+        Args:
+            habit_name (str): the name of the habit.
+
+        Returns:
+            tuple[int, int]: the current streak and the longest streak of the habit,
+            or None if the habit does not exist.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        select_query = '''
+        SELECT h.frequency, s.last_eligible_period, s.current_streak, s.longest_streak
+        FROM habits AS h
+        LEFT JOIN habit_streaks AS s ON s.habit_name = h.name
+        WHERE h.name = ?
+        '''
+        cursor.execute(select_query, [habit_name])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        frequency, last_eligible_period, streak, longest_streak = row
+        if last_eligible_period is None:
+            return 0, longest_streak or 0
+
+        # The current streak ends in the period before the current one, like Habit.calculate_current_streak().
+        current_period = period_of(datetime.now(), frequency)
+        if last_eligible_period == current_period - 1:
+            current_streak = streak
+        elif last_eligible_period == current_period:
+            current_streak = streak - 1
+        elif last_eligible_period > current_period:
+            current_streak = self.find_habit(habit_name).calculate_current_streak()
+        else:
+            current_streak = 0
+        return current_streak, longest_streak
+
+    def sql_streaks(self, habit_name: str = None):
+        """
+        This method calculates the current and the longest streak of every habit, or of one habit, inside SQLite,
+        so only the streaks and not the completion dates are sent to Python. The periods whose number of completions
+        meets the periodicity are read from the period counts, and the runs of consecutive periods are found as islands:
+        within a run, the period minus its row number is the same for every period.
+
+        Args:
+            habit_name (str, optional): only calculate the streaks of this habit, by default of all habits.
+
+        Returns:
+            dict[str, tuple[int, int]]: the current streak and the longest streak of each habit,
+            in the order the habits were created.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        rollup_filter = 'AND p.habit_name = :habit_name' if habit_name is not None else ''
+        habits_filter = 'WHERE h.name = :habit_name' if habit_name is not None else ''
+        select_query = f'''
+        WITH eligible_periods AS (
+            SELECT p.habit_name, p.period,
+                   p.period - ROW_NUMBER() OVER (PARTITION BY p.habit_name ORDER BY p.period) AS island
+            FROM habit_period_counts AS p
+            JOIN habits AS h ON h.name = p.habit_name
+            WHERE p.count = h.periodicity {rollup_filter}
+        ),
+        islands AS (
+            SELECT habit_name, MIN(period) AS first_period, MAX(period) AS last_period, COUNT(*) AS length
+            FROM eligible_periods
+            GROUP BY habit_name, island
+        ),
+        current_periods (frequency, period) AS (
+            {{current_periods}}
+        )
+        SELECT h.name,
+               COALESCE(MAX(CASE WHEN i.first_period <= p.period - 1 AND p.period - 1 <= i.last_period
+                                 THEN p.period - i.first_period END), 0),
+               COALESCE(MAX(i.length), 0)
+        FROM habits AS h
+        JOIN current_periods AS p ON p.frequency = h.frequency
+        LEFT JOIN islands AS i ON i.habit_name = h.name
+        {habits_filter}
+        GROUP BY h.rowid
+        ORDER BY h.rowid
+        '''
+        frequencies = self.frequencies([habit_name] if habit_name is not None else None)
+        if not frequencies:
+            return {}
+        # The current period of each frequency is found in Python by its PeriodEngine and given to SQLite as a table.
+        now = datetime.now()
+        parameters = {'habit_name': habit_name}
+        values = []
+        for number, frequency in enumerate(frequencies):
+            parameters[f'frequency_{number}'] = frequency
+            parameters[f'period_{number}'] = period_of(now, frequency)
+            values.append(f'(:frequency_{number}, :period_{number})')
+        cursor.execute(select_query.format(current_periods='VALUES ' + ', '.join(values)), parameters)
+        return {name: (current_streak, longest_streak) for name, current_streak, longest_streak in cursor}
+
+    def can_mark_performed(self, habit_name: str):
+        """
+        This method checks if a habit can still be marked as performed in the current period,
+        with a single lookup of the number of completions in the current period instead of loading the habit.
+        The current period is found by the PeriodEngine of the habit, through the habit_period SQL function.
+
+        Args:
+            habit_name (str): the name of the habit.
+
+        Returns:
+            bool: True if the habit was performed fewer times than its periodicity in the current period,
+            False if it was performed enough times, or None if the habit does not exist.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        select_query = '''
+        SELECT COALESCE(p.count, 0) < h.periodicity
+        FROM habits AS h
+        LEFT JOIN habit_period_counts AS p ON p.habit_name = h.name
+            AND p.period = habit_period(:now, h.frequency)
+        WHERE h.name = :habit_name
+        '''
+        cursor.execute(select_query, {'habit_name': habit_name, 'now': to_epoch(datetime.now())})
+        row = cursor.fetchone()
+        return bool(row[0]) if row else None
+
+    def habit_period_counts(self, habit_names: list = None):
+        """
+        This method reads the number of completions in each period of every habit, or of the given habits,
+        which is enough to calculate the streaks without reading the completion dates.
+
+        Args:
+            habit_names (list[str], optional): only read these habits, by default every habit.
+
+        Returns:
+            list[tuple[str, str, int, list[tuple[int, int]]]]: the name, frequency and periodicity of each habit
+            with its periods and their number of completions from the oldest to the newest,
+            in the order the habits were created.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        habits_query = 'SELECT name, frequency, periodicity FROM habits'
+        counts_query = 'SELECT habit_name, period, count FROM habit_period_counts'
+        if habit_names is None:
+            cursor.execute(habits_query + ' ORDER BY rowid')
+            habits = cursor.fetchall()
+            cursor.execute(counts_query + ' ORDER BY habit_name, period')
+        else:
+            placeholders = ', '.join('?' * len(habit_names))
+            cursor.execute(habits_query + f' WHERE name IN ({placeholders}) ORDER BY rowid', habit_names)
+            habits = cursor.fetchall()
+            cursor.execute(counts_query + f' WHERE habit_name IN ({placeholders}) ORDER BY habit_name, period',
+                           habit_names)
+        period_counts = defaultdict(list)
+        for name, period, count in cursor:
+            period_counts[name].append((period, count))
+        return [(name, frequency, periodicity, period_counts[name]) for name, frequency, periodicity in habits]
+
+    def longest_streak_leader(self):
+        """
+        This method finds the habit with the longest streak from the stored streak states.
+        If several habits have the same streak, the one created first is chosen.
+
+        Returns:
+            tuple[str, int]: the name of the habit and its longest streak, or None if no habit has any streak.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        select_query = '''
+        SELECT s.habit_name, s.longest_streak
+        FROM habit_streaks AS s
+        JOIN habits AS h ON h.name = s.habit_name
+        WHERE s.longest_streak > 0
+        ORDER BY s.longest_streak DESC, h.rowid
+        LIMIT 1
+        '''
+        cursor.execute(select_query)
+        return cursor.fetchone()
 
     def get_completions(self, habit_name: str):
         """
@@ -153,12 +1195,52 @@ class Database:
         Returns:
             list[datetime]: a list of completion dates for the desired habit.
         """
-        select_query = 'SELECT completion_date FROM habit_completions WHERE habit_name = ?'
-        self.cursor.execute(select_query, [habit_name])
-        rows = self.cursor.fetchall()
-        completion_dates = [datetime.fromisoformat(row[0]) for row in rows]
+        completion_dates = [from_epoch(seconds) for seconds in self.get_completion_epochs(habit_name)]
         return completion_dates
 
+    def get_completion_epochs(self, habit_name: str):
+        """
+        This method gets the stored completion dates of a habit as seconds since the epoch,
+        without converting them to datetime objects, for callers that only need their periods.
+
+        Args:
+            habit_name (str): the name of the habit.
+
+        Returns:
+            list[int]: the completion dates of the habit in seconds since the epoch.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        select_query = 'SELECT completion_date FROM habit_completions WHERE habit_name = ?'
+        cursor.execute(select_query, [habit_name])
+        return [row[0] for row in cursor.fetchall()]
+
+    def latest_completions(self, habit_name: str, limit: int = 7, before: datetime = None):
+        """
+        This method gets the most recent completion dates of a habit, reading only those rows from the end
+        of the index on habit and date, so its cost does not depend on the length of the history.
+        To read the history page by page, pass the oldest date of a page as before to get the next page.
+
+        Args:
+            habit_name (str): the name of the habit.
+            limit (int, optional): the number of completion dates to get, by default 7.
+            before (datetime, optional): only get the completion dates before this date,
+                by default the latest ones are returned.
+
+        Returns:
+            list[datetime]: at most limit completion dates, from the newest to the oldest.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        select_query = 'SELECT completion_date FROM habit_completions WHERE habit_name = ?'
+        parameters = [habit_name]
+        if before is not None:
+            # The stored dates have no fractions of a second, so a date before 'before' is before its whole second.
+            select_query += ' AND completion_date < ?'
+            parameters.append(to_epoch(before) + (1 if before.microsecond else 0))
+        cursor.execute(select_query + ' ORDER BY completion_date DESC LIMIT ?', parameters + [limit])
+        return [from_epoch(row[0]) for row in cursor.fetchall()]
+
     def find_habit(self, habit_name: str):
         """
         This method finds a specific habit in the database
@@ -169,19 +1251,264 @@ class Database:
         Returns:
             Habit: the specific habit, if the habit is not found it returns None
         """
+        self.flush()
+        cursor = self.connection.cursor()
         select_query = 'SELECT * FROM habits WHERE name = ?'
-        self.cursor.execute(select_query, [habit_name])
-        row = self.cursor.fetchone()
+        cursor.execute(select_query, [habit_name])
+        row = cursor.fetchone()
         if row:
             habit = Habit(name=row[0], frequency=row[1], periodicity=row[2])
-            habit.creation_date = datetime.fromisoformat(row[3])
-            habit.completion_dates = self.get_completions(habit.name)
-            logger.debug(f"The habit '{habit_name}' was found in the database.")
+            habit.creation_date = from_epoch(row[3])
+            habit.set_completion_epochs(self.get_completion_epochs(habit.name))
+            logger.debug("The habit '%s' was found in the database.", habit_name)
             return habit
         else:
-            logger.info(f"The habit '{habit_name}' was not found in the database.")
+            logger.info("The habit '%s' was not found in the database.", habit_name)
             return None
 
+    def load_habits(self, frequency: str = None, habit_names: list = None, limit: int = None, offset: int = 0):
+        """
+        This method loads habits together with their completion dates using two set-based queries,
+        one for the habits and one for all of their completions, instead of one query per habit.
+        The completions are grouped by habit in a single pass over the rows.
+
+        Args:
+            frequency (str, optional): only load the habits with this frequency, by default all habits are loaded.
+            habit_names (list[str], optional): only load the habits with these names.
+            limit (int, optional): load at most this number of habits, in the order they were created,
+                by default there is no limit.
+            offset (int, optional): the number of habits to skip, used together with limit, by default 0.
+
+        Returns:
+            list[Habit]: the loaded habits, each with its completion dates.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        conditions = []
+        parameters = []
+        if frequency is not None:
+            conditions.append('h.frequency = ?')
+            parameters.append(frequency)
+        if habit_names is not None:
+            conditions.append(f"h.name IN ({', '.join('?' * len(habit_names))})")
+            parameters.extend(habit_names)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        if limit is not None:
+            # The page of habits is selected in a subquery so that the completions are restricted to the same page.
+            where = f' WHERE h.rowid IN (SELECT h.rowid FROM habits AS h{where} ORDER BY h.rowid LIMIT ? OFFSET ?)'
+            parameters.extend([limit, offset])
+
+        cursor.execute('SELECT * FROM habits AS h' + where + ' ORDER BY h.rowid', parameters)
+        habit_rows = cursor.fetchall()
+        if where:
+            cursor.execute(f'''
+            SELECT c.habit_name, c.completion_date
+            FROM habit_completions AS c
+            JOIN habits AS h ON h.name = c.habit_name
+            {where}
+            ORDER BY c.habit_name
+            ''', parameters)
+        else:
+            cursor.execute('SELECT habit_name, completion_date FROM habit_completions ORDER BY habit_name')
+
+        habits = {}
+        for row in habit_rows:
+            habit = Habit(name=row[0], frequency=row[1], periodicity=row[2])
+            habit.creation_date = from_epoch(row[3])
+            habits[habit.name] = habit
+
+        # The completions come ordered by habit from the index, so the rows of each habit are next to each other.
+        for habit_name, rows in groupby(cursor, key=itemgetter(0)):
+            habit = habits.get(habit_name)
+            if habit is not None:
+                habit.set_completion_epochs(row[1] for row in rows)
+        return list(habits.values())
+
+    def habit_summaries(self, frequency: str = None, limit: int = None, offset: int = 0):
+        """
+        This method reads the same dictionaries as Habit.to_dict() for a page of habits without loading their
+        completion dates: the last completion is the MAX of the completion index and the number of completions
+        is the sum of the period counts of the habit.
+
+        Args:
+            frequency (str, optional): only read the habits with this frequency, by default all habits.
+            limit (int, optional): read at most this number of habits, in the order they were created,
+                by default there is no limit.
+            offset (int, optional): the number of habits to skip, used together with limit, by default 0.
+
+        Returns:
+            list[dict]: the name, frequency, periodicity, creation date, last completion date and number of
+            completions of each habit.
+        """
+        self.flush()
+        where = ' WHERE h.frequency = ?' if frequency is not None else ''
+        parameters = [frequency] if frequency is not None else []
+        cursor = self.connection.cursor()
+        cursor.execute(f'''
+        SELECT h.name, h.frequency, h.periodicity, h.creation_date, ({LAST_DONE}),
+               (SELECT COALESCE(SUM(p.count), 0) FROM habit_period_counts AS p WHERE p.habit_name = h.name)
+        FROM habits AS h{where}
+        ORDER BY h.rowid LIMIT ? OFFSET ?
+        ''', parameters + [-1 if limit is None else limit, offset])
+        return [{
+            'name': name,
+            'frequency': frequency_,
+            'periodicity': periodicity,
+            'creation_date': from_epoch(creation_date).isoformat(),
+            'last_completion_date': from_epoch(last_done).isoformat() if last_done is not None else None,
+            'completions': completions,
+        } for name, frequency_, periodicity, creation_date, last_done, completions in cursor.fetchall()]
+
+    def habit_names(self, frequency: str = None):
+        """
+        This method gets the names of the habits without loading their completion dates.
+
+        Args:
+            frequency (str, optional): only get the habits with this frequency, by default all habits.
+
+        Returns:
+            list[str]: the names of the habits, in the order they were created.
+        """
+        cursor = self.connection.cursor()
+        if frequency is None:
+            cursor.execute('SELECT name FROM habits')
+        else:
+            cursor.execute('SELECT name FROM habits WHERE frequency = ?', [frequency])
+        return [row[0] for row in cursor.fetchall()]
+
+    def completion_counts(self):
+        """
+        This method gets the number of completions of every habit from the sums of its period counts,
+        without reading the completions.
+
+        Returns:
+            dict[str, int]: the number of completions of each habit performed at least once.
+        """
+        self.flush()
+        cursor = self.connection.cursor()
+        cursor.execute('SELECT habit_name, SUM(count) FROM habit_period_counts GROUP BY habit_name')
+        return dict(cursor.fetchall())
+
+    def frequencies(self, habit_names: list = None):
+        """
+        This method gets the different frequencies of the habits, to build the SQL of their periods.
+
+        Args:
+            habit_names (list[str], optional): only get the frequencies of these habits, by default of every habit.
+
+        Returns:
+            list[str]: the frequencies, in alphabetical order.
+        """
+        cursor = self.connection.cursor()
+        if habit_names is None:
+            cursor.execute('SELECT DISTINCT frequency FROM habits ORDER BY frequency')
+        else:
+            placeholders = ', '.join('?' * len(habit_names))
+            cursor.execute(f'SELECT DISTINCT frequency FROM habits WHERE name IN ({placeholders}) ORDER BY frequency',
+                           habit_names)
+        return [row[0] for row in cursor.fetchall()]
+
+    def name_index(self):
+        """
+        This method gives the index of the names of the habits, built from the habits table the first time
+        and then kept up to date by new_created_habit() and delete_habit(). Habits created or deleted
+        by another process are not seen until the database is opened again.
+
+        Returns:
+            NameIndex: the index of the names of the habits.
+        """
+        with self._name_index_lock:
+            if self._name_index is None:
+                self._name_index = NameIndex(self.habit_names())
+                logger.info("The index of %s habit names was built.", len(self._name_index))
+            return self._name_index
+
+    def habit_rows(self, frequency: str = None, name_prefix: str = None, sort: str = 'created',
+                   descending: bool = False, page_size: int = 500):
+        """
+        This method yields the rows of the table of habits without loading their completion dates:
+        the last time each habit was performed is the MAX of its completions, read from the index of the completions.
+        The filters and the order are applied by the query, and the rows are read one page at a time,
+        so that no transaction is kept open between pages.
+
+        When sorting by creation or by name, which are unique and indexed, each page starts after the last row of
+        the previous one in the index, so reading a late page costs the same as reading the first one.
+        The last completion has no index, so that order is found once for every habit that matches, in a single
+        query that costs about as much as reading the whole table, and the pages are then read by their rowids.
+        A habit performed while its pages are read keeps its place, and a habit deleted meanwhile is left out.
+
+        Args:
+            frequency (str, optional): only yield the habits with this frequency, by default all habits.
+            name_prefix (str, optional): only yield the habits whose name starts with this text, case-sensitive.
+            sort (str, optional): the order of the rows, one of HABIT_ROW_SORTS, by default 'created'.
+            descending (bool, optional): yield the rows in the reverse order, by default False.
+            page_size (int, optional): the number of rows read by each query, by default 500.
+
+        Returns:
+            Iterator[tuple]: the name, the creation date, the frequency, the periodicity and the last completion
+            date of each habit, the last one None if the habit was never performed.
+        """
+        if sort not in HABIT_ROW_SORTS:
+            raise ValueError(f"The sort must be one of {', '.join(HABIT_ROW_SORTS)}.")
+        self.flush()
+        conditions = []
+        parameters = []
+        if frequency is not None:
+            conditions.append('h.frequency = ?')
+            parameters.append(frequency)
+        if name_prefix:
+            # A range on the name instead of LIKE, so that the primary key index is used and '%' or '_' are not special.
+            conditions.append('h.name >= ? AND h.name < ?')
+            parameters.extend([name_prefix, name_prefix + '\U0010ffff'])
+        order = 'DESC' if descending else 'ASC'
+        select = (f'SELECT h.rowid, h.name, h.creation_date, h.frequency, h.periodicity, ({LAST_DONE}) AS last_done '
+                  f'FROM habits AS h')
+        if sort == 'last_done':
+            pages = self._habit_pages_by_rowid(select, conditions, parameters, HABIT_ROW_SORTS[sort], order, page_size)
+        else:
+            pages = self._habit_pages_after_key(select, conditions, parameters, HABIT_ROW_SORTS[sort], order, page_size)
+        for rows in pages:
+            for _, name, creation_date, frequency_, periodicity, last_done in rows:
+                yield (name, from_epoch(creation_date), frequency_, periodicity,
+                       from_epoch(last_done) if last_done is not None else None)
+
+    def _habit_pages_after_key(self, select: str, conditions: list, parameters: list, key: str, order: str,
+                               page_size: int):
+        """
+        This method reads the rows of habit_rows() ordered by a unique indexed column, each page starting after
+        the last key of the previous one, so that every page is read from the index.
+        """
+        cursor = self.connection.cursor()
+        after = '<' if order == 'DESC' else '>'
+        last_key = None
+        while True:
+            page_conditions = conditions + ([f'{key} {after} ?'] if last_key is not None else [])
+            page_parameters = parameters + ([last_key] if last_key is not None else [])
+            where = ' WHERE ' + ' AND '.join(page_conditions) if page_conditions else ''
+            cursor.execute(f'{select}{where} ORDER BY {key} {order} LIMIT ?', page_parameters + [page_size])
+            rows = cursor.fetchall()
+            yield rows
+            if len(rows) < page_size:
+                return
+            last_key = rows[-1][0] if key == 'h.rowid' else rows[-1][1]
+
+    def _habit_pages_by_rowid(self, select: str, conditions: list, parameters: list, key: str, order: str,
+                              page_size: int):
+        """
+        This method reads the rows of habit_rows() ordered by an expression without an index: the rowids of every
+        habit that matches are sorted once, and each page is then read by its rowids.
+        """
+        cursor = self.connection.cursor()
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        cursor.execute(f'SELECT h.rowid, ({LAST_DONE}) AS last_done FROM habits AS h{where} '
+                       f'ORDER BY {key} {order}, h.rowid {order}', parameters)
+        row_ids = [row[0] for row in cursor.fetchall()]
+        for start in range(0, len(row_ids), page_size):
+            page = row_ids[start:start + page_size]
+            cursor.execute(f"{select} WHERE h.rowid IN ({', '.join('?' * len(page))})", page)
+            found = {row[0]: row for row in cursor.fetchall()}
+            yield [found[row_id] for row_id in page if row_id in found]
+
     def show_all_habits(self):
         """
         This method shows all the habits in the database.
@@ -189,15 +1516,7 @@ class Database:
         Returns:
             list[Habit]: a list of all the habits in the database.
         """
-        select_query = 'SELECT * FROM habits'
-        self.cursor.execute(select_query)
-        rows = self.cursor.fetchall()
-        habits = []
-        for row in rows:
-            habit = Habit(name=row[0], frequency=row[1], periodicity=row[2])
-            habit.creation_date = datetime.fromisoformat(row[3])
-            habit.completion_dates = self.get_completions(habit.name)
-            habits.append(habit)
+        habits = self.load_habits()
         logger.info("Show all habits.")
         return habits
 
@@ -206,28 +1525,34 @@ class Database:
         This method shows a list of habits with the specific frequency that the user wants to see.
 
         Args:
-            frequency (str): the frequency the user wants to see (daily or weekly).
+            frequency (str): the frequency the user wants to see, for example daily, weekly or monthly.
 
         Returns:
             list[Habit]: a list of habits that have the desired frequency.
         """
-        select_query = 'SELECT * FROM habits WHERE frequency = ?'
-        self.cursor.execute(select_query, [frequency])
-        rows = self.cursor.fetchall()
-        habits = []
-        for row in rows:
-            habit = Habit(name=row[0], frequency=row[1], periodicity=row[2])
-            habit.creation_date = datetime.fromisoformat(row[3])
-            habit.completion_dates = self.get_completions(habit.name)
-            habits.append(habit)
-        logger.info(f"Show all habits with frequency '{frequency}'.")
+        habits = self.load_habits(frequency)
+        logger.info("Show all habits with frequency '%s'.", frequency)
         return habits
 
     def exit(self):
         """
-        Close the database connection.
+        Close the database connection, and in pooled mode the connections of every thread.
+        In write-behind mode the queued completions are written first, and in replica mode
+        the transactions still queued for the file.
         """
-        self.connection.close()
-        logger.info(f"The connection with '{self.db_name}' is closed.")
+        if self.write_behind:
+            atexit.unregister(self._flush_at_exit)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("%s queued completions could not be written before closing.", len(self._pending))
+        if self._disk_writer is not None:
+            atexit.unregister(self._close_replica_at_exit)
+            self._disk_writer.close()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        logger.info("The connection with '%s' is closed.", self.db_name)
 
 
@@ -0,0 +1,144 @@
+import csv
+import json
+import logging
+from datetime import datetime
+from database import Database
+from periods import from_epoch, to_epoch
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+TABLES = ('habits', 'completions')
+
+
+def _write_rows(cursor, file, columns: list, file_format: str, fetch_size: int):
+    """
+    This function writes the rows of an executed query to a file, fetching a limited number of rows at a time
+    so that the memory used does not depend on the size of the table.
+    Columns whose name ends in '_date' are written as ISO-8601 text.
+
+    Returns:
+        int: the number of rows written.
+    """
+    date_columns = [index for index, column in enumerate(columns) if column.endswith('_date')]
+    writer = None
+    if file_format == 'csv':
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(columns)
+
+    count = 0
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        for row in rows:
+            row = list(row)
+            for index in date_columns:
+                row[index] = from_epoch(row[index]).isoformat()
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                file.write(json.dumps(dict(zip(columns, row))) + '\n')
+        count += len(rows)
+    return count
+
+
+def _check_format(file_format: str):
+    """
+    This function checks that the file format is one of the supported formats.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"The file format is not correct '{file_format}'. The format should be csv or jsonl.")
+
+
+def export_habits(db: Database, file, file_format: str = 'csv', frequency: str = None, habit_name: str = None,
+                  fetch_size: int = 1000):
+    """
+    This function writes the habits of the database to a CSV or JSON Lines file.
+
+    Args:
+        db (Database): use the Database.
+        file (file): the open file to write to.
+        file_format (str, optional): the format of the file, 'csv' or 'jsonl', by default 'csv'.
+        frequency (str, optional): only export the habits with this frequency.
+        habit_name (str, optional): only export the habit with this name.
+        fetch_size (int, optional): the number of rows read from the database at a time, by default 1000.
+
+    Returns:
+        int: the number of habits written.
+    """
+    _check_format(file_format)
+    columns = ['name', 'frequency', 'periodicity', 'creation_date']
+    conditions = []
+    parameters = []
+    if frequency is not None:
+        conditions.append('frequency = ?')
+        parameters.append(frequency)
+    if habit_name is not None:
+        conditions.append('name = ?')
+        parameters.append(habit_name)
+    select_query = f"SELECT {', '.join(columns)} FROM habits"
+    if conditions:
+        select_query += ' WHERE ' + ' AND '.join(conditions)
+
+    db.flush()
+    cursor = db.connection.cursor()
+    try:
+        cursor.execute(select_query, parameters)
+        count = _write_rows(cursor, file, columns, file_format, fetch_size)
+    finally:
+        cursor.close()
+    logger.info("%s habits were exported as %s.", count, file_format)
+    return count
+
+
+def export_completions(db: Database, file, file_format: str = 'csv', frequency: str = None, habit_name: str = None,
+                       start: datetime = None, end: datetime = None, fetch_size: int = 1000):
+    """
+    This function writes the completion dates of the database to a CSV or JSON Lines file,
+    in the same format that the importer reads.
+
+    Args:
+        db (Database): use the Database.
+        file (file): the open file to write to.
+        file_format (str, optional): the format of the file, 'csv' or 'jsonl', by default 'csv'.
+        frequency (str, optional): only export the completions of habits with this frequency.
+        habit_name (str, optional): only export the completions of the habit with this name.
+        start (datetime, optional): only export the completions from this date on.
+        end (datetime, optional): only export the completions before this date.
+        fetch_size (int, optional): the number of rows read from the database at a time, by default 1000.
+
+    Returns:
+        int: the number of completion dates written.
+    """
+    _check_format(file_format)
+    columns = ['habit_name', 'completion_date']
+    conditions = []
+    parameters = []
+    if frequency is not None:
+        conditions.append('h.frequency = ?')
+        parameters.append(frequency)
+    if habit_name is not None:
+        conditions.append('c.habit_name = ?')
+        parameters.append(habit_name)
+    if start is not None:
+        conditions.append('c.completion_date >= ?')
+        parameters.append(to_epoch(start))
+    if end is not None:
+        conditions.append('c.completion_date < ?')
+        parameters.append(to_epoch(end))
+    select_query = 'SELECT c.habit_name, c.completion_date FROM habit_completions AS c'
+    if frequency is not None:
+        select_query += ' JOIN habits AS h ON h.name = c.habit_name'
+    if conditions:
+        select_query += ' WHERE ' + ' AND '.join(conditions)
+
+    db.flush()
+    cursor = db.connection.cursor()
+    try:
+        cursor.execute(select_query, parameters)
+        count = _write_rows(cursor, file, columns, file_format, fetch_size)
+    finally:
+        cursor.close()
+    logger.info("%s completions were exported as %s.", count, file_format)
+    return count
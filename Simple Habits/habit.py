@@ -1,45 +1,212 @@
 import logging
-from datetime import datetime, timedelta
-from collections import defaultdict
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+from periods import (MICROSECONDS_PER_SECOND, from_epoch_micros, normalize_frequency, period_engine, period_of,
+                     streaks_from_period_counts, to_epoch_micros)
 
 logger = logging.getLogger(__name__)
 
 
+class CompletionDates:
+    """
+    A list-like view of the completion dates of a habit, ordered from the oldest to the newest.
+    The dates are stored as microseconds since the epoch, and they are only converted to datetime
+    objects when they are read, for example to display them.
+    """
+
+    __slots__ = ('_micros',)
+
+    def __init__(self, micros: array):
+        self._micros = micros
+
+    def append(self, date: datetime):
+        """
+        Add a completion date in its sorted position.
+        """
+        micros = to_epoch_micros(date)
+        if not self._micros or micros >= self._micros[-1]:
+            self._micros.append(micros)
+        else:
+            insort(self._micros, micros)
+
+    def extend(self, dates):
+        """
+        Add several completion dates in their sorted positions.
+        """
+        new_micros = sorted(map(to_epoch_micros, dates))
+        if new_micros and self._micros and new_micros[0] < self._micros[-1]:
+            self._micros[:] = array('q', sorted(self._micros.tolist() + new_micros))
+        else:
+            self._micros.extend(new_micros)
+
+    def clear(self):
+        """
+        Remove every completion date.
+        """
+        del self._micros[:]
+
+    def __len__(self):
+        return len(self._micros)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [from_epoch_micros(micros) for micros in self._micros[index]]
+        return from_epoch_micros(self._micros[index])
+
+    def __iter__(self):
+        return map(from_epoch_micros, self._micros)
+
+    def __reversed__(self):
+        return map(from_epoch_micros, reversed(self._micros))
+
+    def __contains__(self, date):
+        if not isinstance(date, datetime):
+            return False
+        micros = to_epoch_micros(date)
+        index = bisect_left(self._micros, micros)
+        return index < len(self._micros) and self._micros[index] == micros
+
+    def __eq__(self, other):
+        if isinstance(other, CompletionDates):
+            return self._micros == other._micros
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CompletionDates({list(self)!r})"
+
+
 class Habit:
     """
     A class for each habit creation.
 
+    The completion dates are kept sorted in a compact array of microseconds since the epoch,
+    so that the number of completions in a period is found with two binary searches.
+
     Attributes:
         name (str): the name of the habit.
-        frequency (str): how often the habit should be performed ('daily' or 'weekly').
+        frequency (str): how often the habit should be performed, as normalized by periods.normalize_frequency(),
+            for example 'daily', 'weekly', 'weekly:sunday', 'monthly' or 'every:3'.
         periodicity (int): the number of times the habit should be performed in the given frequency period.
         creation_date (datetime): when the habit was created.
-        completion_dates (list): list of the dates when the habit was completed.
+        completion_dates (CompletionDates): the dates when the habit was completed, from the oldest to the newest.
+            A list of dates can be assigned to it.
     """
 
+    __slots__ = ('name', 'frequency', 'periodicity', 'creation_date', '_completions')
+
     def __init__(self, name: str, frequency: str, periodicity: int):
         """
         Initialize a new habit.
 
         Args:
             name (str): the name of the habit.
-            frequency (str): how often the habit should be performed, daily or weekly.
+            frequency (str): how often the habit should be performed, see periods.FREQUENCY_HELP.
             periodicity (int): the number of times the habit should be performed in the given frequency period.
         """
         self.name = name
-        self.frequency = frequency.lower()
+        self.frequency = normalize_frequency(frequency)
         self.periodicity = periodicity
         self.creation_date = datetime.now()
-        self.completion_dates = []
+        self._completions = array('q')
+
+    @property
+    def completion_dates(self):
+        """
+        The completion dates of the habit, from the oldest to the newest.
+        """
+        return CompletionDates(self._completions)
+
+    @completion_dates.setter
+    def completion_dates(self, dates):
+        self._completions[:] = array('q', sorted(map(to_epoch_micros, dates)))
+
+    @property
+    def completion_micros(self):
+        """
+        The sorted completion dates as an array of microseconds since the epoch, which must not be modified.
+        """
+        return self._completions
+
+    def set_completion_epochs(self, epochs):
+        """
+        This method replaces the completion dates with dates given as whole seconds since the epoch,
+        as they are stored in the database, without creating datetime objects.
+
+        Args:
+            epochs (iterable[int]): the completion dates in seconds since the epoch.
+        """
+        self._completions[:] = array('q', sorted(seconds * MICROSECONDS_PER_SECOND for seconds in epochs))
 
     def performed(self):
         """
         This method marks the habit as completed at the current date.
         It adds the current date to the list of completion dates.
+
+        Returns:
+            datetime: the date the habit was performed.
         """
         now = datetime.now()
         self.completion_dates.append(now)
-        logger.info(f"The habit '{self.name}' was performed at {now}.")
+        logger.info("The habit '%s' was performed at %s.", self.name, now)
+        return now
+
+    def to_dict(self):
+        """
+        This method converts the habit to a dictionary that can be written as JSON.
+
+        Returns:
+            dict: the name, frequency, periodicity and creation date of the habit,
+            the date it was last performed (None if never) and the number of completions.
+        """
+        last_done = self.completion_dates[-1] if self._completions else None
+        return {
+            'name': self.name,
+            'frequency': self.frequency,
+            'periodicity': self.periodicity,
+            'creation_date': self.creation_date.isoformat(),
+            'last_completion_date': last_done.isoformat() if last_done else None,
+            'completions': len(self._completions)
+        }
+
+    def _period_bounds(self, period: int):
+        """
+        This method finds the first and the last microsecond of a period, the last one excluded.
+        """
+        engine = period_engine(self.frequency)
+        start = engine.period_start_epoch(period) * MICROSECONDS_PER_SECOND
+        end = engine.period_start_epoch(period + 1) * MICROSECONDS_PER_SECOND
+        return start, end
+
+    def count_in_period(self, period: int):
+        """
+        This method counts the completions in a period with two binary searches over the sorted completions.
+
+        Args:
+            period (int): the number of the period, as given by periods.period_of().
+
+        Returns:
+            int: the number of times the habit was performed in the period.
+        """
+        start, end = self._period_bounds(period)
+        return bisect_left(self._completions, end) - bisect_left(self._completions, start)
+
+    def _period_counts(self):
+        """
+        This method goes through the periods that have completions, from the oldest to the newest,
+        and yields each period with its number of completions. Since the completions are sorted,
+        the end of each period is found with a binary search instead of visiting every completion.
+        """
+        completions = self._completions
+        engine = period_engine(self.frequency)
+        index = 0
+        while index < len(completions):
+            period = engine.period_of_epoch(completions[index] // MICROSECONDS_PER_SECOND)
+            end = bisect_left(completions, engine.period_start_epoch(period + 1) * MICROSECONDS_PER_SECOND, index)
+            yield period, end - index
+            index = end
 
     def can_mark_performed(self):
         """
@@ -49,27 +216,10 @@ class Habit:
             bool: it will be true if the habit can still be marked since the periodicity has not been reached,
             and false if the habit has already been marked the necessary number of times.
         """
-
-        now = datetime.now()
-
-# In the method a period is created to calculate the number of times the user has performed the habit, checking the frequency.
-        if self.frequency == 'daily':
-            period_start = datetime(now.year, now.month, now.day)
-            period_end = period_start + timedelta(days=1)
-        # For daily habits, it calculates the start of the current period by creating a variable with the date set to midnight of today
-        # and then it sets the end of the period to the start of the next day by adding one day.
-
-        elif self.frequency == 'weekly':
-            period_start = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
-            period_end = period_start + timedelta(weeks=1)
-        # For weekly habits, the most recent monday is found by subtracting the number of days from monday to the current date
-        # and then setting the end of the period to the beginning of the following week by adding one week.
-        else:
-            raise ValueError(f"The frequency is not correct '{self.frequency}'. The frequency should be daily or weekly.")
-
-# The method then counts how many times you have marked the habit as done during the current period.
-# It uses the list to iterate through all the completion dates and counts the dates that fall within the period you set at the beginning.
-        count = sum(1 for date in self.completion_dates if period_start <= date < period_end)
+# The method finds the current period with the period engine of the frequency of the habit, for example the current day
+# for daily habits or the current month for monthly habits, and counts how many times the user has performed the habit
+# during that period.
+        count = self.count_in_period(period_of(datetime.now(), self.frequency))
 
 # Finally, it returns true if the count is less than the required periodicity, allowing the habit to continue being marked,
 # and false otherwise, not allowing the habit to be marked since the user has marked the habit the number of times proposed.
@@ -83,58 +233,14 @@ class Habit:
             int: the current streak count, returns 0 if there is no streak.
         """
 # First, the method checks if the habit has been completed yet
-        if not self.completion_dates:
+        if not self._completions:
             return 0
 
-# After the method orders the completion dates in ascending order, which will make it easier to analyze the consecutive periods
-# in which the habit was performed.
-        sorted_dates = sorted(self.completion_dates)
-
-# Within the method, The duration of the period is defined based on the frequency of the habit
-# and a function period_start to calculate the start of each period depending on the frequency of the habit
-# to group the completion dates.
-        if self.frequency == 'daily':
-            duration = timedelta(days=1)
-            period_start = lambda d: datetime(d.year, d.month, d.day)
-        # For daily habits the period duration is one day, and period_start returns the start of the day
-        # using the midnight for any date in completion dates.
-        elif self.frequency == 'weekly':
-            duration = timedelta(weeks=1)
-            period_start = lambda d: datetime(d.year, d.month, d.day) - timedelta(days=d.weekday())
-        # For weekly habits, the period duration is one week and period_start returns the start of the week with monday
-        # at midnight for any date in completion dates.
-        else:
-            raise ValueError(f"The frequency is not correct '{self.frequency}'. The frequency should be daily or weekly.")
-
-# Now the period_start of each date is placed in the period_counts dictionary as a key, the value of these keys
-# will be the count of how many times the habit was performed in that period.
-        period_counts = defaultdict(int)
-        for date in sorted_dates:
-            period = period_start(date)
-            period_counts[period] += 1
-
-# Then we create a set, in which the method will iterate through the dictionary periods and it will only keep the dates
-# that meet the periodicity required for each habit.
-        eligible_periods = set(period for period, count in period_counts.items() if count == self.periodicity)
-
-# Here the method creates the variables needed to start calculating the current streak by setting the expected_period
-# to last_period, the period immediately preceding the current period. And then starting the current_streak at zero.
-        now = datetime.now()
-        current_period = period_start(now)
-        last_period = current_period - duration
-        expected_period = last_period
-        current_streak = 0
-
-# Then the method uses a loop with the variable expected_period and the set eligible_periods, in which it is checked that
-# the expected period is in the set of eligible periods, if so, the duration of the corresponding period is subtracted
-# from the expected period and the streak is increased by one. The verification is done retrospectively
-# It continues in this way until the expected period is no longer among the eligible periods, the loop ends.
-        while expected_period in eligible_periods:
-            current_streak += 1
-            expected_period -= duration
-
-#Finally when the loop ends, the method returns the current streak
-        return current_streak
+# Then the number of completions in each period is given to streaks_from_period_counts, which keeps the periods
+# in which the habit was performed exactly the number of times required by its periodicity and counts the run
+# of consecutive periods that ends in the period immediately preceding the current period.
+        current_period = period_of(datetime.now(), self.frequency)
+        return streaks_from_period_counts(self._period_counts(), self.periodicity, current_period)[0]
 
     def calculate_longest_streak(self):
         """
@@ -144,61 +250,10 @@ class Habit:
             int: the longest streak achieved in the habit.
         """
 # First, the method checks if the habit has been completed yet
-        if not self.completion_dates:
+        if not self._completions:
             return 0
 
-# After the method orders the completion dates in ascending order, which will make it easier to analyze the consecutive periods
-# in which the habit was performed.
-        sorted_dates = sorted(self.completion_dates)
-
-# Within the method, The duration of the period is defined based on the frequency of the habit
-# and a function period_start to calculate the start of each period depending on the frequency of the habit
-# to group the completion dates.
-        if self.frequency == 'daily':
-            duration = timedelta(days=1)
-            period_start = lambda d: datetime(d.year, d.month, d.day)
-        # For daily habits the period duration is one day, and period_start returns the start of the day
-        # using the midnight for any date in completion dates.
-        elif self.frequency == 'weekly':
-            duration = timedelta(weeks=1)
-            period_start = lambda d: datetime(d.year, d.month, d.day) - timedelta(days=d.weekday())
-        # For weekly habits, the period duration is one week and period_start returns the start of the week with monday
-        # at midnight for any date in completion dates.
-        else:
-            raise ValueError(f"The frequency is not correct '{self.frequency}'. The frequency should be daily or weekly.")
-
-# Now the period_start of each date is placed in the period_counts dictionary as a key, the value of these keys
-# will be the count of how many times the habit was performed in that period.
-        period_counts = defaultdict(int)
-        for date in sorted_dates:
-            period = period_start(date)
-            period_counts[period] += 1
-
-# Then, the method creates the variables to start calculating the longest streak, sort the periods,
-# and set initial values for the current longest streak, and the previous period.
-        sorted_periods = sorted(period_counts.keys())
-        longest_streak = 0
-        current_streak = 0
-        previous_period = None
-
-# After that, the method iterate through each period and checks whether the completion count
-# meets the required periodicity. If so, it checks whether the periods are consecutive
-# and updates the current and longest streaks.
-        for period in sorted_periods:
-            count = period_counts[period]
-            if count == self.periodicity:
-                if previous_period is None:
-                    current_streak = 1
-                else:
-                    if period - previous_period == duration:
-                        current_streak += 1
-                    else:
-                        current_streak = 1
-                longest_streak = max(longest_streak, current_streak)
-            else:
-                current_streak = 0
-            previous_period = period
-
-# Finally returns the longest streak of the desired habit.
-        return longest_streak
-
+# Then the number of completions in each period, from the oldest period to the newest, is given to
+# streaks_from_period_counts, which finds the longest run of consecutive periods that meet the periodicity.
+        current_period = period_of(datetime.now(), self.frequency)
+        return streaks_from_period_counts(self._period_counts(), self.periodicity, current_period)[1]
@@ -0,0 +1,122 @@
+import csv
+import json
+import logging
+import time
+from datetime import datetime
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(file):
+    """
+    This function reads completions from a CSV file with the columns habit_name and completion_date,
+    one row at a time.
+
+    Args:
+        file (file): the open CSV file.
+
+    Yields:
+        tuple[str, str]: the habit name and the completion date as written in the file.
+    """
+    for row in csv.DictReader(file):
+        yield row.get('habit_name'), row.get('completion_date')
+
+
+def read_jsonl(file):
+    """
+    This function reads completions from a JSON Lines file, where each line is an object
+    with the keys habit_name and completion_date, one line at a time.
+
+    Args:
+        file (file): the open JSON Lines file.
+
+    Yields:
+        tuple[str, str]: the habit name and the completion date as written in the file.
+    """
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield None, None
+            continue
+        if isinstance(record, dict):
+            yield record.get('habit_name'), record.get('completion_date')
+        else:
+            yield None, None
+
+
+def parse_date(value):
+    """
+    This function reads a completion date written as ISO-8601 text or as seconds since the epoch.
+    The completion dates are stored in local time without an offset, like datetime.now(), so seconds since
+    the epoch and dates with a UTC offset are converted to the local time. A date without an offset is kept as it is.
+
+    Args:
+        value (str | int): the completion date from the file.
+
+    Returns:
+        datetime: the completion date, or None if the value is not a valid date.
+    """
+    try:
+        if isinstance(value, int) or (isinstance(value, str) and value.strip().isdigit()):
+            return datetime.fromtimestamp(int(value))
+        completion_date = datetime.fromisoformat(value)
+        if completion_date.tzinfo is not None:
+            completion_date = completion_date.astimezone().replace(tzinfo=None)
+        return completion_date
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def import_completions(db: Database, file, file_format: str = 'csv', batch_size: int = 1000):
+    """
+    This function imports completion dates from a CSV or JSON Lines file into the database.
+    The file is read as a stream, so it can be larger than the memory or come from stdin.
+    Rows whose habit does not exist in the database or whose date is not valid are skipped.
+
+    Args:
+        db (Database): use the Database.
+        file (file): the open file to read.
+        file_format (str, optional): the format of the file, 'csv' or 'jsonl', by default 'csv'.
+        batch_size (int, optional): the number of completions in each transaction, by default 1000.
+
+    Returns:
+        dict: the number of rows imported and skipped, the seconds it took and the rows imported per second.
+    """
+    if file_format == 'csv':
+        records = read_csv(file)
+    elif file_format == 'jsonl':
+        records = read_jsonl(file)
+    else:
+        raise ValueError(f"The file format is not correct '{file_format}'. The format should be csv or jsonl.")
+
+    habit_names = set(db.habit_names())
+    skipped = 0
+
+    def valid_completions():
+        nonlocal skipped
+        for line_number, (habit_name, value) in enumerate(records, start=1):
+            completion_date = parse_date(value)
+            # A habit name that is not text, such as a list in a JSON line, cannot be looked up in the set.
+            if not isinstance(habit_name, str) or habit_name not in habit_names or completion_date is None:
+                skipped += 1
+                logger.warning("Row %s was skipped: habit '%s', date '%s'.", line_number, habit_name, value)
+                continue
+            yield habit_name, completion_date
+
+    start = time.perf_counter()
+    imported = db.add_completions_bulk(valid_completions(), batch_size=batch_size)
+    seconds = time.perf_counter() - start
+    report = {
+        'imported': imported,
+        'skipped': skipped,
+        'seconds': seconds,
+        'rows_per_second': imported / seconds if seconds > 0 else 0.0,
+    }
+    logger.info("%s completions were imported and %s rows were skipped in %.2f seconds.", imported, skipped, seconds)
+    return report
@@ -0,0 +1,298 @@
+import functools
+import inspect
+import logging
+import sys
+import threading
+from time import perf_counter_ns
+import analysis
+from database import Database
+from habit import Habit
+
+logger = logging.getLogger(__name__)
+
+# The Habit methods that calculate streaks or count completions, the other ones are too cheap to be worth timing.
+HABIT_METHODS = ('can_mark_performed', 'count_in_period', 'calculate_current_streak', 'calculate_longest_streak')
+
+# A call that took t microseconds is counted in the bucket t.bit_length(), so bucket i holds the calls that took
+# less than 2 ** i microseconds and at least half of that. The last bucket also holds every slower call.
+HISTOGRAM_BUCKETS = 32
+
+# Each thread records its calls in its own dictionary, so that recording a call never waits for a lock.
+# The dictionaries are only read together when a snapshot is taken.
+_local = threading.local()
+_registry = []
+_registry_lock = threading.Lock()
+_originals = []
+_profiler = None
+_pstats_file = None
+
+
+def _thread_stats():
+    """
+    This function returns the statistics of the current thread, registering them the first time.
+    """
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        stats = _local.stats = {}
+        with _registry_lock:
+            _registry.append(stats)
+    return stats
+
+
+def _row_count(result):
+    """
+    This function counts the rows returned by a call: the length of a list, a dictionary or a set,
+    no row for None and one row for anything else, such as a habit, a tuple or a number.
+    """
+    if result is None:
+        return 0
+    if isinstance(result, (list, dict, set)):
+        return len(result)
+    return 1
+
+
+def _record(name: str, elapsed_ns: int, rows: int, failed: bool):
+    """
+    This function adds one call to the statistics of the current thread.
+    """
+    stats = _thread_stats()
+    entry = stats.get(name)
+    if entry is None:
+        # calls, errors, rows, total nanoseconds, slowest call in nanoseconds, histogram
+        entry = stats[name] = [0, 0, 0, 0, 0, [0] * HISTOGRAM_BUCKETS]
+    entry[0] += 1
+    entry[1] += failed
+    entry[2] += rows
+    entry[3] += elapsed_ns
+    if elapsed_ns > entry[4]:
+        entry[4] = elapsed_ns
+    entry[5][min(HISTOGRAM_BUCKETS - 1, (elapsed_ns // 1000).bit_length())] += 1
+
+
+def _instrument(name: str, function):
+    """
+    This function wraps a function so that every call records its latency, its rows and whether it failed.
+    A generator function runs its SQL while its rows are read, so its call is recorded when the rows have all
+    been read or it is closed, with the rows it yielded and the time spent producing them.
+    """
+    if inspect.isgeneratorfunction(function):
+        return _instrument_generator(name, function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            _record(name, perf_counter_ns() - start, 0, True)
+            raise
+        _record(name, perf_counter_ns() - start, _row_count(result), False)
+        return result
+    return wrapper
+
+
+def _instrument_generator(name: str, function):
+    """
+    This function wraps a generator function so that every call records the time spent inside the generator,
+    without the time the caller spends on each row, and the number of rows it yielded.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        elapsed_ns = rows = 0
+        failed = True
+        generator = function(*args, **kwargs)
+        try:
+            while True:
+                start = perf_counter_ns()
+                try:
+                    row = next(generator)
+                except StopIteration:
+                    failed = False
+                    return
+                finally:
+                    elapsed_ns += perf_counter_ns() - start
+                rows += 1
+                yield row
+        except GeneratorExit:
+            # The caller stopped reading before the last row, which is not a failure.
+            failed = False
+            raise
+        finally:
+            generator.close()
+            _record(name, elapsed_ns, rows, failed)
+    return wrapper
+
+
+def _targets():
+    """
+    This function lists what is instrumented: every Database method, every public analysis function
+    and the streak methods of Habit, as the owner, the attribute name and the name used in the statistics.
+    """
+    targets = []
+    for attribute, value in vars(Database).items():
+        if inspect.isfunction(value) and not attribute.startswith('__'):
+            targets.append((Database, attribute, f"Database.{attribute}"))
+    for attribute, value in vars(analysis).items():
+        if inspect.isfunction(value) and value.__module__ == analysis.__name__ and not attribute.startswith('_'):
+            targets.append((analysis, attribute, f"analysis.{attribute}"))
+    targets.extend((Habit, attribute, f"Habit.{attribute}") for attribute in HABIT_METHODS)
+    return targets
+
+
+def is_enabled():
+    """
+    This function tells if the instrumentation is enabled.
+
+    Returns:
+        bool: True if the calls are being recorded.
+    """
+    return bool(_originals)
+
+
+def enable():
+    """
+    This function starts recording the calls of the Database methods, the analysis functions and the Habit
+    streak methods, by replacing them with timed wrappers. Until it is called nothing is replaced,
+    so the instrumentation costs nothing when it is not enabled.
+
+    The analysis functions are replaced in the analysis module, so they are only recorded when they are
+    called through it, as in analysis.show_longest_streak(), and not when they were imported by name.
+    """
+    if _originals:
+        return
+    for owner, attribute, name in _targets():
+        original = getattr(owner, attribute)
+        _originals.append((owner, attribute, original))
+        setattr(owner, attribute, _instrument(name, original))
+    logger.info("The instrumentation of %s functions was enabled.", len(_originals))
+
+
+def disable():
+    """
+    This function puts the original functions back. The statistics recorded so far are kept.
+    """
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    logger.info("The instrumentation was disabled.")
+
+
+def reset():
+    """
+    This function forgets the statistics recorded so far, in every thread.
+    """
+    with _registry_lock:
+        for stats in _registry:
+            stats.clear()
+
+
+def _percentile(histogram: list, fraction: float):
+    """
+    This function estimates a percentile from a histogram as the upper bound of the bucket that contains it.
+    """
+    target = fraction * sum(histogram)
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if count and seen >= target:
+            return (2 ** bucket) / 1e6
+    return 0.0
+
+
+def snapshot():
+    """
+    This function adds up the statistics of every thread. While other threads are running,
+    a call that is being recorded at the same time may be missing from the snapshot.
+
+    Returns:
+        dict[str, dict]: for every function called at least once, the number of calls and failed calls,
+        the rows returned, the total, mean and slowest time in seconds, the estimated p50 and p99 in seconds,
+        and the histogram, where bucket i counts the calls that took less than 2 ** i microseconds.
+    """
+    merged = {}
+    with _registry_lock:
+        registry = list(_registry)
+    for stats in registry:
+        for name, entry in list(stats.items()):
+            total = merged.setdefault(name, [0, 0, 0, 0, 0, [0] * HISTOGRAM_BUCKETS])
+            total[0] += entry[0]
+            total[1] += entry[1]
+            total[2] += entry[2]
+            total[3] += entry[3]
+            total[4] = max(total[4], entry[4])
+            total[5] = [a + b for a, b in zip(total[5], entry[5])]
+    return {
+        name: {
+            'calls': calls,
+            'errors': errors,
+            'rows': rows,
+            'total_seconds': total_ns / 1e9,
+            'mean_seconds': total_ns / calls / 1e9,
+            'max_seconds': max_ns / 1e9,
+            'p50_seconds': _percentile(histogram, 0.5),
+            'p99_seconds': _percentile(histogram, 0.99),
+            'histogram': histogram,
+        }
+        for name, (calls, errors, rows, total_ns, max_ns, histogram) in merged.items() if calls
+    }
+
+
+def summary():
+    """
+    This function formats the statistics as a table, from the function that took the most time to the least.
+
+    Returns:
+        str: the table, or a message if nothing was recorded.
+    """
+    stats = snapshot()
+    if not stats:
+        return 'No calls were recorded.'
+    lines = [f"{'function':<40} {'calls':>8} {'errors':>6} {'rows':>9} {'total ms':>10} {'mean ms':>9} "
+             f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>9}"]
+    for name, entry in sorted(stats.items(), key=lambda item: item[1]['total_seconds'], reverse=True):
+        lines.append(f"{name:<40} {entry['calls']:>8} {entry['errors']:>6} {entry['rows']:>9} "
+                     f"{entry['total_seconds'] * 1000:>10.2f} {entry['mean_seconds'] * 1000:>9.3f} "
+                     f"{entry['p50_seconds'] * 1000:>8.3f} {entry['p99_seconds'] * 1000:>8.3f} "
+                     f"{entry['max_seconds'] * 1000:>9.3f}")
+    return '\n'.join(lines)
+
+
+def start_profile(pstats_file: str = None):
+    """
+    This function starts a profiled run: it enables the instrumentation and, if a file is given,
+    also runs cProfile so that the whole run can be explored later with pstats.
+
+    Args:
+        pstats_file (str, optional): the file to save the cProfile statistics to, by default none is saved.
+    """
+    global _profiler, _pstats_file
+    reset()
+    enable()
+    if pstats_file:
+        import cProfile
+        _pstats_file = pstats_file
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop_profile(file=None):
+    """
+    This function ends a profiled run: it disables the instrumentation, writes the summary
+    and saves the cProfile statistics if they were requested.
+
+    Args:
+        file (file, optional): where to write the summary, by default the standard error.
+    """
+    global _profiler, _pstats_file
+    disable()
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_pstats_file)
+        logger.info("The profile was saved to '%s'.", _pstats_file)
+    file = file or sys.stderr
+    print(summary(), file=file)
+    if _profiler is not None:
+        print(f"The cProfile statistics were saved to '{_pstats_file}', read them with: "
+              f"python -m pstats {_pstats_file}", file=file)
+    _profiler = None
+    _pstats_file = None
@@ -0,0 +1,133 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import time
+
+LOG_FORMAT = '%(asctime)s:%(name)s:%(levelname)s:%(message)s'
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that puts the records in the queue as they are, so that the message is formatted
+    by the background thread that writes it and not by the thread that logged it.
+    The arguments of a message are kept until it is written, so they must not be changed after logging,
+    which is the case for the strings, numbers and dates logged by the application.
+    """
+
+    def prepare(self, record: logging.LogRecord):
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    A filter that lets through at most `rate` records per second from each line of code that logs,
+    with bursts of up to `burst` records, so that a loop that logs on every iteration cannot flood the log.
+    When a line is let through again, its message says how many records of that line were dropped.
+    Warnings and errors are never dropped, only DEBUG and INFO records are limited.
+
+    Each line has its own token bucket. The buckets are updated without a lock: when two threads log from
+    the same line at the same time, one record more or less may be let through, which is harmless.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 50):
+        super().__init__()
+        if rate <= 0 or burst < 1:
+            raise ValueError("The rate must be positive and the burst at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+
+    def filter(self, record: logging.LogRecord):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # tokens, time of the last update, records dropped since the last one let through
+            bucket = self._buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.msg = f"{record.getMessage()} ({bucket[2]} similar messages were dropped)"
+            record.args = None
+            bucket[2] = 0
+        return True
+
+
+def configure_logging(filename: str = 'habit_tracker.log', level: int = logging.INFO, max_bytes: int = 10 * 2 ** 20,
+                      backup_count: int = 5, when: str = None, rate: float = 10.0, burst: int = 50):
+    """
+    This function sends the log of the application to a file through a queue, so that logging never waits
+    for the disk: the records are put in the queue by the thread that logs and written by a background thread.
+    The records below the level are discarded before any message is formatted. The file is rotated by size,
+    or by time when `when` is given, and every line of code is limited to `rate` DEBUG and INFO records per second.
+
+    Calling it again replaces the previous configuration. The queue is written out when the program exits.
+
+    Args:
+        filename (str, optional): the log file, by default 'habit_tracker.log'.
+        level (int, optional): the lowest level written, by default logging.INFO.
+        max_bytes (int, optional): rotate the file when it reaches this size, by default 10 MB.
+        backup_count (int, optional): the number of rotated files kept, by default 5.
+        when (str, optional): rotate the file by time instead, as in TimedRotatingFileHandler, for example 'midnight'.
+        rate (float, optional): the records per second let through from each line of code, by default 10,
+            None to let every record through.
+        burst (int, optional): the records let through at once from each line of code, by default 50.
+
+    Returns:
+        logging.handlers.QueueListener: the background writer, which stop_logging() stops.
+    """
+    global _listener
+    stop_logging()
+    if when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(filename, when=when, backupCount=backup_count,
+                                                                 encoding='utf-8', delay=True)
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                            encoding='utf-8', delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # A SimpleQueue never blocks the thread that logs, and needs no lock to put a record.
+    records = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    if rate is not None:
+        queue_handler.addFilter(RateLimitFilter(rate, burst))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """
+    This function writes the records still in the queue, stops the background writer and closes the file.
+    """
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    atexit.unregister(stop_logging)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
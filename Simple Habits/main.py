@@ -1,15 +1,14 @@
 import click
 import logging
 from habit import Habit
-from database import Database
+from database import Database, HABIT_ROW_SORTS
+from periods import FREQUENCY_HELP
 import analysis
+from cli import FREQUENCY
+import logconfig
 import sys
 
-logging.basicConfig(
-    filename='habit_tracker.log',
-    level=logging.INFO,
-    format='%(asctime)s:%(name)s:%(levelname)s:%(message)s'
-)
+logconfig.configure_logging()
 logger = logging.getLogger(__name__)
 
 db = Database()
@@ -28,67 +27,93 @@ def create_habit():
             continue
         if name.isdigit():
             click.echo("Please enter a valid name.")
-            logger.info(f"The user entered an incorrect habit name: {name}")
+            logger.info("The user entered an incorrect habit name: %s", name)
             continue
         break
 
     frequency = click.prompt(
-        'How often do you plan to do this habit?',
-        type=click.Choice(['daily', 'weekly'], case_sensitive=False)
+        f'How often do you plan to do this habit? ({FREQUENCY_HELP})',
+        type=FREQUENCY
     )
     periodicity = click.prompt(
         'How many times are you going to perform the habit in that period?',
         type=click.IntRange(1, 20)
     )
-    habit = Habit(name=name, frequency=frequency.lower(), periodicity=periodicity)
+    habit = Habit(name=name, frequency=frequency, periodicity=periodicity)
     db.new_created_habit(habit)
-    logger.info(f"The habit '{habit.name}' was created.")
+    logger.info("The habit '%s' was created.", habit.name)
     click.echo(f"You have decided to commit to the habit '{name}'. Congratulations, you can do it!")
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
-def delete_habit():
+# The number of habits listed when the user searches for one.
+SEARCH_RESULTS = 10
+
+
+def choose_habit(title: str, empty_message: str):
     """
-    This function allows the user to choose a habit that they no longer want to do and delete it from the database.
+    This function lets the user find a habit by typing the start of its name, or a part of it, and choose it
+    from the numbered list of the best matches. The matches come from the index of the names,
+    so no habit is read from the database until one is chosen.
+
+    Args:
+        title (str): the text shown above the list of matches.
+        empty_message (str): the text shown when there are no habits.
+
+    Returns:
+        str: the name of the chosen habit, or None if there are no habits.
     """
-    habits = db.show_all_habits()
-    if not habits:
-        click.echo('The habit to delete has not been found.')
-        logger.info("There is no habit to delete")
+    index = db.name_index()
+    if not len(index):
+        click.echo(empty_message)
+        logger.info("No habits were recorded.")
         click.prompt('Press Enter to return to the main menu', default='', show_default=False)
-        return
-
-    click.echo('You have these habits:')
-    for x, habit in enumerate(habits, start=1):
-        click.echo(f"{x}. {habit.name}")
+        return None
 
+    matches = index.search('', SEARCH_RESULTS)
     while True:
-        try:
-            choice = click.prompt('Choose the number of the habit you want to eliminate', type=int)
-            if 1 <= choice <= len(habits):
-                habit = habits[choice - 1]
-                break
-            else:
-                click.echo('Please select a habit number from the list.')
-                logger.info(f"Invalid habit selection: {choice}")
-        except (ValueError, TypeError):
-            click.echo('Invalid input. Please enter a valid number.')
-            logger.info("User entered invalid input for habit selection.")
+        if matches:
+            click.echo(title)
+            for x, habit_name in enumerate(matches, start=1):
+                click.echo(f"{x}. {habit_name}")
+        else:
+            click.echo('No habit matches your search.')
+        if len(index) > len(matches):
+            click.echo(f'{len(index)} habits in total, type part of a name to search for others.')
+        answer = click.prompt('Choose the number of the habit, or type part of its name to search').strip()
+        # The names of the habits cannot be numbers, so a number is always a choice from the list.
+        if answer.isdigit():
+            if 1 <= int(answer) <= len(matches):
+                return matches[int(answer) - 1]
+            click.echo('Please select a habit number from the list.')
+            logger.info("Invalid habit selection: %s", answer)
+        else:
+            matches = index.search(answer, SEARCH_RESULTS)
+            logger.info("The search '%s' found %s habits.", answer, len(matches))
+
+
+def delete_habit():
+    """
+    This function allows the user to choose a habit that they no longer want to do and delete it from the database.
+    """
+    habit_name = choose_habit('You have these habits:', 'The habit to delete has not been found.')
+    if habit_name is None:
+        return
 
     while True:
-        confirm = click.prompt(f"Are you sure you want to delete habit '{habit.name}'? [y/n]", type=str)
+        confirm = click.prompt(f"Are you sure you want to delete habit '{habit_name}'? [y/n]", type=str)
         if confirm.lower() in ('y', 'yes'):
-            db.delete_habit(habit.name)
-            click.echo(f"The habit '{habit.name}' was deleted from your list.")
-            logger.info(f"Deleted {habit.name}")
+            db.delete_habit(habit_name)
+            click.echo(f"The habit '{habit_name}' was deleted from your list.")
+            logger.info("Deleted %s", habit_name)
             break
         elif confirm.lower() in ('n', 'no'):
-            click.echo(f"The habit '{habit.name}' was not deleted from your list.")
-            logger.info(f"The user canceled the deletion of the habit '{habit.name}'.")
+            click.echo(f"The habit '{habit_name}' was not deleted from your list.")
+            logger.info("The user canceled the deletion of the habit '%s'.", habit_name)
             break
         else:
             click.echo("Invalid input. Please enter 'y' or 'n'.")
-            logger.info(f"Invalid confirmation input: {confirm}")
+            logger.info("Invalid confirmation input: %s", confirm)
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
@@ -97,53 +122,73 @@ def habit_performed():
     This function allows you to mark a habit as being performed the number of times equal to the periodicity
     that the user has chosen.
     """
-    habits = db.show_all_habits()
-    if not habits:
-        click.echo('You don\'t have any habits created yet.')
-        logger.info("There are no habits yet.")
-        click.prompt('Press Enter to return to the main menu', default='', show_default=False)
+    habit_name = choose_habit('You have the following habits:', 'You don\'t have any habits created yet.')
+    if habit_name is None:
         return
 
-    click.echo('You have the following habits:')
-    for x, habit in enumerate(habits, start=1):
-        click.echo(f"{x}. {habit.name}")
-
-    while True:
-        try:
-            choice = click.prompt('Select the habit you want to mark as done', type=int)
-            if 1 <= choice <= len(habits):
-                habit = habits[choice - 1]
-                break
-            else:
-                click.echo('Please select a habit number from the list.')
-                logger.info(f"User entered invalid input for habit selection.")
-        except (ValueError, TypeError):
-            click.echo('Please select a habit number from the list.')
-            logger.info("User entered invalid input for habit selection.")
-
-    if habit.can_mark_performed():
-        habit.performed()
-        db.add_completion(habit.name, habit.completion_dates[-1])
+    # Only the chosen habit is read from the database.
+    habit = db.find_habit(habit_name)
+    if habit is None:
+        click.echo(f"The habit '{habit_name}' does not exist anymore.")
+        logger.info("The habit '%s' was deleted before it was performed.", habit_name)
+    elif db.can_mark_performed(habit.name):
+        completion_date = habit.performed()
+        db.add_completion(habit.name, completion_date)
         click.echo(f"Great job! You've marked '{habit.name}' as completed.")
-        logger.info(f"The habit '{habit.name}' was performed.")
+        logger.info("The habit '%s' was performed.", habit.name)
     else:
         click.echo(f"You have already completed '{habit.name}' according to its periodicity")
-        logger.info(f"The habit '{habit.name}' has completed the periodicity.")
+        logger.info("The habit '%s' has completed the periodicity.", habit.name)
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
+# The number of habits shown in each page of the tables.
+TABLE_PAGE_SIZE = 20
+
+
+def next_table_page():
+    """
+    This function asks the user if they want to see the next page of a table.
+
+    Returns:
+        bool: True if the next page should be shown.
+    """
+    answer = click.prompt('Press Enter to see more habits or q to stop', default='', show_default=False)
+    return answer.strip().lower() != 'q'
+
+
+def show_habit_table(frequency: str = None):
+    """
+    This function asks the user how to sort and filter the table of habits and shows it page by page,
+    with the rows read from the database as they are shown. Sorted by the last completion,
+    the habits performed most recently come first.
+
+    Args:
+        frequency (str, optional): only show the habits with this frequency, by default all habits.
+
+    Returns:
+        int: the number of habits shown.
+    """
+    sort = click.prompt('Sort the habits by', type=click.Choice(list(HABIT_ROW_SORTS), case_sensitive=False),
+                        default='created')
+    name_prefix = click.prompt('Only show the habits whose name starts with (Enter for all)', default='',
+                               show_default=False).strip()
+    return analysis.stream_table_of_habits(db, frequency, name_prefix or None, sort.lower(),
+                                           descending=sort.lower() == 'last_done', page_size=TABLE_PAGE_SIZE,
+                                           next_page=next_table_page, echo=click.echo)
+
+
 def all_habits():
     """
     This function displays a table of all habits, the table shows the name of the habit, its creation date,
     the frequency of the habit and its periodicity and also the date of the last time the habit was performed.
     """
-    habits = db.show_all_habits()
-    if not habits:
+    if next(db.habit_rows(page_size=1), None) is None:
         click.echo('There are no habits created at the moment.')
         logger.info("No habits were recorded.")
         click.prompt('Press Enter to return to the main menu', default='', show_default=False)
         return
-    analysis.table_of_habits(habits)
+    show_habit_table()
     logger.info("Show list of all habits.")
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
@@ -153,16 +198,15 @@ def habits_frequency():
     This function also displays a list with the same information as the all_habits function,
     but allows the user to filter habits according to their frequency.
     """
-    frequency = click.prompt('Select the frequency of the habits you want to see',
-                             type=click.Choice(['daily', 'weekly'], case_sensitive=False))
-    habits = analysis.list_frequency(db, frequency.lower())
-    if not habits:
+    frequency = click.prompt(f'Select the frequency of the habits you want to see ({FREQUENCY_HELP})',
+                             type=FREQUENCY)
+    if next(db.habit_rows(frequency, page_size=1), None) is None:
         click.echo(f'No {frequency} habits found.')
-        logger.info(f"There are no habits with the frequency '{frequency}'.")
+        logger.info("There are no habits with the frequency '%s'.", frequency)
         click.prompt('Press Enter to return to the main menu', default='', show_default=False)
         return
-    analysis.table_of_habits(habits)
-    logger.info(f"List of habits with the following frequency '{frequency}'.")
+    show_habit_table(frequency)
+    logger.info("List of habits with the following frequency '%s'.", frequency)
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
@@ -170,31 +214,12 @@ def view_completion_dates():
     """
     This function allows the user to see the last seven completion dates of the habit they want to inspect.
     """
-    habits = db.show_all_habits()
-    if not habits:
-        click.echo('There are no habits created at the moment.')
-        logger.info("No habits were recorded.")
-        click.prompt('Press Enter to return to the main menu', default='', show_default=False)
+    habit_name = choose_habit('Choose the habit you want to view completion dates for:',
+                              'There are no habits created at the moment.')
+    if habit_name is None:
         return
 
-    click.echo('Choose the habit you want to view completion dates for:')
-    for x, habit in enumerate(habits, start=1):
-        click.echo(f"{x}. {habit.name}")
-
-    while True:
-        try:
-            choice = click.prompt('Choose the number of the habit', type=int)
-            if 1 <= choice <= len(habits):
-                habit = habits[choice - 1]
-                break
-            else:
-                click.echo('Please select a habit number from the list.')
-                logger.info(f"Invalid habit selection: {choice}")
-        except (ValueError, TypeError):
-            click.echo('Invalid input. Please enter a valid number.')
-            logger.info("The user entered invalid input for habit selection.")
-
-    analysis.display_completion_dates(habit)
+    analysis.display_completion_dates(db, habit_name)
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
@@ -202,33 +227,14 @@ def view_current_streak():
     """
     This function shows the current streak of the habit that the user wants to inspect.
     """
-    habits = db.show_all_habits()
-    if not habits:
-        click.echo('There are no habits created at the moment.')
-        logger.info("No habits were recorded.")
-        click.prompt('Press Enter to return to the main menu', default='', show_default=False)
+    habit_name = choose_habit('Choose the habit you want to check the current streak for:',
+                              'There are no habits created at the moment.')
+    if habit_name is None:
         return
 
-    click.echo('Choose the habit you want to check the current streak for:')
-    for x, habit in enumerate(habits, start=1):
-        click.echo(f"{x}. {habit.name}")
-
-    while True:
-        try:
-            choice = click.prompt('Choose the number of the habit', type=int)
-            if 1 <= choice <= len(habits):
-                habit = habits[choice - 1]
-                break
-            else:
-                click.echo('Please select a habit number from the list.')
-                logger.info(f"Invalid habit selection: {choice}")
-        except (ValueError, TypeError):
-            click.echo('Invalid input. Please enter a valid number.')
-            logger.info("The user entered invalid input for habit selection.")
-
-    current_streak = habit.calculate_current_streak()
-    click.echo(f"The current streak for habit '{habit.name}' is {current_streak}.")
-    logger.info(f"The current streak '{current_streak}' for the habit '{habit.name}' was shown.")
+    current_streak = analysis.current_streak_for_habit(db, habit_name)
+    click.echo(f"The current streak for habit '{habit_name}' is {current_streak}.")
+    logger.info("The current streak '%s' for the habit '%s' was shown.", current_streak, habit_name)
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
@@ -236,33 +242,13 @@ def specific_longest_streak():
     """
     This feature allows the user to see the longest streak they have achieved in a specific habit.
     """
-    habits = db.show_all_habits()
-    if not habits:
-        click.echo('There are no habits created at the moment.')
-        logger.info("No habits were recorded.")
-        click.prompt('Press Enter to return to the main menu', default='', show_default=False)
+    habit_name = choose_habit('Choose the habit you want to check:', 'There are no habits created at the moment.')
+    if habit_name is None:
         return
 
-    click.echo('Choose the habit you want to check:')
-    for x, habit in enumerate(habits, start=1):
-        click.echo(f"{x}. {habit.name}")
-
-    while True:
-        try:
-            choice = click.prompt('Choose the number of the habit you want to look at', type=int)
-            if 1 <= choice <= len(habits):
-                habit = habits[choice - 1]
-                break
-            else:
-                click.echo('Please select a habit number from the list.')
-                logger.info(f"Invalid habit selection: {choice}")
-        except (ValueError, TypeError):
-            click.echo('Invalid input. Please enter a valid number.')
-            logger.info("The user entered invalid input for habit selection.")
-
-    longest_streak = habit.calculate_longest_streak()
-    click.echo(f"The longest streak for habit '{habit.name}' is {longest_streak}.")
-    logger.info(f"The longest streak '{longest_streak}' for the habit '{habit.name}' was shown.")
+    longest_streak = analysis.longest_streak_for_habit(db, habit_name)
+    click.echo(f"The longest streak for habit '{habit_name}' is {longest_streak}.")
+    logger.info("The longest streak '%s' for the habit '%s' was shown.", longest_streak, habit_name)
     click.prompt('Press Enter to return to the main menu', default='', show_default=False)
 
 
@@ -272,9 +258,9 @@ def longest_streak():
     """
     habit = analysis.show_longest_streak(db)
     if habit:
-        longest_streak = habit.calculate_longest_streak()
+        longest_streak = analysis.longest_streak_for_habit(db, habit.name)
         click.echo(f"The habit with the longest streak is '{habit.name}', with a streak of {longest_streak}.")
-        logger.info(f"The habit '{habit.name}' longest streak {longest_streak}.")
+        logger.info("The habit '%s' longest streak %s.", habit.name, longest_streak)
     else:
         click.echo('There are no habits created at the moment.')
         logger.info("No habits were recorded.")
@@ -342,9 +328,29 @@ def main():
             close_program()
         else:
             click.echo('The selected option is not in the menu, please choose an option from the menu.')
-            logger.warning(f"The user used an incorrect input")
+            logger.warning("The user used an incorrect input")
             continue
 
 
+@click.command()
+@click.option('--profile', is_flag=True, help='Record the time spent in the database and the analysis, '
+                                               'and show a summary when the program finishes.')
+@click.option('--pstats', 'pstats_file', type=click.Path(dir_okay=False), default=None,
+              help='Also save a cProfile of the whole run to this file, implies --profile.')
+def run(profile, pstats_file):
+    """
+    Start the habit tracker menu.
+    """
+    if not (profile or pstats_file):
+        main()
+        return
+    import instrumentation
+    instrumentation.start_profile(pstats_file)
+    try:
+        main()
+    finally:
+        instrumentation.stop_profile()
+
+
 if __name__ == '__main__':
-    main()
+    run()
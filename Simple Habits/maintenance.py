@@ -0,0 +1,105 @@
+import click
+from cli import FREQUENCY
+from database import Database
+import exporter
+import importer
+
+
+@click.group()
+@click.option('--db', 'db_name', default='habits.db', show_default=True, help='The database file to work on.')
+@click.pass_context
+def cli(ctx, db_name):
+    """
+    Maintenance commands for the Simple Habits database.
+    """
+    db = Database(db_name=db_name, insert_predefined=False)
+    ctx.obj = db
+    ctx.call_on_close(db.exit)
+
+
+@cli.command('rebuild-streaks')
+@click.pass_obj
+def rebuild_streaks(db: Database):
+    """
+    Rebuild the stored streaks of every habit from their completion dates.
+    """
+    db.rebuild_streaks()
+    click.echo(f"The streaks in '{db.db_name}' were rebuilt.")
+
+
+@cli.command('backfill-rollup')
+@click.option('--batch-size', type=click.IntRange(1), default=500, show_default=True,
+              help='The number of habits in each transaction.')
+@click.pass_obj
+def backfill_rollup(db: Database, batch_size):
+    """
+    Recompute the number of completions of every habit in each period, and the streaks, from the completion dates.
+    """
+    count = db.backfill_period_counts(batch_size=batch_size)
+    click.echo(f"The period counts of {count} habits in '{db.db_name}' were backfilled.")
+
+
+@cli.command('check-rollup')
+@click.option('--repair', is_flag=True, help='Backfill the period counts if they do not match.')
+@click.pass_obj
+def check_rollup(db: Database, repair):
+    """
+    Compare the number of completions of every habit in each period with the completion dates.
+    The exit code is 1 if they do not match and they were not repaired.
+    """
+    mismatches = db.check_period_counts()
+    for habit_name, period, stored_count, raw_count in mismatches:
+        click.echo(f"{habit_name}: period {period} has {stored_count} completions stored "
+                   f"but {raw_count} completion dates.")
+    if not mismatches:
+        click.echo(f"The period counts in '{db.db_name}' match the completion dates.")
+    elif repair:
+        db.backfill_period_counts()
+        click.echo(f"The period counts in '{db.db_name}' were repaired.")
+    else:
+        raise click.exceptions.Exit(1)
+
+
+@cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(importer.FORMATS), default=None,
+              help='The format of the file, by default it is taken from the file extension.')
+@click.option('--batch-size', type=click.IntRange(1), default=1000, show_default=True,
+              help='The number of completions in each transaction.')
+@click.pass_obj
+def import_completions(db: Database, file, file_format, batch_size):
+    """
+    Import completion dates from a CSV or JSON Lines FILE, use - to read from stdin.
+    """
+    if file_format is None:
+        file_format = 'jsonl' if file.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    report = importer.import_completions(db, file, file_format=file_format, batch_size=batch_size)
+    click.echo(f"Imported {report['imported']} completions and skipped {report['skipped']} rows "
+               f"in {report['seconds']:.2f} seconds ({report['rows_per_second']:.0f} rows/sec).")
+
+
+@cli.command('export')
+@click.argument('table', type=click.Choice(exporter.TABLES))
+@click.option('--output', '-o', 'file', type=click.File('w', encoding='utf-8'), default='-',
+              help='The file to write, by default stdout.')
+@click.option('--format', 'file_format', type=click.Choice(exporter.FORMATS), default='csv', show_default=True,
+              help='The format of the file.')
+@click.option('--habit', 'habit_name', default=None, help='Only export this habit.')
+@click.option('--frequency', type=FREQUENCY, default=None, help='Only export habits with this frequency.')
+@click.option('--since', type=click.DateTime(), default=None, help='Only export completions from this date on.')
+@click.option('--until', type=click.DateTime(), default=None, help='Only export completions before this date.')
+@click.pass_obj
+def export_table(db: Database, table, file, file_format, habit_name, frequency, since, until):
+    """
+    Export the habits or the completions TABLE as CSV or JSON Lines.
+    """
+    if table == 'habits':
+        count = exporter.export_habits(db, file, file_format=file_format, frequency=frequency, habit_name=habit_name)
+    else:
+        count = exporter.export_completions(db, file, file_format=file_format, frequency=frequency,
+                                            habit_name=habit_name, start=since, end=until)
+    click.echo(f"Exported {count} {table}.", err=True)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,235 @@
+import click
+import logging
+import os
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database import Database
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The upper bounds of the latency buckets, as powers of two of microseconds (32 us to 34 s).
+# They are a subset of the buckets recorded by the instrumentation, so the cumulative counts are exact.
+BUCKET_EXPONENTS = range(5, 26, 2)
+
+def _label(value: str):
+    """
+    This function escapes a label value of the text format.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(lines: list, metric: str, label: str, stats: dict):
+    """
+    This function writes the latency histograms of the instrumented functions as one Prometheus histogram.
+    """
+    for name, entry in sorted(stats.items()):
+        cumulative = 0
+        buckets = entry['histogram']
+        for index, exponent in enumerate(BUCKET_EXPONENTS):
+            start = BUCKET_EXPONENTS[index - 1] + 1 if index else 0
+            cumulative += sum(buckets[start:exponent + 1])
+            lines.append(f'{metric}_bucket{{{label}="{_label(name)}",le="{2 ** exponent / 1e6:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label}="{_label(name)}",le="+Inf"}} {entry["calls"]}')
+        lines.append(f'{metric}_sum{{{label}="{_label(name)}"}} {entry["total_seconds"]:.9f}')
+        lines.append(f'{metric}_count{{{label}="{_label(name)}"}} {entry["calls"]}')
+
+
+def _metric(lines: list, name: str, metric_type: str, help_text: str):
+    """
+    This function writes the HELP and TYPE lines of a metric.
+    """
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {metric_type}')
+
+
+def collect(db: Database):
+    """
+    This function collects the metrics of a database in the Prometheus text exposition format.
+
+    The latency histograms come from the instrumentation, which records every call in the thread that made it
+    without locks, so they are only reported while instrumentation.enable() is in effect. The totals are read
+    from the habits and the period counts with short reads that do not block writers in WAL mode,
+    and the file sizes from the file system. The sqlite3 module has no API for the page cache statistics
+    of SQLite, so they are not reported.
+
+    Args:
+        db (Database): the database to report on.
+
+    Returns:
+        str: the metrics, one sample per line.
+    """
+    start = time.perf_counter()
+    lines = []
+    stats = instrumentation.snapshot()
+    database_stats = {name[len('Database.'):]: entry for name, entry in stats.items()
+                      if name.startswith('Database.')}
+    streak_stats = {name: entry for name, entry in stats.items()
+                    if 'streak' in name and not name.startswith('Database.')}
+
+    _metric(lines, 'habit_tracker_db_operation_seconds', 'histogram', 'Latency of the Database operations.')
+    _histogram(lines, 'habit_tracker_db_operation_seconds', 'operation', database_stats)
+    _metric(lines, 'habit_tracker_db_operation_errors_total', 'counter', 'Database operations that raised.')
+    for name, entry in sorted(database_stats.items()):
+        lines.append(f'habit_tracker_db_operation_errors_total{{operation="{_label(name)}"}} {entry["errors"]}')
+    _metric(lines, 'habit_tracker_db_operation_rows_total', 'counter', 'Rows returned by the Database operations.')
+    for name, entry in sorted(database_stats.items()):
+        lines.append(f'habit_tracker_db_operation_rows_total{{operation="{_label(name)}"}} {entry["rows"]}')
+    _metric(lines, 'habit_tracker_streak_seconds', 'histogram', 'Duration of the streak calculations.')
+    _histogram(lines, 'habit_tracker_streak_seconds', 'function', streak_stats)
+
+    _metric(lines, 'habit_tracker_instrumentation_enabled', 'gauge',
+            'Whether the latency histograms are being recorded.')
+    lines.append(f'habit_tracker_instrumentation_enabled {int(instrumentation.is_enabled())}')
+
+    _metric(lines, 'habit_tracker_sqlite_connections', 'gauge', 'Open SQLite connections of the database.')
+    lines.append(f'habit_tracker_sqlite_connections {db.connection_count()}')
+
+    _metric(lines, 'habit_tracker_database_size_bytes', 'gauge', 'Size of the database files.')
+    for file, suffix in (('db', ''), ('wal', '-wal')):
+        try:
+            size = os.path.getsize(db.db_name + suffix)
+        except OSError:
+            size = 0
+        lines.append(f'habit_tracker_database_size_bytes{{file="{file}"}} {size}')
+
+    cursor = db.connection.cursor()
+    cursor.execute('SELECT frequency, COUNT(*) FROM habits GROUP BY frequency ORDER BY frequency')
+    _metric(lines, 'habit_tracker_habits', 'gauge', 'Habits in the database.')
+    for frequency, count in cursor.fetchall():
+        lines.append(f'habit_tracker_habits{{frequency="{_label(frequency)}"}} {count}')
+    # The period counts add up to the number of completions, and are much smaller to read than the completions.
+    cursor.execute('SELECT COALESCE(SUM(count), 0) FROM habit_period_counts')
+    _metric(lines, 'habit_tracker_completions', 'gauge', 'Completions written to the database.')
+    lines.append(f'habit_tracker_completions {cursor.fetchone()[0]}')
+    _metric(lines, 'habit_tracker_pending_completions', 'gauge', 'Completions queued in write-behind mode.')
+    lines.append(f'habit_tracker_pending_completions {db.pending_completions()}')
+
+    _metric(lines, 'habit_tracker_metrics_collection_seconds', 'gauge', 'Time taken to collect these metrics.')
+    lines.append(f'habit_tracker_metrics_collection_seconds {time.perf_counter() - start:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(db: Database, path: str):
+    """
+    This function writes the metrics to a file for the textfile collector of the node exporter.
+    The metrics are written to a temporary file in the same folder that then replaces the file,
+    so the collector never reads a file that is half written.
+
+    Args:
+        db (Database): the database to report on.
+        path (str): the file to write, its name should end with .prom.
+    """
+    text = collect(db)
+    folder = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=folder, prefix='.metrics-', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    A class that answers GET /metrics with the metrics of the server's database.
+    """
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        try:
+            data = collect(self.server.db).encode('utf-8')
+        finally:
+            self.server.db.release_connection()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug('%s ' + format, self.address_string(), *args)
+
+
+def create_metrics_server(db: Database, host: str = '127.0.0.1', port: int = 9464):
+    """
+    This function creates an HTTP server for the metrics of a pooled database, without starting it.
+
+    Args:
+        db (Database): the pooled database to report on.
+        host (str, optional): the address to listen on, by default only this computer.
+        port (int, optional): the port to listen on, 0 chooses a free port, by default 9464.
+
+    Returns:
+        ThreadingHTTPServer: the server, call serve_forever() to start it and server_close() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.db = db
+    return server
+
+
+@click.group()
+@click.option('--db', 'db_name', default='habits.db', show_default=True, help='The database file to report on.')
+@click.pass_context
+def cli(ctx, db_name):
+    """
+    Export the metrics of a Simple Habits database in the Prometheus text format.
+    The latency histograms of this process only cover the queries of the exporter itself, the ones of
+    the application are served by the application, as on the /metrics route of server.py.
+    """
+    instrumentation.enable()
+    db = Database(db_name=db_name, insert_predefined=False, pooled=True)
+    ctx.obj = db
+    ctx.call_on_close(db.exit)
+
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='The address to listen on.')
+@click.option('--port', type=click.IntRange(0, 65535), default=9464, show_default=True, help='The port to listen on.')
+@click.pass_obj
+def serve(db: Database, host, port):
+    """
+    Serve the metrics on http://HOST:PORT/metrics.
+    """
+    server = create_metrics_server(db, host, port)
+    click.echo(f"Serving the metrics of '{db.db_name}' on http://{server.server_address[0]}:"
+               f"{server.server_address[1]}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@cli.command()
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--interval', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Write the file again every INTERVAL seconds, by default it is written once.')
+@click.pass_obj
+def textfile(db: Database, path, interval):
+    """
+    Write the metrics to PATH for the textfile collector of the node exporter.
+    """
+    write_textfile(db, path)
+    if interval is None:
+        return
+    try:
+        while True:
+            time.sleep(interval)
+            write_textfile(db, path)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,178 @@
+import math
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# A fuzzy match must contain at least this share of the trigrams of what was typed.
+MIN_FUZZY_SCORE = 0.5
+
+
+def _trigrams(text: str):
+    """
+    This function splits a text into the groups of three characters of each of its words, with the words padded
+    so that their first and last letters also form groups. The text is compared without case.
+    """
+    trigrams = set()
+    for word in text.casefold().split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+class NameIndex:
+    """
+    An index of the names of the habits to find them by what the user types, without reading the habits.
+    The names are kept sorted without case, so that the names starting with a text are found by a binary search,
+    and every name is also indexed by its trigrams, so that names with a typo or containing the text are found too.
+
+    The index is changed with add() and remove() when habits are created and deleted, and can be used by
+    several threads at once.
+
+    Attributes:
+        _entries (list[tuple[str, str]]): the name without case and the name of each habit, sorted.
+        _trigrams (dict[str, set[str]]): the names that contain each trigram.
+        _sizes (dict[str, int]): the number of trigrams of each name.
+    """
+
+    def __init__(self, names=()):
+        """
+        Builds the index from the names of the habits.
+
+        Args:
+            names (Iterable[str], optional): the names of the habits, by default none.
+        """
+        self._lock = threading.Lock()
+        self._entries = sorted((name.casefold(), name) for name in set(names))
+        self._trigrams = {}
+        self._sizes = {}
+        for _, name in self._entries:
+            self._index_trigrams(name)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name: str):
+        return name in self._sizes
+
+    def _index_trigrams(self, name: str):
+        """
+        This method adds a name to the lists of names of its trigrams.
+        """
+        trigrams = _trigrams(name)
+        self._sizes[name] = len(trigrams)
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(name)
+
+    def add(self, name: str):
+        """
+        This method adds the name of a new habit to the index. Adding a name that is already indexed does nothing.
+
+        Args:
+            name (str): the name of the habit.
+        """
+        with self._lock:
+            if name in self._sizes:
+                return
+            entry = (name.casefold(), name)
+            self._entries.insert(bisect_left(self._entries, entry), entry)
+            self._index_trigrams(name)
+
+    def remove(self, name: str):
+        """
+        This method removes the name of a deleted habit from the index.
+        Removing a name that is not indexed does nothing.
+
+        Args:
+            name (str): the name of the habit.
+        """
+        with self._lock:
+            if self._sizes.pop(name, None) is None:
+                return
+            entry = (name.casefold(), name)
+            del self._entries[bisect_left(self._entries, entry)]
+            for trigram in _trigrams(name):
+                names = self._trigrams[trigram]
+                names.discard(name)
+                if not names:
+                    del self._trigrams[trigram]
+
+    def prefix(self, text: str, limit: int = 10):
+        """
+        This method finds the names that start with a text, without case, in alphabetical order,
+        so an exact match comes first.
+
+        Args:
+            text (str): the start of the names.
+            limit (int, optional): the largest number of names returned, by default 10.
+
+        Returns:
+            list[str]: the names found.
+        """
+        key = text.casefold()
+        matches = []
+        with self._lock:
+            position = bisect_left(self._entries, (key, ''))
+            while position < len(self._entries) and len(matches) < limit:
+                folded, name = self._entries[position]
+                if not folded.startswith(key):
+                    break
+                matches.append(name)
+                position += 1
+        return matches
+
+    def fuzzy(self, text: str, limit: int = 10):
+        """
+        This method finds the names that share most of the trigrams of a text, so that a name is found
+        from a part of one of its words or with a typo. The names are ranked by the share of the trigrams
+        of the text they contain, then by how similar they are as a whole, then alphabetically.
+
+        Args:
+            text (str): what the user typed.
+            limit (int, optional): the largest number of names returned, by default 10.
+
+        Returns:
+            list[str]: the names found, the best match first.
+        """
+        query = _trigrams(text)
+        if not query:
+            return []
+        needed = math.ceil(MIN_FUZZY_SCORE * len(query))
+        shared = Counter()
+        with self._lock:
+            # A name with the needed number of trigrams has at least one of any len(query) - needed + 1 of them,
+            # so only the names of the rarest ones are counted, and the common ones are looked up for those names.
+            postings = sorted((self._trigrams.get(trigram, set()) for trigram in query), key=len)
+            rare, common = postings[:len(query) - needed + 1], postings[len(query) - needed + 1:]
+            for names in rare:
+                shared.update(names)
+            for names in common:
+                for name in shared:
+                    if name in names:
+                        shared[name] += 1
+            scored = []
+            for name, count in shared.items():
+                score = count / len(query)
+                if score >= MIN_FUZZY_SCORE:
+                    similarity = count / (len(query) + self._sizes[name] - count)
+                    scored.append((-score, -similarity, name.casefold(), name))
+        scored.sort()
+        return [name for *_, name in scored[:limit]]
+
+    def search(self, text: str, limit: int = 10):
+        """
+        This method finds the habits for what the user typed: first the names that start with it,
+        then the fuzzy matches that are not already listed.
+
+        Args:
+            text (str): what the user typed, an empty text lists the first names in alphabetical order.
+            limit (int, optional): the largest number of names returned, by default 10.
+
+        Returns:
+            list[str]: the names found, the best match first.
+        """
+        text = text.strip()
+        matches = self.prefix(text, limit)
+        if text and len(matches) < limit:
+            listed = set(matches)
+            matches.extend(name for name in self.fuzzy(text, limit + len(listed)) if name not in listed)
+        return matches[:limit]
@@ -0,0 +1,131 @@
+"""
+A streak engine that calculates the same streaks as the Habit class with NumPy arrays instead of Python loops.
+The completion dates are converted to an array of seconds since the epoch, placed in their periods with
+integer arithmetic, counted per period, and the streaks are found as runs of consecutive eligible periods.
+
+NumPy is optional for the application, it is only needed to use this module.
+"""
+import numpy as np
+from datetime import datetime
+from habit import Habit
+from periods import (EPOCH_ORDINAL, MICROSECONDS_PER_SECOND, SECONDS_PER_DAY, MonthPeriods, period_engine, period_of,
+                     to_epoch)
+
+
+def to_epoch_array(completion_dates: list):
+    """
+    This function converts completion dates to an array of whole seconds since the epoch.
+
+    Args:
+        completion_dates (list[datetime]): the completion dates.
+
+    Returns:
+        numpy.ndarray: the completion dates as int64 seconds since the epoch.
+    """
+    return np.fromiter(map(to_epoch, completion_dates), dtype=np.int64, count=len(completion_dates))
+
+
+def to_periods(epochs, frequency: str):
+    """
+    This function places completion dates in their periods, numbered like periods.period_of().
+
+    Args:
+        epochs (numpy.ndarray): the completion dates as seconds since the epoch.
+        frequency (str): the frequency of the habit, see periods.period_engine().
+
+    Returns:
+        numpy.ndarray: the period of each completion date.
+    """
+    engine = period_engine(frequency)
+    if isinstance(engine, MonthPeriods):
+        # NumPy counts the months since 1970-01, the periods count them since the year 0.
+        months = np.asarray(epochs, dtype=np.int64).astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+        return months + 1970 * 12
+    days = np.asarray(epochs, dtype=np.int64) // SECONDS_PER_DAY + EPOCH_ORDINAL
+    return engine.period_of_day(days)
+
+
+def eligible_periods(epochs, frequency: str, periodicity: int):
+    """
+    This function finds the periods in which the habit was performed exactly the periodicity number of times.
+
+    Args:
+        epochs (numpy.ndarray): the completion dates as seconds since the epoch.
+        frequency (str): the frequency of the habit, see periods.period_engine().
+        periodicity (int): the number of times the habit should be performed in each period.
+
+    Returns:
+        numpy.ndarray: the eligible periods in ascending order.
+    """
+    periods = to_periods(epochs, frequency)
+    if periods.size == 0:
+        return periods
+    first = periods.min()
+    span = int(periods.max() - first) + 1
+    # When the periods are close together, counting them in a dense array is faster than sorting them.
+    if span <= 4 * periods.size + 1024:
+        counts = np.bincount(periods - first, minlength=span)
+        return np.flatnonzero(counts == periodicity) + first
+    unique, counts = np.unique(periods, return_counts=True)
+    return unique[counts == periodicity]
+
+
+def longest_streak(epochs, frequency: str, periodicity: int):
+    """
+    This function calculates the longest streak, like Habit.calculate_longest_streak().
+
+    Args:
+        epochs (numpy.ndarray): the completion dates as seconds since the epoch.
+        frequency (str): the frequency of the habit, see periods.period_engine().
+        periodicity (int): the number of times the habit should be performed in each period.
+
+    Returns:
+        int: the longest streak.
+    """
+    eligible = eligible_periods(epochs, frequency, periodicity)
+    if eligible.size == 0:
+        return 0
+    # A run of consecutive periods ends wherever the next eligible period is not the following one.
+    run_ends = np.flatnonzero(np.diff(eligible) != 1)
+    boundaries = np.concatenate(([-1], run_ends, [eligible.size - 1]))
+    return int(np.diff(boundaries).max())
+
+
+def current_streak(epochs, frequency: str, periodicity: int, now: datetime = None):
+    """
+    This function calculates the current streak, like Habit.calculate_current_streak(),
+    which ends in the period before the current one.
+
+    Args:
+        epochs (numpy.ndarray): the completion dates as seconds since the epoch.
+        frequency (str): the frequency of the habit, see periods.period_engine().
+        periodicity (int): the number of times the habit should be performed in each period.
+        now (datetime, optional): the current date, by default datetime.now().
+
+    Returns:
+        int: the current streak.
+    """
+    eligible = eligible_periods(epochs, frequency, periodicity)
+    last_period = period_of(now or datetime.now(), frequency) - 1
+    end = int(np.searchsorted(eligible, last_period))
+    if end == eligible.size or eligible[end] != last_period:
+        return 0
+    # In a run of consecutive periods the period minus its position is the same for every period.
+    keys = eligible[:end + 1] - np.arange(end + 1)
+    return end + 1 - int(np.searchsorted(keys, keys[end]))
+
+
+def habit_streaks(habit: Habit, now: datetime = None):
+    """
+    This function calculates the current and the longest streak of a habit.
+
+    Args:
+        habit (Habit): the habit with its completion dates.
+        now (datetime, optional): the current date, by default datetime.now().
+
+    Returns:
+        tuple[int, int]: the current streak and the longest streak.
+    """
+    epochs = np.frombuffer(habit.completion_micros, dtype=np.int64) // MICROSECONDS_PER_SECOND
+    return (current_streak(epochs, habit.frequency, habit.periodicity, now),
+            longest_streak(epochs, habit.frequency, habit.periodicity))
@@ -0,0 +1,304 @@
+import sys
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# Dates are stored as the number of seconds since this moment. The dates of the application are
+# local times without a time zone, so the seconds count the local time as it is shown to the user.
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+SECONDS_PER_DAY = 86400
+MICROSECONDS_PER_SECOND = 1000000
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+# The frequencies a habit can have, as they are explained to the user.
+FREQUENCY_HELP = ('daily, weekly, weekly:<weekday> (for example weekly:sunday), monthly '
+                  'or every:<days> (for example every:3)')
+
+
+class PeriodEngine:
+    """
+    The way a frequency divides the calendar in periods. Every day belongs to exactly one period,
+    and the periods are numbered with consecutive integers, so that consecutive periods are consecutive numbers
+    and a streak can be found by comparing integers. The days are proleptic Gregorian ordinals,
+    where 0001-01-01 is day 1, so a date is placed in its period with integer arithmetic.
+
+    Attributes:
+        frequency (str): the frequency of the habits, as it is stored.
+    """
+
+    def __init__(self, frequency: str):
+        self.frequency = frequency
+
+    def period_of_day(self, day: int):
+        """
+        This method finds the number of the period that contains a day.
+        """
+        raise NotImplementedError
+
+    def first_day(self, period: int):
+        """
+        This method finds the first day of a period, the inverse of period_of_day().
+        """
+        raise NotImplementedError
+
+    def sql_period(self, seconds_column: str):
+        """
+        This method builds the SQL expression that finds the period of a date stored as seconds since the epoch,
+        the same number as period_of_epoch().
+        """
+        raise NotImplementedError
+
+    def period_of_epoch(self, seconds: int):
+        return self.period_of_day(seconds // SECONDS_PER_DAY + EPOCH_ORDINAL)
+
+    def period_start_epoch(self, period: int):
+        return (self.first_day(period) - EPOCH_ORDINAL) * SECONDS_PER_DAY
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.frequency!r})"
+
+
+class DayPeriods(PeriodEngine):
+    """
+    Periods of a fixed number of days: one day for daily habits, seven for weekly habits, or any number of days.
+    Period p covers the days from p * length + offset, so the offset chooses the day the periods start on.
+    The periods of weekly habits start on monday, since the first day of the calendar is a monday.
+    """
+
+    def __init__(self, frequency: str, length: int, offset: int):
+        super().__init__(frequency)
+        self.length = length
+        self.offset = offset
+
+    def period_of_day(self, day):
+        # Written with operators only, so that it also works on a NumPy array of days.
+        return (day - self.offset) // self.length
+
+    def first_day(self, period: int):
+        return period * self.length + self.offset
+
+    # The conversions of stored dates are done in one step, since they run once per period when a streak is found.
+    def period_of_epoch(self, seconds: int):
+        return (seconds // SECONDS_PER_DAY + EPOCH_ORDINAL - self.offset) // self.length
+
+    def period_start_epoch(self, period: int):
+        return (period * self.length + self.offset - EPOCH_ORDINAL) * SECONDS_PER_DAY
+
+    def sql_period(self, seconds_column: str):
+        day = _sql_day(seconds_column)
+        if self.length == 1:
+            return f"({day} - {self.offset})" if self.offset else day
+        # SQLite rounds integer division towards zero, which is the same as rounding down
+        # for every day from the offset of the first period on.
+        return f"(({day} - {self.offset}) / {self.length})"
+
+
+class MonthPeriods(PeriodEngine):
+    """
+    Calendar months, numbered as year * 12 + month - 1.
+    """
+
+    def period_of_day(self, day: int):
+        day = date.fromordinal(day)
+        return day.year * 12 + day.month - 1
+
+    def first_day(self, period: int):
+        return date(period // 12, period % 12 + 1, 1).toordinal()
+
+    def sql_period(self, seconds_column: str):
+        return (f"(CAST(strftime('%Y', {seconds_column}, 'unixepoch') AS INTEGER) * 12 "
+                f"+ CAST(strftime('%m', {seconds_column}, 'unixepoch') AS INTEGER) - 1)")
+
+
+@lru_cache(maxsize=256)
+def period_engine(frequency: str):
+    """
+    This function gives the period engine of a frequency. The frequency is read without case and without spaces
+    around it, and the engines of the last frequencies used are cached, so getting the engine of a frequency
+    again costs a dictionary lookup.
+
+    Args:
+        frequency (str): daily, weekly, weekly:<weekday>, monthly or every:<days>.
+
+    Returns:
+        PeriodEngine: the engine, whose frequency attribute is the normalized frequency.
+    """
+    text = frequency.strip().lower()
+    kind, _, argument = text.partition(':')
+    if text == 'daily' or (kind == 'every' and argument.strip() == '1'):
+        return DayPeriods('daily', 1, 0)
+    if text == 'weekly' or (kind == 'weekly' and argument.strip() == 'monday'):
+        return DayPeriods('weekly', 7, 1)
+    if kind == 'weekly' and argument.strip() in WEEKDAYS:
+        weekday = argument.strip()
+        return DayPeriods(f'weekly:{weekday}', 7, 1 + WEEKDAYS.index(weekday))
+    if text == 'monthly':
+        return MonthPeriods('monthly')
+    if kind == 'every' and argument.strip().isdigit() and int(argument) > 1:
+        return DayPeriods(f'every:{int(argument)}', int(argument), 1)
+    raise ValueError(f"The frequency is not correct '{frequency}'. The frequency should be {FREQUENCY_HELP}.")
+
+
+def normalize_frequency(frequency: str):
+    """
+    This function checks a frequency and gives it in the form it is stored, for example 'Weekly:Sunday'
+    is stored as 'weekly:sunday' and 'weekly:monday' as 'weekly'.
+
+    Args:
+        frequency (str): the frequency to check.
+
+    Returns:
+        str: the normalized frequency.
+    """
+    return period_engine(frequency).frequency
+
+
+def to_epoch(date: datetime):
+    """
+    This function converts a date to the whole number of seconds since the epoch, used to store dates.
+
+    Args:
+        date (datetime): the date to convert.
+
+    Returns:
+        int: the seconds since the epoch, without the fractions of a second.
+    """
+    delta = date - EPOCH
+    return delta.days * SECONDS_PER_DAY + delta.seconds
+
+
+def from_epoch(seconds: int):
+    """
+    This function converts a number of seconds since the epoch back to a date.
+
+    Args:
+        seconds (int): the seconds since the epoch.
+
+    Returns:
+        datetime: the date.
+    """
+    return _date_of_seconds(seconds)
+
+
+# Reading the date of a number of seconds is done for every stored date that is shown, and utcfromtimestamp()
+# is about three times faster than adding a timedelta to EPOCH, with the same result. It is deprecated from
+# Python 3.12, where the addition stays faster than the conversion through an aware date that replaces it.
+if sys.version_info < (3, 12):
+    _date_of_seconds = datetime.utcfromtimestamp
+else:
+    def _date_of_seconds(seconds: int):
+        return EPOCH + timedelta(seconds=seconds)
+
+
+def to_epoch_micros(date: datetime):
+    """
+    This function converts a date to the number of microseconds since the epoch, without losing precision.
+
+    Args:
+        date (datetime): the date to convert.
+
+    Returns:
+        int: the microseconds since the epoch.
+    """
+    delta = date - EPOCH
+    return (delta.days * SECONDS_PER_DAY + delta.seconds) * MICROSECONDS_PER_SECOND + delta.microseconds
+
+
+def from_epoch_micros(micros: int):
+    """
+    This function converts a number of microseconds since the epoch back to a date.
+
+    Args:
+        micros (int): the microseconds since the epoch.
+
+    Returns:
+        datetime: the date.
+    """
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def period_of(date: datetime, frequency: str):
+    """
+    This function finds the period of a date as an integer, so that consecutive periods are consecutive integers.
+    The periods of each frequency are defined by its PeriodEngine.
+
+    Args:
+        date (datetime): the date to place in a period.
+        frequency (str): the frequency of the habit, see period_engine().
+
+    Returns:
+        int: the number of the period that contains the date.
+    """
+    return period_engine(frequency).period_of_day(date.toordinal())
+
+
+def period_of_epoch(seconds: int, frequency: str):
+    """
+    This function finds the period of a stored date without converting it to a datetime.
+    It gives the same number as period_of() for the same date.
+
+    Args:
+        seconds (int): the seconds since the epoch.
+        frequency (str): the frequency of the habit, see period_engine().
+
+    Returns:
+        int: the number of the period that contains the date.
+    """
+    return period_engine(frequency).period_of_epoch(seconds)
+
+
+def period_start_epoch(period: int, frequency: str):
+    """
+    This function finds the first second of a period, so that a period covers the seconds from its start
+    to the start of the next period. It is the inverse of period_of_epoch().
+
+    Args:
+        period (int): the number of the period.
+        frequency (str): the frequency of the habit, see period_engine().
+
+    Returns:
+        int: the seconds since the epoch when the period starts.
+    """
+    return period_engine(frequency).period_start_epoch(period)
+
+
+def streaks_from_period_counts(period_counts, periodicity: int, current_period: int):
+    """
+    This function finds the current and the longest streak from the number of completions in each period.
+    A period is eligible when the habit was performed exactly the periodicity number of times in it,
+    a streak is a run of consecutive eligible periods, and the current streak is the run that ends
+    in the period before the current one, since the current period is not finished yet.
+
+    Args:
+        period_counts (iterable[tuple[int, int]]): the periods with completions and their number of completions,
+            from the oldest period to the newest.
+        periodicity (int): the number of times the habit should be performed in each period.
+        current_period (int): the period of the current date.
+
+    Returns:
+        tuple[int, int]: the current streak and the longest streak.
+    """
+    current_streak = 0
+    longest_streak = 0
+    streak = 0
+    previous_period = None
+    for period, count in period_counts:
+        if count == periodicity:
+            streak = streak + 1 if previous_period == period - 1 else 1
+            longest_streak = max(longest_streak, streak)
+            if period == current_period - 1:
+                current_streak = streak
+        else:
+            streak = 0
+        previous_period = period
+    return current_streak, longest_streak
+
+
+def _sql_day(seconds_column: str):
+    """
+    This function builds the SQL expression that finds the day of a date stored as seconds since the epoch,
+    as a proleptic Gregorian ordinal. SQLite rounds integer division towards zero, so dates before 1970
+    are rounded down explicitly.
+    """
+    return (f"(CASE WHEN {seconds_column} >= 0 THEN {seconds_column} / {SECONDS_PER_DAY} "
+            f"ELSE ({seconds_column} - {SECONDS_PER_DAY - 1}) / {SECONDS_PER_DAY} END + {EPOCH_ORDINAL})")
@@ -0,0 +1,209 @@
+import logging
+import queue
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Statements that change the schema, which do not count in total_changes but must still reach the file.
+SCHEMA_STATEMENTS = ('CREATE', 'DROP', 'ALTER')
+
+
+class JournalCursor(sqlite3.Cursor):
+    """
+    A cursor of a ReplicaConnection that records in the journal of its connection every statement that changed
+    the in-memory database, with its parameters, so that the same statement can be run on the file afterwards.
+    A statement that changed no row, such as a SELECT or an UPDATE that matched nothing, is not recorded.
+    """
+
+    def execute(self, sql, parameters=()):
+        connection = self.connection
+        changes = connection.total_changes
+        super().execute(sql, parameters)
+        connection.record(sql, parameters, False, changes)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        # The parameters are often a generator, which can only be read once.
+        seq_of_parameters = list(seq_of_parameters)
+        connection = self.connection
+        changes = connection.total_changes
+        super().executemany(sql, seq_of_parameters)
+        connection.record(sql, seq_of_parameters, True, changes)
+        return self
+
+
+class ReplicaConnection(sqlite3.Connection):
+    """
+    A connection to an in-memory copy of the database whose writes are replicated to the file.
+    The statements that change the copy are kept in a journal, and when a transaction is committed the journal
+    is handed to `on_commit`, which runs the same statements in the same order on the file. A rollback discards
+    the journal. Every cursor of the connection is a JournalCursor.
+
+    Attributes:
+        on_commit (Callable[[list], None]): receives the statements of each committed transaction,
+            as (sql, parameters, many) tuples.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_commit = None
+        self._journal = []
+
+    def cursor(self, factory=JournalCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def record(self, sql: str, parameters, many: bool, changes: int):
+        """
+        This method adds a statement that has just run to the journal if it changed the database,
+        and hands the journal over at once when the statement was not part of a transaction.
+
+        Args:
+            sql (str): the statement.
+            parameters (tuple | dict | list): its parameters, a list of them for executemany().
+            many (bool): whether the statement was run with executemany().
+            changes (int): total_changes before the statement ran.
+        """
+        if self.total_changes == changes and not sql.lstrip().upper().startswith(SCHEMA_STATEMENTS):
+            return
+        self._journal.append((sql, parameters, many))
+        if not self.in_transaction:
+            self._hand_over()
+
+    def commit(self):
+        super().commit()
+        self._hand_over()
+
+    def rollback(self):
+        super().rollback()
+        self._journal = []
+
+    def _hand_over(self):
+        """
+        This method gives the statements of the journal to on_commit and starts a new journal.
+        """
+        statements, self._journal = self._journal, []
+        if statements and self.on_commit is not None:
+            self.on_commit(statements)
+
+
+class DiskWriter:
+    """
+    Runs the transactions of a ReplicaConnection on the database file, in the order they were committed.
+    Each transaction is written as one transaction on the file. When `asynchronous` is true the transactions
+    are put in a queue and written by a background thread, so a commit does not wait for the disk. A transaction
+    still in the queue is lost if the process crashes, and flush() waits until the queue is written.
+
+    The writer also tells whether another connection changed the file, through PRAGMA data_version of its own
+    connection, which only changes when a commit is made by another connection.
+
+    Attributes:
+        connection (sqlite3.Connection): the connection to the file, which must allow every thread to use it.
+        asynchronous (bool): whether transactions are written by a background thread.
+        errors (int): the number of transactions that could not be written.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, asynchronous: bool = False):
+        self.connection = connection
+        self.asynchronous = asynchronous
+        self.errors = 0
+        self.lock = threading.RLock()
+        self._queue = None
+        self._thread = None
+        if asynchronous:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='replica-writer', daemon=True)
+            self._thread.start()
+
+    def write(self, statements: list):
+        """
+        This method writes the statements of a committed transaction to the file, or queues them in
+        asynchronous mode. In synchronous mode an error of the file is raised to the caller.
+
+        Args:
+            statements (list[tuple]): the (sql, parameters, many) statements of the transaction.
+        """
+        if self.asynchronous:
+            self._queue.put(statements)
+        else:
+            self._apply(statements)
+
+    def _apply(self, statements: list):
+        """
+        This method runs the statements of a transaction on the file and commits them, or rolls them back if one fails.
+        """
+        with self.lock:
+            try:
+                for sql, parameters, many in statements:
+                    if many:
+                        self.connection.executemany(sql, parameters)
+                    else:
+                        self.connection.execute(sql, parameters)
+                self.connection.commit()
+            except sqlite3.Error:
+                self.connection.rollback()
+                self.errors += 1
+                raise
+
+    def _run(self):
+        """
+        This method writes the queued transactions until None is queued.
+        """
+        while True:
+            statements = self._queue.get()
+            try:
+                if statements is None:
+                    return
+                self._apply(statements)
+            except sqlite3.Error:
+                logger.exception("A transaction of %s statements could not be written to the file.", len(statements))
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        This method waits until every queued transaction has been written to the file.
+        """
+        if self.asynchronous:
+            self._queue.join()
+
+    def data_version(self):
+        """
+        This method reads PRAGMA data_version of the file connection.
+
+        Returns:
+            int: a number that changes when another connection commits a change to the file.
+        """
+        with self.lock:
+            return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def load(self, target: sqlite3.Connection):
+        """
+        This method copies the file into another database, such as the in-memory copy, with the backup API,
+        after the queued transactions have been written.
+
+        Args:
+            target (sqlite3.Connection): the connection that receives the copy.
+
+        Returns:
+            int: the data version of the file that was copied.
+        """
+        self.flush()
+        with self.lock:
+            self.connection.backup(target)
+            return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def close(self):
+        """
+        This method writes the queued transactions and stops the background thread. The connection is not closed.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,380 @@
+import click
+import json
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import analysis
+from database import Database
+from habit import Habit
+import instrumentation
+import metrics
+from periods import FREQUENCY_HELP, normalize_frequency
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 500
+# The largest request body read, a habit is created from a few fields of JSON.
+MAX_BODY_BYTES = 64 * 1024
+
+
+class ApiError(Exception):
+    """
+    An error that is answered to the client with an HTTP status and a JSON message.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _int_parameter(query: dict, name: str, default: int, minimum: int, maximum: int = None):
+    """
+    This function reads an integer parameter from the query string and checks its range.
+    """
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ApiError(400, f"The parameter '{name}' must be an integer.")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ApiError(400, f"The parameter '{name}' must be between {minimum} and {maximum or 'any'}.")
+    return value
+
+
+def _frequency_parameter(query: dict):
+    """
+    This function reads the frequency parameter from the query string, normalized as it is stored.
+    """
+    values = query.get('frequency')
+    if not values:
+        return None
+    try:
+        return normalize_frequency(values[0])
+    except ValueError:
+        raise ApiError(400, f"The parameter 'frequency' should be {FREQUENCY_HELP}.")
+
+
+def _choice_parameter(query: dict, name: str, choices: tuple, default: str = None):
+    """
+    This function reads a parameter from the query string that must be one of some choices.
+    """
+    values = query.get(name)
+    if not values:
+        return default
+    if values[0] not in choices:
+        raise ApiError(400, f"The parameter '{name}' should be one of {', '.join(choices)}.")
+    return values[0]
+
+
+class HabitRequestHandler(BaseHTTPRequestHandler):
+    """
+    A class that answers the requests of the habit tracker API with JSON.
+    It speaks HTTP/1.1, so a client can send many requests over the same connection.
+
+    Routes:
+        GET /habits: list the habits, with the parameters frequency, limit and offset.
+        POST /habits: create a habit from a JSON body with name, frequency and periodicity.
+        GET /habits/<name>: show a habit.
+        DELETE /habits/<name>: delete a habit.
+        POST /habits/<name>/completions: mark a habit as performed now.
+        GET /habits/<name>/streak: show the current and longest streak, with the parameter strategy.
+        GET /leaderboard: show the habits with the highest streaks, with the parameters k, by and frequency.
+        GET /metrics: the metrics of the server in the Prometheus text format, answered even when the server is busy.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SimpleHabits/1.0'
+    # The headers and the body are written separately, and on a kept-alive connection Nagle's algorithm
+    # holds the body back until the client acknowledges the headers, which a client delays by up to 40 ms.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/metrics':
+            self._send_metrics()
+        else:
+            self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        logger.debug('%s ' + format, self.address_string(), *args)
+
+    def _handle(self, method: str):
+        """
+        This method reads the request body, routes the request and sends the answer.
+        When the server already runs its maximum number of requests, it answers 503 without waiting.
+        """
+        try:
+            body = self._read_body()
+        except ApiError as error:
+            # The body was not read, so the rest of the connection cannot be parsed as requests.
+            self._send(error.status, {'error': error.message}, {'Connection': 'close'})
+            return
+        if not self.server.slots.acquire(blocking=False):
+            self._send(503, {'error': 'The server is busy, try again later.'}, {'Retry-After': '1'})
+            return
+        try:
+            status, payload = self._route(method, body)
+        except ApiError as error:
+            status, payload = error.status, {'error': error.message}
+        except Exception:
+            logger.exception("The request %s %s failed.", method, self.path)
+            status, payload = 500, {'error': 'Internal server error.'}
+        finally:
+            self.server.slots.release()
+        self._send(status, payload)
+
+    def _read_body(self):
+        """
+        This method reads the body of the request, of the length given by its Content-Length header.
+
+        Returns:
+            bytes: the body, empty when the request has none.
+        """
+        length = self.headers.get('Content-Length')
+        if length is None:
+            return b''
+        if not length.strip().isdigit():
+            raise ApiError(400, 'The Content-Length header must be a number of bytes.')
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, f'The body must not be larger than {MAX_BODY_BYTES} bytes.')
+        return self.rfile.read(length)
+
+    def _send(self, status: int, payload, headers: dict = None):
+        """
+        This method sends a JSON answer with its length, so the connection can be kept alive.
+        """
+        data = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_metrics(self):
+        """
+        This method sends the metrics as text, outside the limit of concurrent requests so that
+        the server can still be monitored when it is overloaded.
+        """
+        data = metrics.collect(self.server.db).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', metrics.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method: str, body: bytes):
+        """
+        This method chooses the function that answers the request from its method and path.
+
+        Returns:
+            tuple[int, object]: the HTTP status and the payload to send as JSON.
+        """
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+
+        if parts == ['habits']:
+            if method == 'GET':
+                return self._list_habits(query)
+            if method == 'POST':
+                return self._create_habit(body)
+        elif len(parts) == 2 and parts[0] == 'habits':
+            if method == 'GET':
+                return self._show_habit(parts[1])
+            if method == 'DELETE':
+                return self._delete_habit(parts[1])
+        elif len(parts) == 3 and parts[0] == 'habits' and parts[2] == 'completions':
+            if method == 'POST':
+                return self._mark_performed(parts[1])
+        elif len(parts) == 3 and parts[0] == 'habits' and parts[2] == 'streak':
+            if method == 'GET':
+                return self._show_streak(parts[1], query)
+        elif parts == ['leaderboard']:
+            if method == 'GET':
+                return self._leaderboard(query)
+        else:
+            raise ApiError(404, f"The path '{url.path}' does not exist.")
+        raise ApiError(405, f"The method {method} is not allowed for '{url.path}'.")
+
+    def _list_habits(self, query: dict):
+        """
+        This method lists one page of habits in the order they were created.
+        """
+        frequency = _frequency_parameter(query)
+        limit = _int_parameter(query, 'limit', 50, 1, MAX_PAGE_SIZE)
+        offset = _int_parameter(query, 'offset', 0, 0)
+        habits = self.server.db.habit_summaries(frequency, limit=limit, offset=offset)
+        next_offset = offset + limit if len(habits) == limit else None
+        return 200, {'habits': habits, 'limit': limit, 'offset': offset, 'next_offset': next_offset}
+
+    def _create_habit(self, body: bytes):
+        """
+        This method creates a habit, with the same limits as the interactive menu.
+        """
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'The body must be a JSON object.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'The body must be a JSON object.')
+        name = data.get('name')
+        frequency = data.get('frequency')
+        periodicity = data.get('periodicity')
+        if not isinstance(name, str) or not name.strip() or name.strip().isdigit():
+            raise ApiError(400, 'The habit needs a valid name.')
+        try:
+            frequency = normalize_frequency(frequency)
+        except (AttributeError, TypeError, ValueError):
+            raise ApiError(400, f'The frequency should be {FREQUENCY_HELP}.')
+        if not isinstance(periodicity, int) or isinstance(periodicity, bool) or not 1 <= periodicity <= 20:
+            raise ApiError(400, 'The periodicity should be an integer between 1 and 20.')
+        habit = Habit(name=name.strip(), frequency=frequency, periodicity=periodicity)
+        if not self.server.db.new_created_habit(habit):
+            raise ApiError(409, f"The habit '{habit.name}' already exists.")
+        return 201, habit.to_dict()
+
+    def _show_habit(self, habit_name: str):
+        habit = self._find_habit(habit_name)
+        return 200, habit.to_dict()
+
+    def _delete_habit(self, habit_name: str):
+        if not self.server.db.delete_habit(habit_name):
+            raise ApiError(404, f"The habit '{habit_name}' does not exist.")
+        return 204, None
+
+    def _mark_performed(self, habit_name: str):
+        """
+        This method marks a habit as performed now, unless it was already performed the number of times
+        of its periodicity in the current period. The check and the insert are done under one lock,
+        so concurrent requests cannot mark the habit more times than its periodicity.
+        """
+        with self.server.mark_lock:
+            can_mark = self.server.db.can_mark_performed(habit_name)
+            if can_mark is None:
+                raise ApiError(404, f"The habit '{habit_name}' does not exist.")
+            if not can_mark:
+                raise ApiError(409, f"The habit '{habit_name}' was already performed the number of times "
+                                    f"of its periodicity in this period.")
+            completion_date = datetime.now()
+            self.server.db.add_completion(habit_name, completion_date)
+        return 201, {'name': habit_name, 'completion_date': completion_date.isoformat()}
+
+    def _show_streak(self, habit_name: str, query: dict):
+        strategy = _choice_parameter(query, 'strategy', analysis.STREAK_STRATEGIES, 'stored')
+        longest_streak = analysis.longest_streak_for_habit(self.server.db, habit_name, strategy)
+        if longest_streak is None:
+            raise ApiError(404, f"The habit '{habit_name}' does not exist.")
+        current_streak = analysis.current_streak_for_habit(self.server.db, habit_name, strategy)
+        return 200, {'name': habit_name, 'current_streak': current_streak, 'longest_streak': longest_streak}
+
+    def _leaderboard(self, query: dict):
+        k = _int_parameter(query, 'k', 10, 1, MAX_PAGE_SIZE)
+        by = _choice_parameter(query, 'by', analysis.LEADERBOARD_STREAKS, 'longest')
+        frequency = _frequency_parameter(query)
+        leaderboard = analysis.streak_leaderboard(self.server.db, k=k, by=by, frequency=frequency,
+                                                  workers=self.server.leaderboard_workers)
+        return 200, {'by': by, 'leaderboard': [{'name': name, 'streak': streak} for name, streak in leaderboard]}
+
+    def _find_habit(self, habit_name: str):
+        habit = self.server.db.find_habit(habit_name)
+        if habit is None:
+            raise ApiError(404, f"The habit '{habit_name}' does not exist.")
+        return habit
+
+
+class HabitServer(ThreadingHTTPServer):
+    """
+    A class for the HTTP server of the habit tracker. Each connection is served by its own thread
+    with its own database connection, and at most max_concurrent requests are answered at the same time,
+    the others get 503 right away instead of waiting in a queue.
+
+    Attributes:
+        db (Database): the pooled Database used by every request.
+        slots (threading.BoundedSemaphore): the requests that can still run at the same time.
+        mark_lock (threading.Lock): makes checking and marking a habit as performed atomic.
+        leaderboard_workers (int): the number of processes used for the leaderboard.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, db: Database, max_concurrent: int = 64, leaderboard_workers: int = 1):
+        super().__init__(address, HabitRequestHandler)
+        self.db = db
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.mark_lock = threading.Lock()
+        self.leaderboard_workers = leaderboard_workers
+
+    def process_request_thread(self, request, client_address):
+        """
+        This method serves one connection in its own thread and then closes the database connection of that thread.
+        """
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.db.release_connection()
+
+
+def create_server(db_name: str = 'habits.db', host: str = '127.0.0.1', port: int = 8000, max_concurrent: int = 64,
+                  insert_predefined: bool = True):
+    """
+    This function opens the database in pooled mode and creates the HTTP server, without starting it.
+
+    Args:
+        db_name (str, optional): the database file, by default 'habits.db'.
+        host (str, optional): the address to listen on, by default only this computer.
+        port (int, optional): the port to listen on, 0 chooses a free port, by default 8000.
+        max_concurrent (int, optional): the number of requests answered at the same time, by default 64.
+        insert_predefined (bool, optional): add the predefined habits if they have not been added yet.
+
+    Returns:
+        HabitServer: the server, call serve_forever() to start it and server_close() and db.exit() to stop it.
+    """
+    db = Database(db_name=db_name, insert_predefined=insert_predefined, pooled=True)
+    server = HabitServer((host, port), db, max_concurrent=max_concurrent)
+    logger.info("The server for '%s' listens on %s:%s.", db_name, server.server_address[0], server.server_address[1])
+    return server
+
+
+@click.command()
+@click.option('--db', 'db_name', default='habits.db', show_default=True, help='The database file to serve.')
+@click.option('--host', default='127.0.0.1', show_default=True, help='The address to listen on.')
+@click.option('--port', type=click.IntRange(0, 65535), default=8000, show_default=True, help='The port to listen on.')
+@click.option('--max-concurrent', type=click.IntRange(1), default=64, show_default=True,
+              help='The number of requests answered at the same time, the rest get 503.')
+@click.option('--instrument', is_flag=True,
+              help='Record the latency of the database and the analysis for the /metrics route.')
+def serve(db_name, host, port, max_concurrent, instrument):
+    """
+    Serve the habit tracker as a JSON API over HTTP.
+    """
+    if instrument:
+        instrumentation.enable()
+    server = create_server(db_name, host, port, max_concurrent)
+    click.echo(f"Serving '{db_name}' on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.db.exit()
+
+
+if __name__ == '__main__':
+    import logconfig
+    logconfig.configure_logging()
+    serve()
@@ -1,9 +1,35 @@
 import pytest
+from click.testing import CliRunner
 from datetime import datetime, timedelta
 from habit import Habit
 from database import Database
 import analysis
+import async_database
+import database
+import exporter
+import http.client
+import importer
+import instrumentation
+import asyncio
+import cli
+import json
+import io
+import logconfig
+import logging
+import maintenance
+import metrics
+import name_index
 import os
+import periods
+import random
+import re
+import server
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
 
 # In this part of the tests, a @pytest.fixture is created, this fixture creates
 # a temporary database for each test ensuring isolation.
@@ -328,3 +354,1405 @@ def test_longest_streak(test_db):
     assert longest_streak_habit is not None
     assert longest_streak_habit.name == habit2.name
     assert longest_streak_habit.calculate_longest_streak() == 5
+
+# In this part, the loading of many habits at once is verified, since every menu option
+# starts by loading the habits with their completion dates.
+
+def test_show_all_habits_loads_completions(test_db):
+    """
+    This test checks that loading all the habits at once gives each habit only its own completion dates.
+    """
+    today = datetime.now()
+    test_db.new_created_habit(Habit("habit test 16", "daily", 1))
+    test_db.new_created_habit(Habit("habit test 17", "weekly", 1))
+    test_db.new_created_habit(Habit("habit test 18", "daily", 1))
+    for i in range(3):
+        test_db.add_completion("habit test 16", today - timedelta(days=i))
+    test_db.add_completion("habit test 17", today)
+
+    habits = {habit.name: habit for habit in test_db.show_all_habits()}
+    assert len(habits) == 3
+    assert sorted(habits["habit test 16"].completion_dates) == sorted(test_db.get_completions("habit test 16"))
+    assert len(habits["habit test 16"].completion_dates) == 3
+    assert len(habits["habit test 17"].completion_dates) == 1
+    assert habits["habit test 18"].completion_dates == []
+
+def test_show_frequency_loads_completions(test_db):
+    """
+    This test checks that loading the habits of one frequency only loads the completion dates of those habits.
+    """
+    today = datetime.now()
+    test_db.new_created_habit(Habit("habit test 19", "daily", 1))
+    test_db.new_created_habit(Habit("habit test 20", "weekly", 1))
+    test_db.add_completion("habit test 19", today)
+    test_db.add_completion("habit test 20", today)
+
+    weekly_habits = test_db.show_frequency("weekly")
+    assert [habit.name for habit in weekly_habits] == ["habit test 20"]
+    assert weekly_habits[0].completion_dates == [today.replace(microsecond=0)]
+
+def test_habit_summaries_match_loaded_habits(test_db):
+    """
+    This test checks that the summaries read with SQL are the dictionaries of the habits loaded with their completions.
+    """
+    for number, frequency in [(34, 'daily'), (35, 'weekly'), (36, 'monthly')]:
+        test_db.new_created_habit(Habit(f"habit test {number}", frequency, 2))
+    start = datetime(2024, 2, 1, 7, 30)
+    test_db.add_completions_bulk([("habit test 34", start + timedelta(hours=13 * x)) for x in range(9)] +
+                                 [("habit test 36", start)])
+    assert test_db.habit_summaries() == [habit.to_dict() for habit in test_db.load_habits()]
+    assert test_db.habit_summaries(limit=1, offset=2)[0]['last_completion_date'] == start.isoformat()
+    assert [summary['name'] for summary in test_db.habit_summaries('weekly')] == ["habit test 35"]
+
+def test_habit_rows_sort_filter_and_pages(test_db):
+    """
+    This test checks that the rows of the table are the same whatever the size of the pages they are read in,
+    that the last completion is the latest one, and that the filters and the orders are applied.
+    """
+    day = datetime(2024, 3, 1, 8, 0)
+    for number, frequency in [(31, 'daily'), (33, 'weekly'), (32, 'daily'), (30, 'weekly')]:
+        test_db.new_created_habit(Habit(f"habit test {number}", frequency, 1))
+    test_db.add_completion("habit test 32", day)
+    test_db.add_completion("habit test 32", day - timedelta(days=3))
+    test_db.add_completion("habit test 30", day - timedelta(days=1))
+
+    rows = list(test_db.habit_rows())
+    assert [row[0] for row in rows] == ["habit test 31", "habit test 33", "habit test 32", "habit test 30"]
+    assert rows[2][2:] == ('daily', 1, day) and rows[0][4] is None
+    for sort in database.HABIT_ROW_SORTS:
+        for descending in (False, True):
+            assert list(test_db.habit_rows(sort=sort, descending=descending, page_size=1)) == \
+                list(test_db.habit_rows(sort=sort, descending=descending))
+    assert [row[0] for row in test_db.habit_rows(sort='name')][:2] == ["habit test 30", "habit test 31"]
+    assert [row[0] for row in test_db.habit_rows(sort='last_done', descending=True)][:2] == \
+        ["habit test 32", "habit test 30"]
+    assert [row[0] for row in test_db.habit_rows('weekly', sort='name', page_size=1)] == \
+        ["habit test 30", "habit test 33"]
+    assert [row[0] for row in test_db.habit_rows('daily', sort='last_done', page_size=1)] == \
+        ["habit test 31", "habit test 32"]
+    assert [row[0] for row in test_db.habit_rows(name_prefix="habit test 3")] == [row[0] for row in rows]
+    assert [row[0] for row in test_db.habit_rows(name_prefix="habit test 32")] == ["habit test 32"]
+    assert list(test_db.habit_rows(name_prefix="habit test 4")) == []
+    with pytest.raises(ValueError):
+        list(test_db.habit_rows(sort='periodicity'))
+    streamed = test_db.habit_rows(sort='last_done', page_size=1)
+    assert next(streamed)[0] == "habit test 31"
+    test_db.delete_habit("habit test 30")
+    assert [row[0] for row in streamed] == ["habit test 33", "habit test 32"]
+
+def test_stream_table_of_habits_pages(test_db):
+    """
+    This test checks that the streamed table has fixed columns, prints one page at a time
+    and stops reading the rows when the next page is not wanted.
+    """
+    test_db.new_created_habit(Habit("habit test 34 with a name that does not fit", "daily", 1))
+    for number in range(35, 40):
+        test_db.new_created_habit(Habit(f"habit test {number}", "daily", 1))
+    test_db.add_completion("habit test 35", datetime(2024, 3, 1, 8, 0))
+
+    lines = []
+    assert analysis.stream_table_of_habits(test_db, page_size=4, echo=lines.append) == 6
+    assert len({len(line) for line in lines}) == 1
+    assert sum(line.startswith('| Name') for line in lines) == 2
+    assert any('habit test 34 with a name t...' in line for line in lines)
+    assert any('2024-03-01 08:00:00' in line for line in lines) and any('Never' in line for line in lines)
+
+    asked = []
+    lines = []
+    assert analysis.render_habit_rows(test_db.habit_rows(page_size=2), 2, lambda: asked.append(1) and False,
+                                      lines.append) == 2
+    assert len(asked) == 1
+    lines = []
+    assert analysis.stream_table_of_habits(test_db, 'weekly', echo=lines.append) == 0
+    assert lines == ["No habits found."]
+
+def test_name_index_search():
+    """
+    This test checks that the names starting with a text come first, in alphabetical order and without case,
+    and that the names with a typo or containing a word that starts with the text are found after them.
+    """
+    index = name_index.NameIndex(["Read", "read news", "Meditate", "Go meditate", "Exercise", "Plan week"])
+    assert index.search("re") == ["Read", "read news"]
+    assert index.search("RE", 1) == ["Read"]
+    assert index.search("med") == ["Meditate", "Go meditate"]
+    assert index.search("exercize") == ["Exercise"]
+    assert index.search("") == ["Exercise", "Go meditate", "Meditate", "Plan week", "Read", "read news"]
+    assert index.search("swim") == []
+
+    index.add("Reading")
+    index.add("Reading")
+    index.remove("Read")
+    index.remove("Swim")
+    assert index.prefix("read") == ["read news", "Reading"]
+    assert len(index) == 6 and "Read" not in index
+    assert index.fuzzy("read") == ["read news", "Reading"]
+
+def test_name_index_kept_in_sync(test_db):
+    """
+    This test checks that the index of the names is built from the habits and follows
+    the habits that are created and deleted afterwards.
+    """
+    test_db.new_created_habit(Habit("habit test 40", "daily", 1))
+    index = test_db.name_index()
+    assert index.search("habit test 4") == ["habit test 40"]
+    test_db.new_created_habit(Habit("habit test 41", "weekly", 1))
+    assert not test_db.new_created_habit(Habit("habit test 41", "weekly", 1))
+    test_db.delete_habit("habit test 40")
+    assert test_db.name_index() is index
+    assert index.search("habit test 4") == ["habit test 41"]
+    assert len(index) == len(test_db.habit_names())
+
+# In this part, the schema migrations are verified, since existing databases must be upgraded
+# in place without losing their data.
+
+@pytest.fixture
+def old_db_name():
+    """
+    This fixture copies the example database, which was created before the schema migrations existed,
+    and deletes the copy afterward.
+    """
+    old_db_name = 'test_old_habits.db'
+    example_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Database', 'habits.db')
+    shutil.copyfile(example_db, old_db_name)
+    yield old_db_name
+    if os.path.exists(old_db_name):
+        os.remove(old_db_name)
+
+def test_migrate_upgrades_old_database(old_db_name):
+    """
+    This test checks that an old database is upgraded to the current schema and keeps all its data.
+    """
+    connection = sqlite3.connect(old_db_name)
+    habit_count = connection.execute('SELECT COUNT(*) FROM habits').fetchone()[0]
+    completion_count = connection.execute('SELECT COUNT(*) FROM habit_completions').fetchone()[0]
+    connection.close()
+
+    db = Database(db_name=old_db_name)
+    db.cursor.execute('PRAGMA user_version')
+    assert db.cursor.fetchone()[0] == database.SCHEMA_VERSION
+    db.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'habit_completions'")
+    assert ('idx_habit_completions_habit_date',) in db.cursor.fetchall()
+    assert len(db.show_all_habits()) == habit_count
+    assert sum(len(habit.completion_dates) for habit in db.show_all_habits()) == completion_count
+    db.cursor.execute('SELECT DISTINCT typeof(completion_date) FROM habit_completions')
+    assert db.cursor.fetchall() == [('integer',)]
+    assert datetime(2024, 10, 18, 10, 46, 16) in db.get_completions('Read')
+    assert db.find_habit('Read').creation_date == datetime(2024, 10, 18, 10, 43, 27)
+    assert db.check_period_counts() == []
+    db.exit()
+
+def test_migrate_skips_current_schema(test_db):
+    """
+    This test checks that no schema statement is run when the database is already up to date.
+    """
+    statements = []
+    test_db.connection.set_trace_callback(statements.append)
+    test_db.migrate()
+    test_db.connection.set_trace_callback(None)
+    assert statements == ['PRAGMA user_version']
+
+def test_delete_habit_cascades_completions(test_db):
+    """
+    This test checks that deleting a habit also deletes its completion dates.
+    """
+    test_db.new_created_habit(Habit("habit test 21", "daily", 1))
+    test_db.add_completion("habit test 21", datetime.now())
+    test_db.delete_habit("habit test 21")
+    assert test_db.get_completions("habit test 21") == []
+
+# In this part, the streak state stored in the database is verified, since the analysis
+# reads the streaks from it instead of recomputing them from the completion dates.
+
+def test_stored_streaks_match_habit(test_db):
+    """
+    This test checks that the streaks kept up to date on every completion match the streaks
+    calculated by the Habit class, also when completions arrive out of order or go over the periodicity.
+    """
+    generator = random.Random(7)
+    now = datetime.now()
+    for x, (frequency, periodicity) in enumerate([("daily", 1), ("daily", 2), ("weekly", 1), ("weekly", 3)]):
+        name = f"habit test {30 + x}"
+        test_db.new_created_habit(Habit(name, frequency, periodicity))
+        step = timedelta(days=1) if frequency == "daily" else timedelta(weeks=1)
+        for i in range(40, -1, -1):
+            for _ in range(generator.choice([0, periodicity, periodicity, periodicity + 1])):
+                test_db.add_completion(name, now - i * step - timedelta(minutes=generator.randint(0, 30)))
+        test_db.add_completion(name, now - 50 * step)
+
+        habit = test_db.find_habit(name)
+        assert test_db.get_streaks(name) == (habit.calculate_current_streak(), habit.calculate_longest_streak())
+
+def test_rebuild_streaks(test_db):
+    """
+    This test checks that rebuilding the streaks from the completion dates gives the same stored state.
+    """
+    today = datetime.now()
+    test_db.new_created_habit(Habit("habit test 34", "daily", 1))
+    for i in range(5, 0, -1):
+        test_db.add_completion("habit test 34", today - timedelta(days=i))
+    test_db.cursor.execute('SELECT * FROM habit_streaks')
+    stored_state = test_db.cursor.fetchall()
+
+    test_db.cursor.execute('UPDATE habit_streaks SET longest_streak = 0')
+    test_db.rebuild_streaks()
+    test_db.cursor.execute('SELECT * FROM habit_streaks')
+    assert test_db.cursor.fetchall() == stored_state
+    assert test_db.get_streaks("habit test 34") == (5, 5)
+
+def test_current_streak_for_habit(test_db):
+    """
+    This test checks that the current streak of a habit is read from the database.
+    """
+    today = datetime.now()
+    test_db.new_created_habit(Habit("habit test 35", "daily", 1))
+    for i in range(3, -1, -1):
+        test_db.add_completion("habit test 35", today - timedelta(days=i))
+    assert analysis.current_streak_for_habit(test_db, "habit test 35") == 3
+    assert analysis.current_streak_for_habit(test_db, "missing habit") is None
+
+def test_dates_are_stored_as_epoch_seconds(test_db):
+    """
+    This test checks that completion dates are stored as whole seconds and read back as the same date.
+    """
+    completion_date = datetime(2024, 3, 31, 23, 59, 59, 999999)
+    test_db.new_created_habit(Habit("habit test 36", "weekly", 1))
+    test_db.add_completion("habit test 36", completion_date)
+    assert test_db.get_completion_epochs("habit test 36") == [1711929599]
+    assert test_db.get_completions("habit test 36") == [completion_date.replace(microsecond=0)]
+
+# In this part, adding many completion dates at once is verified, since it is used to import
+# the history of other trackers.
+
+def test_add_completions_bulk(test_db):
+    """
+    This test checks that completions added in batches are all stored and keep the streaks up to date.
+    """
+    today = datetime.now()
+    test_db.new_created_habit(Habit("habit test 37", "daily", 1))
+    test_db.new_created_habit(Habit("habit test 38", "weekly", 1))
+    completions = [("habit test 37", today - timedelta(days=i)) for i in range(1, 6)]
+    completions += [("habit test 38", today - timedelta(weeks=i)) for i in range(3, 0, -1)]
+    added = test_db.add_completions_bulk(iter(completions), batch_size=3)
+    assert added == 8
+    assert len(test_db.get_completions("habit test 37")) == 5
+    assert test_db.get_streaks("habit test 37") == (5, 5)
+    assert test_db.get_streaks("habit test 38") == (3, 3)
+
+def test_add_completions_bulk_rolls_back_failed_batch(test_db):
+    """
+    This test checks that a batch with an unknown habit is rolled back while the batches before it are kept.
+    """
+    today = datetime.now()
+    test_db.new_created_habit(Habit("habit test 39", "daily", 1))
+    completions = [("habit test 39", today), ("habit test 39", today), ("missing habit", today)]
+    with pytest.raises(sqlite3.IntegrityError):
+        test_db.add_completions_bulk(completions, batch_size=2)
+    assert len(test_db.get_completions("habit test 39")) == 2
+
+def test_import_completions_csv(test_db):
+    """
+    This test checks that completions are imported from CSV and that rows with unknown habits or bad dates are skipped.
+    """
+    test_db.new_created_habit(Habit("habit test 40", "daily", 1))
+    file = io.StringIO(
+        "habit_name,completion_date\n"
+        "habit test 40,2024-05-01T08:00:00\n"
+        "habit test 40,1714636800\n"
+        "missing habit,2024-05-03T08:00:00\n"
+        "habit test 40,not a date\n"
+    )
+    report = importer.import_completions(test_db, file, file_format='csv', batch_size=1)
+    assert report['imported'] == 2
+    assert report['skipped'] == 2
+    assert test_db.get_completions("habit test 40") == [datetime(2024, 5, 1, 8), datetime.fromtimestamp(1714636800)]
+
+def test_import_completions_jsonl(test_db):
+    """
+    This test checks that completions are imported from JSON Lines.
+    """
+    test_db.new_created_habit(Habit("habit test 41", "weekly", 2))
+    file = io.StringIO(
+        '{"habit_name": "habit test 41", "completion_date": "2024-05-01T08:00:00"}\n'
+        '\n'
+        '{"habit_name": "habit test 41", "completion_date": 1714636800}\n'
+        'not json\n'
+    )
+    report = importer.import_completions(test_db, file, file_format='jsonl')
+    assert report['imported'] == 2
+    assert report['skipped'] == 1
+
+def test_import_completions_with_utc_offset(test_db):
+    """
+    This test checks that a date with a UTC offset is imported in local time with the other rows of its batch.
+    """
+    test_db.new_created_habit(Habit("habit test 46", "daily", 1))
+    file = io.StringIO(
+        "habit_name,completion_date\n"
+        "habit test 46,2024-05-01T08:00:00\n"
+        "habit test 46,2024-05-02T08:00:00+02:00\n"
+    )
+    report = importer.import_completions(test_db, file, file_format='csv')
+    assert report['imported'] == 2
+    local = datetime.fromisoformat("2024-05-02T08:00:00+02:00").astimezone().replace(tzinfo=None)
+    assert test_db.get_completions("habit test 46") == [datetime(2024, 5, 1, 8), local]
+
+def test_import_dates_in_local_time():
+    """
+    This test checks that seconds since the epoch and dates with a UTC offset are both read in the local time,
+    in a time zone two hours ahead of UTC in May, and that a date without an offset is kept as it is.
+    """
+    time_zone = os.environ.get('TZ')
+    os.environ['TZ'] = 'CET-1CEST,M3.5.0,M10.5.0/3'
+    time.tzset()
+    try:
+        assert importer.parse_date(1714636800) == datetime(2024, 5, 2, 10)
+        assert importer.parse_date('1714636800') == datetime(2024, 5, 2, 10)
+        assert importer.parse_date('2024-05-02T08:00:00+00:00') == datetime(2024, 5, 2, 10)
+        assert importer.parse_date('2024-05-02T08:00:00') == datetime(2024, 5, 2, 8)
+    finally:
+        if time_zone is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = time_zone
+        time.tzset()
+
+def test_import_completions_skips_habit_name_not_text(test_db):
+    """
+    This test checks that a JSON line whose habit name is not text is skipped and the import goes on.
+    """
+    test_db.new_created_habit(Habit("habit test 47", "daily", 1))
+    file = io.StringIO(
+        '{"habit_name": ["habit test 47"], "completion_date": "2024-05-01T08:00:00"}\n'
+        '{"habit_name": {"name": "habit test 47"}, "completion_date": "2024-05-01T08:00:00"}\n'
+        '{"habit_name": "habit test 47", "completion_date": "2024-05-02T08:00:00"}\n'
+    )
+    report = importer.import_completions(test_db, file, file_format='jsonl')
+    assert report['imported'] == 1
+    assert report['skipped'] == 2
+
+# In this part, exporting the data is verified, since the exported files must be readable by the importer.
+
+def test_export_completions_round_trip(test_db):
+    """
+    This test checks that exported completions can be imported again, and that the filters are applied.
+    """
+    test_db.new_created_habit(Habit("habit test 42", "daily", 1))
+    test_db.new_created_habit(Habit("habit test 43", "weekly", 1))
+    for day in range(1, 6):
+        test_db.add_completion("habit test 42", datetime(2024, 6, day, 9))
+    test_db.add_completion("habit test 43", datetime(2024, 6, 3, 9))
+
+    file = io.StringIO()
+    count = exporter.export_completions(test_db, file, frequency="daily", start=datetime(2024, 6, 2),
+                                        end=datetime(2024, 6, 5), fetch_size=2)
+    assert count == 3
+    assert file.getvalue().splitlines()[:2] == ["habit_name,completion_date", "habit test 42,2024-06-02T09:00:00"]
+
+    test_db.delete_habit("habit test 42")
+    test_db.new_created_habit(Habit("habit test 42", "daily", 1))
+    file.seek(0)
+    report = importer.import_completions(test_db, file, file_format='csv')
+    assert report['imported'] == 3
+    assert test_db.get_completions("habit test 42") == [datetime(2024, 6, day, 9) for day in range(2, 5)]
+
+def test_export_habits_jsonl(test_db):
+    """
+    This test checks that habits are exported as JSON Lines.
+    """
+    habit = Habit("habit test 44", "weekly", 2)
+    habit.creation_date = datetime(2024, 6, 1, 12)
+    test_db.new_created_habit(habit)
+    file = io.StringIO()
+    assert exporter.export_habits(test_db, file, file_format='jsonl', habit_name="habit test 44") == 1
+    assert json.loads(file.getvalue()) == {
+        "name": "habit test 44", "frequency": "weekly", "periodicity": 2, "creation_date": "2024-06-01T12:00:00"
+    }
+
+# In this part, the NumPy streak engine is compared with the Habit class, since both must give
+# exactly the same streaks. These tests are skipped when NumPy is not installed.
+
+def random_habit(seed: int, frequencies=("daily", "weekly")):
+    """
+    This function creates a habit with random completion dates around today, including periods
+    with too few and too many completions and dates in the future.
+    """
+    generator = random.Random(seed)
+    frequency = generator.choice(frequencies)
+    habit = Habit(f"habit {seed}", frequency, generator.randint(1, 3))
+    now = datetime.now()
+    current_period = periods.period_of(now, frequency)
+    step = timedelta(seconds=periods.period_start_epoch(current_period + 1, frequency)
+                     - periods.period_start_epoch(current_period, frequency))
+    for i in range(generator.randint(0, 80)):
+        offset = generator.choice([generator.randint(-2, 40), generator.randint(0, 5), 1, 2])
+        habit.completion_dates.append(now - offset * step - timedelta(seconds=generator.randint(0, 86399)))
+    return habit
+
+def test_numpy_streaks_match_habit():
+    """
+    This test checks that the NumPy engine gives the same current and longest streaks as the Habit class.
+    """
+    numpy_streaks = pytest.importorskip("numpy_streaks")
+    for seed in range(300):
+        habit = random_habit(seed)
+        expected = (habit.calculate_current_streak(), habit.calculate_longest_streak())
+        assert numpy_streaks.habit_streaks(habit) == expected, seed
+
+NEW_FREQUENCIES = ("weekly:sunday", "monthly", "every:3", "every:10")
+
+def test_period_engines():
+    """
+    This test checks the periods of every kind of frequency: consecutive periods are consecutive integers,
+    each period starts where the previous one ends, and the frequencies are normalized as they are stored.
+    """
+    sunday = datetime(2024, 3, 3, 12, 0)
+    week = periods.period_of(sunday, "weekly:sunday")
+    assert periods.period_of(sunday + timedelta(days=6), "weekly:sunday") == week
+    assert periods.period_of(sunday - timedelta(days=1), "weekly:sunday") == week - 1
+    assert periods.period_of(sunday, "weekly") == periods.period_of(sunday - timedelta(days=6), "weekly")
+    month_ends = [(datetime(2024, 1, 31), datetime(2024, 2, 1)), (datetime(2024, 12, 31), datetime(2025, 1, 1))]
+    for before, after in month_ends:
+        assert periods.period_of(after, "monthly") == periods.period_of(before, "monthly") + 1
+    assert periods.from_epoch(periods.period_start_epoch(periods.period_of(sunday, "monthly"), "monthly")) == \
+        datetime(2024, 3, 1)
+    day = datetime(1969, 12, 30, 23, 0)
+    for frequency in ("daily", "weekly") + NEW_FREQUENCIES:
+        period = periods.period_of(day, frequency)
+        start = periods.period_start_epoch(period, frequency)
+        assert start <= periods.to_epoch(day) < periods.period_start_epoch(period + 1, frequency)
+        assert periods.period_of_epoch(start - 1, frequency) == period - 1
+    assert periods.normalize_frequency(" Weekly:Sunday ") == "weekly:sunday"
+    assert periods.normalize_frequency("weekly:monday") == "weekly"
+    assert periods.normalize_frequency("every:1") == "daily"
+    assert Habit("habit test 42", "Every:03", 1).frequency == "every:3"
+    for frequency in ("hourly", "every:0", "every:x", "weekly:someday"):
+        with pytest.raises(ValueError):
+            periods.normalize_frequency(frequency)
+
+def test_new_frequencies_match_database(test_db):
+    """
+    This test checks that the Habit class, the stored streaks, the SQL streaks and the period counts
+    agree for the habits of the new frequencies, so that the period engines are shared by all of them.
+    """
+    habits = [random_habit(seed, NEW_FREQUENCIES) for seed in range(40)]
+    for habit in habits:
+        test_db.new_created_habit(habit)
+        test_db.add_completions_bulk((habit.name, date) for date in habit.completion_dates)
+    sql_streaks = test_db.sql_streaks()
+    for habit in habits:
+        expected = (habit.calculate_current_streak(), habit.calculate_longest_streak())
+        assert test_db.get_streaks(habit.name) == expected, habit.name
+        assert sql_streaks[habit.name] == expected, habit.name
+        assert test_db.can_mark_performed(habit.name) == habit.can_mark_performed(), habit.name
+    assert test_db.check_period_counts() == []
+    test_db.backfill_period_counts()
+    assert test_db.sql_streaks() == sql_streaks
+    assert set(test_db.frequencies()) <= set(NEW_FREQUENCIES)
+
+def test_numpy_streaks_new_frequencies():
+    """
+    This test checks that the NumPy engine places the completions in the same periods as the Habit class
+    for the new frequencies.
+    """
+    numpy_streaks = pytest.importorskip("numpy_streaks")
+    for seed in range(100):
+        habit = random_habit(seed, NEW_FREQUENCIES)
+        expected = (habit.calculate_current_streak(), habit.calculate_longest_streak())
+        assert numpy_streaks.habit_streaks(habit) == expected, seed
+
+def test_numpy_streaks_sparse_periods():
+    """
+    This test checks the NumPy engine with completions that are years apart, where the periods are counted by sorting.
+    """
+    numpy_streaks = pytest.importorskip("numpy_streaks")
+    habit = Habit("habit test 45", "daily", 1)
+    habit.completion_dates = [datetime(1990, 1, 1), datetime(1990, 1, 2), datetime(2010, 5, 5), datetime(2030, 1, 1)]
+    assert numpy_streaks.habit_streaks(habit) == (0, 2)
+    epochs = numpy_streaks.to_epoch_array(habit.completion_dates)
+    assert numpy_streaks.current_streak(epochs, "daily", 1, now=datetime(1990, 1, 3, 12)) == 2
+
+# In this part, the leaderboard of streaks is verified, since its chunks are calculated in separate processes.
+
+def test_streak_leaderboard(test_db):
+    """
+    This test checks that the leaderboard calculated in parallel chunks gives the top habits by streak.
+    """
+    today = datetime.now()
+    for x, streak in enumerate([3, 5, 0, 2, 5, 1, 4]):
+        name = f"habit test {50 + x}"
+        test_db.new_created_habit(Habit(name, "daily", 1))
+        for i in range(streak, 0, -1):
+            test_db.add_completion(name, today - timedelta(days=i))
+    test_db.new_created_habit(Habit("habit test 57", "weekly", 1))
+    for i in range(6, 0, -1):
+        test_db.add_completion("habit test 57", today - timedelta(weeks=i))
+
+    expected = [("habit test 57", 6), ("habit test 51", 5), ("habit test 54", 5), ("habit test 56", 4)]
+    assert analysis.streak_leaderboard(test_db, k=4, workers=2, chunk_size=3) == expected
+    assert analysis.streak_leaderboard(test_db, k=4, workers=1, chunk_size=3) == expected
+    assert analysis.streak_leaderboard(test_db, k=2, by="current", frequency="daily", workers=2, chunk_size=2) == [
+        ("habit test 51", 5), ("habit test 54", 5)
+    ]
+    assert len(analysis.streak_leaderboard(test_db, k=20)) == 7
+
+# In this part, the strategies to calculate streaks are compared, since they must all give the same streaks.
+
+def test_streak_strategies_agree(test_db):
+    """
+    This test checks that the stored, SQL and Python streak strategies give the same streaks for random habits.
+    """
+    for seed in range(60):
+        habit = random_habit(seed)
+        test_db.new_created_habit(habit)
+        test_db.add_completions_bulk((habit.name, date) for date in habit.completion_dates)
+
+    sql_streaks = test_db.sql_streaks()
+    for habit in test_db.show_all_habits():
+        expected = (habit.calculate_current_streak(), habit.calculate_longest_streak())
+        assert sql_streaks[habit.name] == expected
+        for strategy in analysis.STREAK_STRATEGIES:
+            assert analysis.current_streak_for_habit(test_db, habit.name, strategy) == expected[0]
+            assert analysis.longest_streak_for_habit(test_db, habit.name, strategy) == expected[1]
+
+    leaders = {analysis.show_longest_streak(test_db, strategy).name for strategy in analysis.STREAK_STRATEGIES}
+    assert len(leaders) == 1
+    assert analysis.longest_streak_for_habit(test_db, "missing habit", "sql") is None
+    with pytest.raises(ValueError):
+        analysis.show_longest_streak(test_db, "magic")
+
+# In this part, the pooled mode of the database is verified, since it is used from many threads at once.
+
+@pytest.fixture
+def pooled_db():
+    """
+    This fixture creates a temporary database in pooled mode and deletes it afterward, with its WAL files.
+    """
+    test_db_name = 'test_pooled_habits.db'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(test_db_name + suffix):
+            os.remove(test_db_name + suffix)
+    db = Database(db_name=test_db_name, insert_predefined=False, pooled=True)
+    yield db
+    db.exit()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(test_db_name + suffix):
+            os.remove(test_db_name + suffix)
+
+def test_pooled_connections_per_thread(pooled_db):
+    """
+    This test checks that each thread gets its own connection in WAL mode.
+    """
+    connections = []
+    thread = threading.Thread(target=lambda: connections.append(pooled_db.connection))
+    thread.start()
+    thread.join()
+    assert connections[0] is not pooled_db.connection
+    pooled_db.cursor.execute('PRAGMA journal_mode')
+    assert pooled_db.cursor.fetchone()[0] == 'wal'
+
+def test_pooled_concurrent_readers_and_writers(pooled_db):
+    """
+    This test runs many readers and writers at the same time and checks that no operation fails
+    and that every completion and streak is stored.
+    """
+    writer_count, reader_count, completions_per_writer = 4, 8, 25
+    start = datetime.now() - timedelta(days=completions_per_writer + 1)
+    for x in range(writer_count):
+        pooled_db.new_created_habit(Habit(f"habit test {60 + x}", "daily", 1))
+    errors = []
+    stop = threading.Event()
+
+    def writer(x):
+        try:
+            for day in range(completions_per_writer):
+                pooled_db.add_completion(f"habit test {60 + x}", start + timedelta(days=day))
+        except Exception as error:
+            errors.append(error)
+
+    def reader():
+        try:
+            while not stop.is_set():
+                for habit in pooled_db.show_all_habits():
+                    pooled_db.get_streaks(habit.name)
+        except Exception as error:
+            errors.append(error)
+
+    readers = [threading.Thread(target=reader) for _ in range(reader_count)]
+    writers = [threading.Thread(target=writer, args=(x,)) for x in range(writer_count)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    for habit in pooled_db.show_all_habits():
+        assert len(habit.completion_dates) == completions_per_writer
+        assert pooled_db.get_streaks(habit.name) == (0, completions_per_writer)
+
+
+# In this part, the asynchronous database is verified, since many coroutines use it at the same time.
+
+def test_async_database_operations(pooled_db):
+    """
+    This test adds, finds and deletes a habit through the asynchronous database.
+    """
+    async def scenario():
+        adb = async_database.AsyncDatabase(db_name=pooled_db.db_name, insert_predefined=False)
+        habit = Habit("habit test 70", "daily", 1)
+        await adb.new_created_habit(habit)
+        yesterday = datetime.now() - timedelta(days=1)
+        await asyncio.gather(*(adb.add_completion(habit.name, yesterday - timedelta(days=day)) for day in range(3)))
+        found = await adb.find_habit(habit.name)
+        streak = await async_database.longest_streak_for_habit(adb, habit.name)
+        daily = await adb.show_frequency('daily')
+        await adb.delete_habit(habit.name)
+        missing = await adb.find_habit(habit.name)
+        await adb.exit()
+        return found, streak, daily, missing
+
+    found, streak, daily, missing = asyncio.run(scenario())
+    assert len(found.completion_dates) == 3
+    assert streak == 3
+    assert [habit.name for habit in daily] == ["habit test 70"]
+    assert missing is None
+
+def test_async_database_coalesces_reads(pooled_db):
+    """
+    This test checks that identical reads requested at the same time query the database once,
+    and that a write makes the next read query the database again.
+    """
+    async def scenario():
+        adb = async_database.AsyncDatabase(db_name=pooled_db.db_name, insert_predefined=False)
+        calls = []
+        show_all_habits = adb.db.show_all_habits
+
+        def counted_show_all_habits():
+            calls.append(1)
+            time.sleep(0.05)
+            return show_all_habits()
+
+        adb.db.show_all_habits = counted_show_all_habits
+        results = await asyncio.gather(*(adb.show_all_habits() for _ in range(20)))
+        await adb.new_created_habit(Habit("habit test 71", "weekly", 1))
+        after_write = await adb.show_all_habits()
+        await adb.exit()
+        return calls, results, after_write
+
+    calls, results, after_write = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results)
+    assert [habit.name for habit in after_write] == ["habit test 71"]
+
+
+# In this part, the HTTP API is verified, since it must answer many clients over kept-alive connections.
+
+@pytest.fixture
+def api_server():
+    """
+    This fixture starts the HTTP server on a free port with a temporary database, and stops it afterward.
+    """
+    test_db_name = 'test_server_habits.db'
+    habit_server = server.create_server(test_db_name, port=0, max_concurrent=8, insert_predefined=False)
+    thread = threading.Thread(target=habit_server.serve_forever, daemon=True)
+    thread.start()
+    yield habit_server
+    habit_server.shutdown()
+    habit_server.server_close()
+    habit_server.db.exit()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(test_db_name + suffix):
+            os.remove(test_db_name + suffix)
+
+def api_request(connection, method, path, payload=None):
+    """
+    This function sends a request over an open connection and returns the status and the decoded JSON answer.
+    """
+    body = json.dumps(payload) if payload is not None else None
+    connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+def test_api_habit_lifecycle(api_server):
+    """
+    This test creates, lists, marks, reads the streak of and deletes a habit over one kept-alive connection.
+    """
+    connection = http.client.HTTPConnection(*api_server.server_address)
+    status, created = api_request(connection, 'POST', '/habits',
+                                  {'name': 'habit test 80', 'frequency': 'daily', 'periodicity': 1})
+    assert status == 201 and created['name'] == 'habit test 80'
+    sock = connection.sock
+    assert api_request(connection, 'POST', '/habits',
+                       {'name': 'habit test 80', 'frequency': 'daily', 'periodicity': 1})[0] == 409
+    assert api_request(connection, 'POST', '/habits', {'name': 'habit test 81', 'frequency': 'hourly',
+                                                       'periodicity': 1})[0] == 400
+
+    assert api_request(connection, 'POST', '/habits/habit%20test%2080/completions')[0] == 201
+    assert api_request(connection, 'POST', '/habits/habit%20test%2080/completions')[0] == 409
+    status, habit = api_request(connection, 'GET', '/habits/habit%20test%2080')
+    assert status == 200 and habit['completions'] == 1
+    status, streak = api_request(connection, 'GET', '/habits/habit%20test%2080/streak?strategy=python')
+    assert status == 200 and streak['current_streak'] == 0 and streak['longest_streak'] == 1
+
+    assert api_request(connection, 'DELETE', '/habits/habit%20test%2080')[0] == 204
+    assert api_request(connection, 'DELETE', '/habits/habit%20test%2080')[0] == 404
+    assert api_request(connection, 'GET', '/nothing')[0] == 404
+    # Every request was answered over the same socket.
+    assert connection.sock is sock
+    connection.close()
+
+def test_api_pagination(api_server):
+    """
+    This test lists the habits in pages and checks that every habit is listed once, in the order of creation.
+    """
+    for x in range(7):
+        api_server.db.new_created_habit(Habit(f"habit test {x}", "daily" if x % 2 else "weekly", 1))
+    connection = http.client.HTTPConnection(*api_server.server_address)
+    names = []
+    offset = 0
+    while offset is not None:
+        status, page = api_request(connection, 'GET', f'/habits?limit=3&offset={offset}')
+        assert status == 200
+        names.extend(habit['name'] for habit in page['habits'])
+        offset = page['next_offset']
+    assert names == [f"habit test {x}" for x in range(7)]
+    status, page = api_request(connection, 'GET', '/habits?frequency=daily&limit=2&offset=1')
+    assert [habit['name'] for habit in page['habits']] == ["habit test 3", "habit test 5"]
+    assert api_request(connection, 'GET', '/habits?limit=0')[0] == 400
+    connection.close()
+
+def test_api_rejects_requests_over_the_limit(api_server):
+    """
+    This test takes every request slot of the server and checks that the next request gets 503.
+    """
+    for _ in range(8):
+        api_server.slots.acquire()
+    connection = http.client.HTTPConnection(*api_server.server_address)
+    assert api_request(connection, 'GET', '/habits')[0] == 503
+    for _ in range(8):
+        api_server.slots.release()
+    assert api_request(connection, 'GET', '/habits')[0] == 200
+    connection.close()
+
+def test_api_rejects_bad_content_length(api_server):
+    """
+    This test checks that a malformed Content-Length is answered with 400 and a body over the limit with 413,
+    without reading the body, and that the connection is then closed.
+    """
+    for length, expected in [('-5', 400), ('abc', 400), (str(server.MAX_BODY_BYTES + 1), 413)]:
+        connection = http.client.HTTPConnection(*api_server.server_address)
+        connection.putrequest('POST', '/habits')
+        connection.putheader('Content-Length', length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == expected and 'error' in json.loads(response.read())
+        assert response.getheader('Connection') == 'close'
+        connection.close()
+    connection = http.client.HTTPConnection(*api_server.server_address)
+    assert api_request(connection, 'POST', '/habits',
+                       {'name': 'habit test 82', 'frequency': 'daily', 'periodicity': 1})[0] == 201
+    connection.close()
+
+
+# In this part, the command line is verified, since it is called from scripts and must start quickly.
+
+IMPORT_BUDGET_SECONDS = 0.5
+STARTUP_BUDGET_SECONDS = 2.0
+
+def test_cli_commands(test_db):
+    """
+    This test runs the commands of the command line with JSON output on a temporary database.
+    """
+    runner = CliRunner()
+    test_db.exit()
+    arguments = ['--db', 'test_habits.db', '--json']
+    result = runner.invoke(cli.cli, arguments + ['add', 'habit test 90', '-f', 'daily', '-p', '1'])
+    assert result.exit_code == 0 and json.loads(result.output)['name'] == 'habit test 90'
+    assert runner.invoke(cli.cli, arguments + ['add', 'habit test 90', '-f', 'daily']).exit_code == 1
+    result = runner.invoke(cli.cli, arguments + ['add', 'sunday test 88', '-f', 'Weekly:Sunday'])
+    assert json.loads(result.output)['frequency'] == 'weekly:sunday'
+    assert runner.invoke(cli.cli, arguments + ['add', 'habit test 87', '-f', 'hourly']).exit_code == 2
+    assert runner.invoke(cli.cli, arguments + ['done', 'habit test 90']).exit_code == 0
+    assert runner.invoke(cli.cli, arguments + ['done', 'habit test 90']).exit_code == 1
+    assert runner.invoke(cli.cli, arguments + ['done', 'habit test 91']).exit_code == 1
+
+    result = runner.invoke(cli.cli, arguments + ['list', '-f', 'daily'])
+    habits = json.loads(result.output)
+    assert [habit['name'] for habit in habits if habit['name'] == 'habit test 90'] == ['habit test 90']
+    db = Database(db_name='test_habits.db', insert_predefined=False)
+    expected = db.find_habit('habit test 90').to_dict()
+    assert [habit for habit in habits if habit['name'] == 'habit test 90'] == [expected]
+    assert db.completion_counts()['habit test 90'] == 1
+    db.exit()
+    runner.invoke(cli.cli, arguments + ['add', 'habit test 89', '-f', 'daily'])
+    result = runner.invoke(cli.cli, arguments + ['list', '--prefix', 'habit test', '--sort', 'name'])
+    assert [habit['name'] for habit in json.loads(result.output)] == ['habit test 89', 'habit test 90']
+    result = runner.invoke(cli.cli, ['--db', 'test_habits.db', 'list', '--prefix', 'habit test', '--sort', 'name',
+                                     '--desc'])
+    assert result.output.index('habit test 90') < result.output.index('habit test 89')
+    result = runner.invoke(cli.cli, arguments + ['streak', 'habit test 90'])
+    assert json.loads(result.output) == {'name': 'habit test 90', 'current_streak': 0, 'longest_streak': 1}
+    result = runner.invoke(cli.cli, arguments + ['top', '-k', '1'])
+    assert json.loads(result.output) == [{'name': 'habit test 90', 'streak': 1}]
+
+def test_cli_startup_budget(tmp_path):
+    """
+    This test measures the import time and the startup time of the command line in a new interpreter,
+    and checks that --help does not open the database and that listing as JSON does not import tabulate.
+    """
+    code_directory = os.path.dirname(os.path.abspath(database.__file__))
+    measure = ("import sys, time\n"
+               "start = time.perf_counter()\n"
+               "import cli\n"
+               "print(time.perf_counter() - start, 'tabulate' in sys.modules)\n")
+    output = subprocess.run([sys.executable, '-c', measure], cwd=code_directory, capture_output=True,
+                            text=True, check=True).stdout.split()
+    assert float(output[0]) < IMPORT_BUDGET_SECONDS
+    assert output[1] == 'False'
+
+    db_name = str(tmp_path / 'startup.db')
+    subprocess.run([sys.executable, 'cli.py', '--db', db_name, '--help'], cwd=code_directory,
+                   capture_output=True, check=True)
+    assert not os.path.exists(db_name)
+
+    check_tabulate = ("import sys, cli\n"
+                      "try:\n"
+                      "    cli.cli(standalone_mode=False)\n"
+                      "finally:\n"
+                      "    print('tabulate' in sys.modules)\n")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', check_tabulate, '--db', db_name, '--json', 'list'],
+                            cwd=code_directory, capture_output=True, text=True, check=True)
+    assert time.perf_counter() - start < STARTUP_BUDGET_SECONDS
+    assert result.stdout.splitlines()[-1] == 'False'
+    assert len(json.loads(result.stdout.splitlines()[0])) > 0
+
+
+# In this part, the write-behind mode is verified, since the queued completions must reach the disk
+# at the documented moments and a crash must never leave part of a flush in the database.
+
+def stored_completions(db_name, habit_name):
+    """
+    This function counts the completions of a habit that are on disk, with a separate connection.
+    """
+    connection = sqlite3.connect(db_name)
+    try:
+        return connection.execute('SELECT COUNT(*) FROM habit_completions WHERE habit_name = ?',
+                                  [habit_name]).fetchone()[0]
+    finally:
+        connection.close()
+
+def test_write_behind_flushes_on_size_read_and_exit():
+    """
+    This test checks that queued completions are written when the queue is full, before a read and on exit.
+    """
+    test_db_name = 'test_write_behind_habits.db'
+    db = Database(db_name=test_db_name, insert_predefined=False, write_behind=True, flush_size=3,
+                  flush_interval=3600)
+    try:
+        db.new_created_habit(Habit("habit test 100", "daily", 1))
+        start = datetime.now() - timedelta(days=10)
+        db.add_completion("habit test 100", start)
+        db.add_completion("habit test 100", start + timedelta(days=1))
+        assert stored_completions(test_db_name, "habit test 100") == 0
+        db.add_completion("habit test 100", start + timedelta(days=2))
+        assert stored_completions(test_db_name, "habit test 100") == 3
+
+        db.add_completion("habit test 100", start + timedelta(days=3))
+        assert len(db.get_completions("habit test 100")) == 4
+        assert db.get_streaks("habit test 100") == (0, 4)
+
+        db.add_completion("habit test 100", start + timedelta(days=4))
+        db.add_completion("habit test 101", start)
+        db.exit()
+        assert stored_completions(test_db_name, "habit test 100") == 5
+        assert stored_completions(test_db_name, "habit test 101") == 0
+    finally:
+        os.remove(test_db_name)
+
+def test_write_behind_flushes_on_interval(pooled_db):
+    """
+    This test checks that in pooled mode a queued completion is written by the timer after the flush interval.
+    """
+    db = Database(db_name=pooled_db.db_name, insert_predefined=False, pooled=True, write_behind=True,
+                  flush_size=100, flush_interval=0.05)
+    db.new_created_habit(Habit("habit test 102", "weekly", 1))
+    db.add_completion("habit test 102", datetime.now())
+    deadline = time.monotonic() + 5
+    while stored_completions(pooled_db.db_name, "habit test 102") == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert stored_completions(pooled_db.db_name, "habit test 102") == 1
+    db.exit()
+
+CRASH_SCRIPT = '''
+import os, sys
+from datetime import datetime, timedelta
+from database import Database
+from habit import Habit
+
+db = Database(db_name=sys.argv[1], insert_predefined=False, write_behind=True, flush_size=4, flush_interval=3600)
+db.new_created_habit(Habit("habit test 103", "daily", 1))
+start = datetime.now() - timedelta(days=20)
+for day in range(10):
+    if day == 7 and sys.argv[2] == 'during-flush':
+        # The process dies in the middle of the transaction of the second flush.
+        db.connection.set_progress_handler(lambda: os._exit(1), 1)
+    db.add_completion("habit test 103", start + timedelta(days=day))
+os._exit(1)
+'''
+
+@pytest.mark.parametrize('crash, durable', [('after-adding', 8), ('during-flush', 4)])
+def test_write_behind_survives_crash(tmp_path, crash, durable):
+    """
+    This test kills a process that uses the write-behind mode, and checks that the database holds
+    exactly the flushed completions, with streaks that agree with them.
+    """
+    code_directory = os.path.dirname(os.path.abspath(database.__file__))
+    db_name = str(tmp_path / 'crash.db')
+    result = subprocess.run([sys.executable, '-c', CRASH_SCRIPT, db_name, crash], cwd=code_directory)
+    assert result.returncode == 1
+    assert stored_completions(db_name, "habit test 103") == durable
+    db = Database(db_name=db_name, insert_predefined=False)
+    stored = db.get_streaks("habit test 103")
+    db.rebuild_streaks()
+    assert stored == db.get_streaks("habit test 103") == (0, durable)
+    db.exit()
+
+
+def database_rows(connection):
+    """
+    This function reads every row of the tables of the application, to compare two copies of the database.
+    """
+    return [connection.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+            for table in ('habits', 'habit_completions', 'habit_streaks', 'habit_period_counts')]
+
+@pytest.mark.parametrize('async_replica', [False, True])
+def test_replica_writes_through_to_file(tmp_path, async_replica):
+    """
+    This test checks that in replica mode the writes to the copy in memory reach the file, synchronously
+    or from the background thread once it is flushed or the database is closed.
+    """
+    db_name = str(tmp_path / 'replica.db')
+    db = Database(db_name=db_name, replica=True, async_replica=async_replica, refresh_interval=3600)
+    assert db.connection.execute('PRAGMA database_list').fetchone()[2] == ''
+    db.new_created_habit(Habit("habit test 160", "daily", 1))
+    start = datetime.now() - timedelta(days=10)
+    db.add_completions_bulk((("habit test 160", start + timedelta(days=day)) for day in range(6)), batch_size=4)
+    db.add_completion("habit test 160", start + timedelta(days=7))
+    assert db.delete_completion("habit test 160", start + timedelta(days=2))
+    db.delete_habit("Read")
+    assert db.get_streaks("habit test 160") == (0, 3)
+    if not async_replica:
+        assert stored_completions(db_name, "habit test 160") == 6
+    db._disk_writer.flush()
+    disk = sqlite3.connect(db_name)
+    try:
+        assert database_rows(disk) == database_rows(db.connection)
+        db.add_completion("habit test 160", start + timedelta(days=8))
+        db.exit()
+        assert stored_completions(db_name, "habit test 160") == 7
+    finally:
+        disk.close()
+
+def test_replica_reloads_external_changes(tmp_path):
+    """
+    This test checks that the copy in memory is reloaded when another connection changes the file,
+    once the refresh interval has passed, and that the replica mode cannot be pooled.
+    """
+    db_name = str(tmp_path / 'replica.db')
+    db = Database(db_name=db_name, replica=True, refresh_interval=3600)
+    other = Database(db_name=db_name, insert_predefined=False)
+    other.new_created_habit(Habit("habit test 161", "weekly", 2))
+    other.add_completion("habit test 161", datetime.now())
+    other.exit()
+    assert db.find_habit("habit test 161") is None
+    assert "habit test 161" not in db.name_index()
+
+    db.refresh_interval = 0
+    assert db.find_habit("habit test 161").completion_dates
+    assert "habit test 161" in db.name_index()
+    assert db.can_mark_performed("habit test 161")
+    db.exit()
+
+    with pytest.raises(ValueError):
+        Database(db_name=db_name, pooled=True, replica=True)
+
+
+# In this part, the compact storage of the completion dates is verified, since the dates are kept sorted
+# and the completions of a period are counted with binary searches.
+
+def test_completion_dates_stay_sorted():
+    """
+    This test adds completion dates in random order and checks that they are kept sorted and exact,
+    and that the counts of each period agree with counting the dates one by one.
+    """
+    generator = random.Random(15)
+    now = datetime.now()
+    dates = [now - timedelta(seconds=generator.randint(0, 60 * 86400), microseconds=generator.randint(0, 999999))
+             for _ in range(500)]
+    habit = Habit("habit test 110", "weekly", 3)
+    for date in dates[:200]:
+        habit.completion_dates.append(date)
+    habit.completion_dates.extend(dates[200:])
+    assert habit.completion_dates == sorted(dates)
+    assert habit.completion_dates[-1] == max(dates) and habit.completion_dates[:2] == sorted(dates)[:2]
+    assert dates[7] in habit.completion_dates
+    assert not hasattr(habit, '__dict__')
+
+    for date in dates[:50]:
+        period = periods.period_of(date, "weekly")
+        expected = sum(1 for other in dates if periods.period_of(other, "weekly") == period)
+        assert habit.count_in_period(period) == expected
+    current = sum(1 for date in dates if periods.period_of(date, "weekly") == periods.period_of(now, "weekly"))
+    assert habit.can_mark_performed() == (current < 3)
+
+    habit.completion_dates = dates[:10]
+    assert len(habit.completion_dates) == 10
+    assert list(habit.completion_dates) == sorted(dates[:10])
+
+
+# In this part, reading the latest completion dates is verified, since it must not load the whole history.
+
+def test_latest_completions_pages(test_db):
+    """
+    This test reads the history of a habit page by page, from the newest to the oldest completion date,
+    and checks that the query reads the index backwards instead of sorting the history.
+    """
+    habit = Habit("habit test 120", "daily", 1)
+    test_db.new_created_habit(habit)
+    start = datetime(2024, 1, 1, 8, 30, 15)
+    dates = [start + timedelta(days=day) for day in range(20)]
+    test_db.add_completions_bulk((habit.name, date) for date in dates)
+
+    assert test_db.latest_completions(habit.name) == dates[::-1][:7]
+    pages = []
+    before = None
+    while True:
+        page = test_db.latest_completions(habit.name, limit=6, before=before)
+        if not page:
+            break
+        pages.append(page)
+        before = page[-1]
+    assert [len(page) for page in pages] == [6, 6, 6, 2]
+    assert [date for page in pages for date in page] == dates[::-1]
+    assert test_db.latest_completions(habit.name, before=dates[3] + timedelta(microseconds=1)) == dates[3::-1]
+
+    plan = test_db.cursor.execute('''
+    EXPLAIN QUERY PLAN SELECT completion_date FROM habit_completions WHERE habit_name = ?
+    ORDER BY completion_date DESC LIMIT ?
+    ''', [habit.name, 7]).fetchall()
+    assert any('idx_habit_completions_habit_date' in row[-1] for row in plan)
+    assert not any('TEMP B-TREE' in row[-1] for row in plan)
+
+def test_display_completion_dates(test_db, capsys):
+    """
+    This test checks that the last seven completion dates are shown from the oldest to the newest.
+    """
+    habit = Habit("habit test 121", "daily", 1)
+    test_db.new_created_habit(habit)
+    dates = [datetime(2024, 3, 1, 9, 0, 0) + timedelta(days=day) for day in range(10)]
+    test_db.add_completions_bulk((habit.name, date) for date in dates)
+    analysis.display_completion_dates(test_db, habit.name)
+    output = capsys.readouterr().out
+    shown = [date.strftime('%Y-%m-%d %H:%M:%S') for date in dates[-7:]]
+    assert [line for line in output.splitlines() if line.startswith('| 2024')] == [f"| {date} |" for date in shown]
+    analysis.display_completion_dates(test_db, "habit test 122")
+    assert "There are no completion dates" in capsys.readouterr().out
+
+
+# In this part, the number of completions of each habit in each period is verified, since the streaks
+# and the check before marking a habit as performed read it instead of the completion dates.
+
+def period_counts(db, habit_name):
+    """
+    This function reads the stored number of completions in each period of a habit.
+    """
+    return db.cursor.execute('SELECT period, count FROM habit_period_counts WHERE habit_name = ? ORDER BY period',
+                             [habit_name]).fetchall()
+
+def test_period_counts_follow_completions(test_db):
+    """
+    This test checks that the period counts are updated when completions are added one at a time or in bulk,
+    when a completion is deleted and when the habit is deleted.
+    """
+    habit = Habit("habit test 130", "weekly", 2)
+    test_db.new_created_habit(habit)
+    monday = datetime(2024, 4, 1, 9, 0, 0)
+    test_db.add_completion(habit.name, monday)
+    test_db.add_completions_bulk([(habit.name, monday + timedelta(days=2)), (habit.name, monday + timedelta(days=7))])
+    week = periods.period_of(monday, 'weekly')
+    assert period_counts(test_db, habit.name) == [(week, 2), (week + 1, 1)]
+    assert test_db.get_streaks(habit.name)[1] == 1
+
+    assert test_db.delete_completion(habit.name, monday + timedelta(days=2))
+    assert not test_db.delete_completion(habit.name, monday + timedelta(days=2))
+    assert period_counts(test_db, habit.name) == [(week, 1), (week + 1, 1)]
+    assert test_db.get_streaks(habit.name)[1] == 0
+    assert test_db.delete_completion(habit.name, monday)
+    assert period_counts(test_db, habit.name) == [(week + 1, 1)]
+    assert test_db.check_period_counts() == []
+
+    test_db.delete_habit(habit.name)
+    assert period_counts(test_db, habit.name) == []
+
+def test_can_mark_performed_reads_one_period(test_db):
+    """
+    This test checks that the database answers whether a habit can be marked with one lookup in the period counts.
+    """
+    test_db.new_created_habit(Habit("habit test 131", "daily", 2))
+    assert test_db.can_mark_performed("habit test 131")
+    test_db.add_completion("habit test 131", datetime.now())
+    assert test_db.can_mark_performed("habit test 131")
+    test_db.add_completion("habit test 131", datetime.now())
+    assert not test_db.can_mark_performed("habit test 131")
+    assert test_db.can_mark_performed("habit test 132") is None
+
+    statements = []
+    test_db.connection.set_trace_callback(statements.append)
+    test_db.can_mark_performed("habit test 131")
+    test_db.connection.set_trace_callback(None)
+    assert len(statements) == 1 and 'habit_completions' not in statements[0]
+
+def test_check_and_backfill_period_counts(test_db):
+    """
+    This test damages the period counts and checks that the checker finds every difference
+    and that the backfill repairs them, from the maintenance command line too.
+    """
+    for seed in range(3):
+        habit = random_habit(seed)
+        test_db.new_created_habit(habit)
+        test_db.add_completions_bulk((habit.name, date) for date in habit.completion_dates)
+    expected = test_db.sql_streaks()
+    first = test_db.cursor.execute('SELECT habit_name, period, count FROM habit_period_counts LIMIT 1').fetchone()
+    test_db.cursor.execute('UPDATE habit_period_counts SET count = count + 1 WHERE habit_name = ? AND period = ?',
+                           first[:2])
+    test_db.cursor.execute('INSERT INTO habit_period_counts VALUES (?, ?, 3)', [first[0], 1])
+    test_db.connection.commit()
+    assert test_db.check_period_counts() == [(first[0], 1, 3, 0), (first[0], first[1], first[2] + 1, first[2])]
+
+    runner = CliRunner()
+    result = runner.invoke(maintenance.cli, ['--db', test_db.db_name, 'check-rollup'])
+    assert result.exit_code == 1 and f"period {first[1]}" in result.output
+    assert test_db.backfill_period_counts(batch_size=2) == 3
+    assert test_db.check_period_counts() == []
+    assert test_db.sql_streaks() == expected
+    result = runner.invoke(maintenance.cli, ['--db', test_db.db_name, 'check-rollup'])
+    assert result.exit_code == 0
+
+
+# In this part, the instrumentation is verified, since it must record every call while it is enabled
+# and leave the original functions in place when it is not.
+
+def test_instrumentation_records_calls(test_db):
+    """
+    This test records calls from two threads and checks the counts, the rows, the histograms,
+    and that disabling the instrumentation puts the original functions back.
+    """
+    original = Database.find_habit
+    test_db.new_created_habit(Habit("habit test 140", "daily", 1))
+    test_db.add_completion("habit test 140", datetime.now() - timedelta(days=1))
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        assert instrumentation.is_enabled() and Database.find_habit is not original
+        habit = test_db.find_habit("habit test 140")
+        assert habit.calculate_longest_streak() == 1
+        thread = threading.Thread(target=lambda: [habit.calculate_current_streak() for _ in range(3)])
+        thread.start()
+        thread.join()
+        assert analysis.show_longest_streak(test_db, 'sql').name == "habit test 140"
+        with pytest.raises(ValueError):
+            analysis.show_longest_streak(test_db, 'unknown')
+    finally:
+        instrumentation.disable()
+    assert not instrumentation.is_enabled() and Database.find_habit is original
+    test_db.find_habit("habit test 140")
+
+    stats = instrumentation.snapshot()
+    assert stats['Database.find_habit']['calls'] == 2 and stats['Database.find_habit']['rows'] == 2
+    assert stats['Habit.calculate_current_streak']['calls'] == 3
+    assert stats['Habit.calculate_longest_streak']['calls'] == 1
+    assert stats['analysis.show_longest_streak']['calls'] == 2
+    assert stats['analysis.show_longest_streak']['errors'] == 1
+    for entry in stats.values():
+        assert sum(entry['histogram']) == entry['calls']
+        assert entry['p50_seconds'] <= entry['p99_seconds']
+    assert 'Database.find_habit' in instrumentation.summary()
+    instrumentation.reset()
+    assert instrumentation.snapshot() == {}
+
+def test_instrumentation_records_generator_rows(test_db):
+    """
+    This test checks that a generator method is recorded with the rows it yielded once they are read,
+    including when the caller stops reading early.
+    """
+    for number in range(5):
+        test_db.new_created_habit(Habit(f"habit test 141 {number}", "daily", 1))
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        rows = test_db.habit_rows(page_size=2)
+        assert instrumentation.snapshot() == {}
+        assert len(list(rows)) == 5
+        rows = test_db.habit_rows(page_size=2)
+        assert next(rows)[0] == "habit test 141 0"
+        rows.close()
+    finally:
+        instrumentation.disable()
+    stats = instrumentation.snapshot()['Database.habit_rows']
+    assert stats['calls'] == 2 and stats['rows'] == 6 and stats['errors'] == 0
+    assert stats['total_seconds'] > 0
+    instrumentation.reset()
+
+def test_cli_profile(test_db, tmp_path):
+    """
+    This test runs a command with --profile and --pstats and checks the summary and the cProfile file.
+    """
+    test_db.new_created_habit(Habit("habit test 141", "weekly", 1))
+    test_db.exit()
+    pstats_file = str(tmp_path / 'cli.prof')
+    result = CliRunner().invoke(cli.cli, ['--db', 'test_habits.db', '--pstats', pstats_file, 'list'])
+    assert result.exit_code == 0
+    assert 'Database.habit_rows' in result.output and 'analysis.stream_table_of_habits' in result.output
+    assert os.path.getsize(pstats_file) > 0
+    assert not instrumentation.is_enabled()
+
+
+# In this part, the metrics are verified, since they are read by Prometheus and must follow its text format.
+
+METRIC_LINE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+
+def test_collect_metrics(test_db):
+    """
+    This test collects the metrics with the instrumentation enabled and checks the histograms,
+    the totals and that every line is a comment or a sample.
+    """
+    test_db.new_created_habit(Habit("habit test 150", "daily", 1))
+    test_db.new_created_habit(Habit("habit test 151", "weekly", 2))
+    test_db.add_completions_bulk([("habit test 150", datetime.now() - timedelta(days=day)) for day in range(3)])
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        test_db.find_habit("habit test 150")
+        test_db.find_habit("habit test 151")
+        analysis.longest_streak_for_habit(test_db, "habit test 150")
+        text = metrics.collect(test_db)
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+
+    lines = text.splitlines()
+    assert all(line.startswith('#') or METRIC_LINE.match(line) for line in lines)
+    assert 'habit_tracker_db_operation_seconds_count{operation="find_habit"} 2' in lines
+    assert 'habit_tracker_db_operation_seconds_bucket{operation="find_habit",le="+Inf"} 2' in lines
+    assert 'habit_tracker_streak_seconds_count{function="analysis.longest_streak_for_habit"} 1' in lines
+    assert 'habit_tracker_habits{frequency="daily"} 1' in lines and 'habit_tracker_completions 3' in lines
+    assert f'habit_tracker_database_size_bytes{{file="db"}} {os.path.getsize(test_db.db_name)}' in lines
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+               if line.startswith('habit_tracker_db_operation_seconds_bucket{operation="find_habit"')]
+    assert buckets == sorted(buckets)
+    assert 'habit_tracker_sqlite_connections 1' in lines and 'habit_tracker_pending_completions 0' in lines
+
+def test_write_metrics_textfile(test_db, tmp_path):
+    """
+    This test writes the metrics for the textfile collector and checks that no temporary file is left behind.
+    """
+    path = tmp_path / 'habits.prom'
+    metrics.write_textfile(test_db, str(path))
+    metrics.write_textfile(test_db, str(path))
+    assert os.listdir(tmp_path) == ['habits.prom']
+    assert 'habit_tracker_completions 0' in path.read_text().splitlines()
+
+def test_api_metrics(api_server):
+    """
+    This test reads the metrics from the HTTP API.
+    """
+    connection = http.client.HTTPConnection(*api_server.server_address)
+    api_request(connection, 'POST', '/habits', {'name': 'habit test 152', 'frequency': 'daily', 'periodicity': 1})
+    connection.request('GET', '/metrics')
+    response = connection.getresponse()
+    text = response.read().decode('utf-8')
+    connection.close()
+    assert response.status == 200 and response.getheader('Content-Type').startswith('text/plain')
+    assert 'habit_tracker_habits{frequency="daily"} 1' in text.splitlines()
+
+
+# In this part, the queued logging is verified, since the messages must reach the file in order,
+# be formatted only when their level is enabled, and be limited on lines that log too often.
+
+@pytest.fixture
+def queued_log(tmp_path):
+    """
+    This fixture gives the path of a temporary log file and puts the previous logging configuration back afterward.
+    """
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield str(tmp_path / 'habit_tracker.log')
+    logconfig.stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+class FormatCounter:
+    """
+    A logging argument that counts how many times it is formatted and in which threads.
+    """
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread().name)
+        return 'counter'
+
+def test_queued_logging_is_lazy(queued_log):
+    """
+    This test checks that a message below the level is never formatted, and that an enabled message
+    is formatted by the background writer and written to the file.
+    """
+    logconfig.configure_logging(queued_log, level=logging.INFO, rate=None)
+    logger = logging.getLogger('test_logging')
+    skipped = FormatCounter()
+    written = FormatCounter()
+    logger.debug("Not written: %s", skipped)
+    logger.info("The habit '%s' was written.", written)
+    logconfig.stop_logging()
+    assert skipped.threads == []
+    # The rotating file handler formats the message to check the size of the file and then to write it.
+    assert written.threads and threading.current_thread().name not in written.threads
+    with open(queued_log, encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 1 and lines[0].endswith(":test_logging:INFO:The habit 'counter' was written.")
+
+def test_queued_logging_rate_limit_and_rotation(queued_log):
+    """
+    This test logs in a loop from one line and checks that only the burst is written, that the next message
+    from that line says how many were dropped, that warnings are never dropped, and that the file is rotated
+    when it is too big.
+    """
+    logconfig.configure_logging(queued_log, max_bytes=2000, backup_count=2, rate=20.0, burst=40)
+    logger = logging.getLogger('test_logging')
+    for x in list(range(200)) + ['after']:
+        if x == 'after':
+            time.sleep(0.1)
+        logger.info("Message %s", x)
+    for x in range(60):
+        logger.warning("Warning %s", x)
+    logger.warning("Another line")
+    logconfig.stop_logging()
+    text = ''
+    for suffix in ('.2', '.1', ''):
+        if os.path.exists(queued_log + suffix):
+            with open(queued_log + suffix, encoding='utf-8') as file:
+                text += file.read()
+    assert os.path.exists(queued_log + '.1')
+    lines = text.splitlines()
+    assert [line.rsplit(':', 1)[1] for line in lines[:40]] == [f"Message {x}" for x in range(40)]
+    assert lines[40].endswith('Message after (160 similar messages were dropped)')
+    assert [line.rsplit(':', 1)[1] for line in lines[41:101]] == [f"Warning {x}" for x in range(60)]
+    assert lines[-1].endswith('Another line')